@@ -0,0 +1,37 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:13
+
+from django.db import migrations, models
+
+
+def backfill_duration_hours(apps, schema_editor):
+    """Store the duration the removed LogEntry.duration_hours property computed"""
+    LogEntry = apps.get_model('trucker_app', 'LogEntry')
+    batch = []
+    for entry in LogEntry.objects.only('id', 'start_time', 'end_time').iterator(chunk_size=2000):
+        start = entry.start_time.hour * 60 + entry.start_time.minute + entry.start_time.second / 60
+        end = entry.end_time.hour * 60 + entry.end_time.minute + entry.end_time.second / 60
+        if end <= start:
+            end += 24 * 60
+        entry.duration_hours = (end - start) / 60
+        batch.append(entry)
+        if len(batch) >= 2000:
+            LogEntry.objects.bulk_update(batch, ['duration_hours'])
+            batch = []
+    if batch:
+        LogEntry.objects.bulk_update(batch, ['duration_hours'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trucker_app', '0005_trip_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logentry',
+            name='duration_hours',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_duration_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trucker_app', '0006_logentry_duration_hours'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trip',
+            index=models.Index(fields=['-created_at', '-id'], name='trip_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trucker_app', '0007_trip_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripPlan',
+            fields=[
+                ('trip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='plan', serialize=False, to='trucker_app.trip')),
+                ('to_pickup_geometry', models.BinaryField()),
+                ('to_dropoff_geometry', models.BinaryField()),
+                ('route', models.BinaryField()),
+                ('schedule', models.BinaryField()),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
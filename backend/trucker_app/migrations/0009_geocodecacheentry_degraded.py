@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trucker_app', '0008_tripplan'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='geocodecacheentry',
+            name='degraded',
+            field=models.BooleanField(default=False),
+        ),
+    ]
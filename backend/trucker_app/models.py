@@ -2,6 +2,22 @@ from django.db import models
 from django.utils import timezone
 import uuid
 
+def log_prefetches():
+    """Prefetches for a trip's daily logs and their entries, each in display order"""
+    return [
+        models.Prefetch(
+            'daily_logs',
+            queryset=DailyLog.objects.order_by('date', 'log_order').prefetch_related(
+                models.Prefetch('log_entries', queryset=LogEntry.objects.order_by('start_time'))
+            )
+        )
+    ]
+
+class TripQuerySet(models.QuerySet):
+    def with_logs(self):
+        """Trips with their daily logs and log entries: three queries however many logs there are"""
+        return self.prefetch_related(*log_prefetches())
+
 class Trip(models.Model):
     """Model for storing trip information"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -9,17 +25,49 @@ class Trip(models.Model):
     pickup_location = models.CharField(max_length=255)
     dropoff_location = models.CharField(max_length=255)
     current_cycle_used = models.FloatField(default=0.0)  # Hours already used in current 8-day cycle
+    sleeper_split = models.BooleanField(default=False)  # Plan 7/3 or 8/2 split sleeper-berth rests when faster
     created_at = models.DateTimeField(default=timezone.now)
     
     # Calculated fields
     total_distance = models.FloatField(null=True, blank=True)  # Total trip distance in miles
     estimated_drive_time = models.FloatField(null=True, blank=True)  # In hours
     
+    # Geocoded when the trip is planned, so position updates need not geocode again
+    current_latitude = models.FloatField(null=True, blank=True)
+    current_longitude = models.FloatField(null=True, blank=True)
+    pickup_latitude = models.FloatField(null=True, blank=True)
+    pickup_longitude = models.FloatField(null=True, blank=True)
+    dropoff_latitude = models.FloatField(null=True, blank=True)
+    dropoff_longitude = models.FloatField(null=True, blank=True)
+    
+    # Latest driver position update
+    position_latitude = models.FloatField(null=True, blank=True)
+    position_longitude = models.FloatField(null=True, blank=True)
+    position_updated_at = models.DateTimeField(null=True, blank=True)
+    
+    objects = TripQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the trip list (views.list_trips)
+            models.Index(fields=['-created_at', '-id'], name='trip_created_id_idx'),
+        ]
     
     def __str__(self):
         return f"Trip from {self.pickup_location} to {self.dropoff_location}"
+    
+    def coordinates(self, key):
+        """Stored (latitude, longitude) of 'current', 'pickup', 'dropoff' or 'position', or None"""
+        latitude, longitude = getattr(self, f'{key}_latitude'), getattr(self, f'{key}_longitude')
+        return (latitude, longitude) if latitude is not None and longitude is not None else None
+    
+    def set_coordinates(self, coords):
+        """Store (latitude, longitude) pairs keyed 'current', 'pickup', 'dropoff' or 'position'"""
+        for key, value in coords.items():
+            if value:
+                setattr(self, f'{key}_latitude', value[0])
+                setattr(self, f'{key}_longitude', value[1])
 
 class DailyLog(models.Model):
     """Model for daily log sheets following FMCSA requirements"""
@@ -69,6 +117,7 @@ class LogEntry(models.Model):
     end_time = models.TimeField()
     location = models.CharField(max_length=255)
     remarks = models.TextField(blank=True)
+    duration_hours = models.FloatField(default=0.0)  # Stored by save() / log_rows, see hours_between
     
     class Meta:
         ordering = ['start_time']
@@ -76,16 +125,43 @@ class LogEntry(models.Model):
     def __str__(self):
         return f"{self.get_duty_status_display()}: {self.start_time} - {self.end_time}"
     
-    @property
-    def duration_hours(self):
-        """Calculate duration in hours"""
-        import datetime
-        start = datetime.datetime.combine(datetime.date.today(), self.start_time)
-        end = datetime.datetime.combine(datetime.date.today(), self.end_time)
-        
-        # Handle overnight entries
-        if end < start:
-            end += datetime.timedelta(days=1)
-        
-        delta = end - start
-        return delta.total_seconds() / 3600
+    def save(self, *args, **kwargs):
+        self.duration_hours = self.hours_between(self.start_time, self.end_time)
+        super().save(*args, **kwargs)
+    
+    @staticmethod
+    def hours_between(start_time, end_time):
+        """Hours from start_time to end_time; an entry ending at or before its start (00:00) runs past midnight"""
+        start = start_time.hour * 60 + start_time.minute + start_time.second / 60
+        end = end_time.hour * 60 + end_time.minute + end_time.second / 60
+        if end <= start:
+            end += 24 * 60
+        return (end - start) / 60
+
+class TripPlan(models.Model):
+    """
+    Computed route and schedule of a planned trip, stored compactly so the trip
+    can be shown again without re-planning (see services.plan_codec). Only read
+    when a client asks for it, so trip queries never load the blobs.
+    """
+    trip = models.OneToOneField(Trip, on_delete=models.CASCADE, primary_key=True, related_name='plan')
+    to_pickup_geometry = models.BinaryField()  # Full-resolution route coordinates, plan_codec.encode_geometry
+    to_dropoff_geometry = models.BinaryField()
+    route = models.BinaryField()  # Route summary and legs without geometry, plan_codec.encode_document
+    schedule = models.BinaryField()  # Schedule and HOS compliance, plan_codec.encode_document
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Plan for trip {self.trip_id}"
+
+class GeocodeCacheEntry(models.Model):
+    """Persistent geocoding result keyed by the normalized location string"""
+    query = models.CharField(max_length=255, unique=True)
+    latitude = models.FloatField(null=True, blank=True)  # Null for a cached negative result
+    longitude = models.FloatField(null=True, blank=True)
+    degraded = models.BooleanField(default=False)  # Gazetteer fallback coordinates, not an OpenRouteService match
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Geocode cache: {self.query}"
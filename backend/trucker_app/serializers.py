@@ -1,16 +1,59 @@
 from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from datetime import datetime, timedelta
+import base64
+import binascii
+import uuid
 from .models import Trip, DailyLog, LogEntry
+from .services.geometry import GEOMETRY_FORMATS, tolerance_for_zoom
+from .services.distance import DISTANCE_METHODS
+
+def naive_local(value):
+    """Schedules are planned in naive local time"""
+    return timezone.localtime(value).replace(tzinfo=None) if timezone.is_aware(value) else value
 
 class TripSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trip
         fields = '__all__'
-        read_only_fields = ('id', 'created_at', 'total_distance', 'estimated_drive_time')
+        read_only_fields = (
+            'id', 'created_at', 'total_distance', 'estimated_drive_time',
+            'current_latitude', 'current_longitude', 'pickup_latitude', 'pickup_longitude',
+            'dropoff_latitude', 'dropoff_longitude', 'position_latitude', 'position_longitude', 'position_updated_at'
+        )
 
 class TripCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trip
-        fields = ['current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used']
+        fields = ['current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used', 'sleeper_split']
+
+def encode_trip_cursor(created_at, trip_id):
+    """Opaque keyset cursor for the trip list: the (created_at, id) of the last trip on a page"""
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{trip_id}'.encode()).decode().rstrip('=')
+
+class TripListQuerySerializer(serializers.Serializer):
+    """Query parameters for the keyset-paginated trip list"""
+    cursor = serializers.CharField(required=False)  # next_cursor of the previous page
+    limit = serializers.IntegerField(required=False, min_value=1)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    location = serializers.CharField(required=False, max_length=255)  # matches current, pickup or dropoff
+    
+    def validate_cursor(self, value):
+        try:
+            created_at, trip_id = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)).decode().split('|')
+            return datetime.fromisoformat(created_at), uuid.UUID(trip_id)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise serializers.ValidationError('Invalid cursor.')
+    
+    def validate(self, attrs):
+        max_limit = getattr(settings, 'TRIP_LIST_MAX_LIMIT', 200)
+        attrs['limit'] = min(attrs.get('limit', getattr(settings, 'TRIP_LIST_DEFAULT_LIMIT', 50)), max_limit)
+        after, before = attrs.get('created_after'), attrs.get('created_before')
+        if after is not None and before is not None and before < after:
+            raise serializers.ValidationError({'created_before': 'Must not be before created_after.'})
+        return attrs
 
 class LogEntrySerializer(serializers.ModelSerializer):
     duration_hours = serializers.ReadOnlyField()
@@ -32,3 +75,142 @@ class TripDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trip
         fields = '__all__'
+
+class RouteOutputSerializer(serializers.Serializer):
+    """Query parameters controlling how route geometry is returned"""
+    zoom = serializers.FloatField(required=False, min_value=0, max_value=22)
+    tolerance = serializers.FloatField(required=False, min_value=0)  # degrees; overrides zoom
+    geometry_format = serializers.ChoiceField(choices=GEOMETRY_FORMATS, default='geojson')
+    instructions = serializers.BooleanField(default=True)
+    
+    def validate(self, attrs):
+        if 'tolerance' not in attrs:
+            zoom = attrs.get('zoom', getattr(settings, 'ROUTE_GEOMETRY_DEFAULT_ZOOM', None))
+            attrs['tolerance'] = tolerance_for_zoom(zoom) if zoom is not None else None
+        return attrs
+
+class MatrixLocationField(serializers.Field):
+    """A location given either as free text to geocode or as a [latitude, longitude] pair"""
+    default_error_messages = {
+        'invalid': 'Expected a location string or a [latitude, longitude] pair.',
+        'out_of_range': 'Latitude must be within [-90, 90] and longitude within [-180, 180].',
+    }
+    
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            if not data.strip():
+                self.fail('invalid')
+            return data
+        if not isinstance(data, (list, tuple)) or len(data) != 2:
+            self.fail('invalid')
+        try:
+            latitude, longitude = float(data[0]), float(data[1])
+        except (TypeError, ValueError):
+            self.fail('invalid')
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            self.fail('out_of_range')
+        return (latitude, longitude)
+    
+    def to_representation(self, value):
+        return value if isinstance(value, str) else list(value)
+
+class DistanceMatrixSerializer(serializers.Serializer):
+    """Request body for the origin x destination distance matrix"""
+    origins = serializers.ListField(child=MatrixLocationField(), min_length=1)
+    destinations = serializers.ListField(child=MatrixLocationField(), min_length=1)
+    method = serializers.ChoiceField(choices=list(DISTANCE_METHODS), default='haversine')
+    refine_top_k = serializers.IntegerField(default=0, min_value=0)  # road-route the k closest destinations per origin
+    
+    def validate(self, attrs):
+        cells = len(attrs['origins']) * len(attrs['destinations'])
+        max_cells = getattr(settings, 'MATRIX_MAX_CELLS', 1000000)
+        if cells > max_cells:
+            raise serializers.ValidationError(f'Matrix of {cells} cells exceeds the limit of {max_cells}.')
+        
+        refined = len(attrs['origins']) * min(attrs['refine_top_k'], len(attrs['destinations']))
+        max_refined = getattr(settings, 'MATRIX_MAX_REFINED_PAIRS', 200)
+        if refined > max_refined:
+            raise serializers.ValidationError(
+                {'refine_top_k': f'Refining {refined} pairs exceeds the limit of {max_refined}.'}
+            )
+        return attrs
+
+class BatchGeocodeSerializer(serializers.Serializer):
+    """Request body for batch geocoding"""
+    locations = serializers.ListField(child=serializers.CharField(max_length=255), min_length=1)
+    
+    def validate_locations(self, value):
+        max_locations = getattr(settings, 'BATCH_GEOCODE_MAX_LOCATIONS', 10000)
+        if len(value) > max_locations:
+            raise serializers.ValidationError(f'At most {max_locations} locations per batch.')
+        return value
+
+class ScheduleSweepSerializer(serializers.Serializer):
+    """
+    Request body for a departure-time sweep: explicit departures or a
+    start/end/step range, crossed with one or more cycle-hours values
+    """
+    departures = serializers.ListField(child=serializers.DateTimeField(), required=False, min_length=1)
+    departure_start = serializers.DateTimeField(required=False)
+    departure_end = serializers.DateTimeField(required=False)
+    step_minutes = serializers.IntegerField(default=60, min_value=5)
+    cycle_hours = serializers.ListField(
+        child=serializers.FloatField(min_value=0, max_value=70), required=False, min_length=1
+    )
+    dock_open = serializers.TimeField(required=False)  # pickups and dropoffs only start between these
+    dock_close = serializers.TimeField(required=False)
+    include_all = serializers.BooleanField(default=False)  # every candidate, not just the Pareto front
+    
+    def validate(self, attrs):
+        departures = attrs.get('departures')
+        if departures is None:
+            start, end = attrs.get('departure_start'), attrs.get('departure_end')
+            if start is None or end is None:
+                raise serializers.ValidationError('Provide departures or departure_start and departure_end.')
+            if end < start:
+                raise serializers.ValidationError({'departure_end': 'Must not be before departure_start.'})
+            step = timedelta(minutes=attrs['step_minutes'])
+            count = int((end - start) / step) + 1
+        else:
+            count = len(departures)
+        
+        if ('dock_open' in attrs) != ('dock_close' in attrs):
+            raise serializers.ValidationError('Provide both dock_open and dock_close, or neither.')
+        if 'dock_open' in attrs:
+            opens, closes = attrs['dock_open'], attrs['dock_close']
+            if opens == closes:
+                raise serializers.ValidationError({'dock_close': 'Must differ from dock_open.'})
+            attrs['dock_hours'] = (opens.hour * 60 + opens.minute, closes.hour * 60 + closes.minute)
+        else:
+            attrs['dock_hours'] = None
+        
+        candidates = count * len(attrs.get('cycle_hours') or [None])
+        max_candidates = getattr(settings, 'SCHEDULE_SWEEP_MAX_CANDIDATES', 5000)
+        if candidates > max_candidates:
+            raise serializers.ValidationError(f'Sweep of {candidates} candidates exceeds the limit of {max_candidates}.')
+        if departures is None:
+            departures = [start + step * i for i in range(count)]
+        
+        attrs['departures'] = [naive_local(when) for when in departures]
+        return attrs
+
+class BatchPlanSerializer(serializers.Serializer):
+    """Request body for batch trip planning; each trip is validated on its own by the view"""
+    trips = serializers.ListField(child=serializers.DictField(), min_length=1)
+    start_time = serializers.DateTimeField(required=False)  # shared departure; defaults to now
+    include_schedule = serializers.BooleanField(default=False)  # full schedules, not just summaries
+    
+    def validate_trips(self, value):
+        max_trips = getattr(settings, 'PLAN_BATCH_MAX_TRIPS', 1000)
+        if len(value) > max_trips:
+            raise serializers.ValidationError(f'At most {max_trips} trips per batch.')
+        return value
+    
+    def validate_start_time(self, value):
+        return naive_local(value)
+
+class PositionUpdateSerializer(serializers.Serializer):
+    """Request body for a live driver position update on a planned trip"""
+    location = MatrixLocationField()  # free text to geocode or [latitude, longitude]
+    at = serializers.DateTimeField(required=False)  # defaults to now
+    picked_up = serializers.BooleanField(required=False)  # defaults to what the logged schedule says
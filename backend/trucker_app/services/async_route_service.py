@@ -0,0 +1,156 @@
+import asyncio
+import random
+from typing import Dict, List, Optional, Tuple
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .cache import geocode_cache, route_cache
+from .circuit_breaker import geocode_breaker, directions_breaker
+from .single_flight import geocode_flight, route_flight
+from .http_client import RETRY_STATUS_CODES, get_async_client, async_timeout, geocode_timeout, directions_timeout
+from .route_service import RouteService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRouteService(RouteService):
+    """
+    Non-blocking RouteService for async views. Upstream calls go through a
+    shared httpx AsyncClient; request building, response parsing and the
+    offline fallbacks are inherited from RouteService. Cache and circuit
+    breaker calls that may touch the database run via sync_to_async.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.client = get_async_client()
+
+    async def ageocode_location(self, location: str) -> Optional[Tuple[float, float]]:
+        """Async geocode_location"""
+        found, coords, degraded = await sync_to_async(geocode_cache.get)(location)
+        if found:
+            logger.debug(f"Geocode cache hit for '{location}': {coords}")
+            if degraded:
+                self.degraded = True
+            return coords
+
+        key = geocode_cache.normalize(location)
+        coords, source = await geocode_flight.ado(key, lambda: self._ageocode_uncached(key))
+        if source == 'gazetteer':
+            self.degraded = True
+        return coords
+
+    async def _ageocode_uncached(self, key: str) -> Tuple[Optional[Tuple[float, float]], Optional[str]]:
+        coords, answered = await self._ageocode_with_openroute(key)
+        if coords:
+            await sync_to_async(geocode_cache.set)(key, coords)
+            return coords, 'openroute'
+
+        coords = self._geocode_fallback(key)
+        if not coords:
+            logger.error(f"Could not geocode location: {key}")
+        if answered:
+            # As in RouteService: only an ORS "no match" is cached, never a failed call
+            await sync_to_async(geocode_cache.set)(key, coords, ttl=geocode_cache.negative_ttl, degraded=coords is not None)
+        return coords, 'gazetteer' if coords else None
+
+    async def _ageocode_with_openroute(self, location: str) -> Tuple[Optional[Tuple[float, float]], bool]:
+        """Async _geocode_with_openroute: (coords, answered)"""
+        url, headers, params = self._geocode_request(location)
+
+        if not await sync_to_async(geocode_breaker.allow_request)():
+            logger.warning(f"Geocoding circuit open, skipping OpenRouteService for: {location}")
+            return None, False
+
+        try:
+            response = await self._request('GET', url, headers=headers, params=params, timeout=async_timeout(geocode_timeout()))
+            logger.info(f"Geocoding response status: {response.status_code}")
+            await sync_to_async(self._record_outcome)(geocode_breaker, response)
+
+            if response.status_code == 200:
+                return self._parse_geocode(response.json(), location), True
+            logger.error(f"Geocoding API error {response.status_code}: {response.text}")
+
+        except httpx.TimeoutException:
+            await sync_to_async(geocode_breaker.record_failure)()
+            logger.error(f"Geocoding timeout for: {location}")
+        except Exception as e:
+            await sync_to_async(geocode_breaker.record_failure)()
+            logger.error(f"Geocoding error for '{location}': {e}")
+
+        return None, False
+
+    async def acalculate_multi_leg_route(self, waypoints: List[Tuple[float, float]]) -> Dict:
+        """Async calculate_multi_leg_route"""
+        if len(waypoints) < 2:
+            raise ValueError("A route needs at least two waypoints")
+
+        if getattr(settings, 'ROUTE_BACKEND', 'openroute') == 'road_graph':
+            return self.calculate_multi_leg_route(waypoints)
+
+        cache_key = route_cache.key(waypoints, profile='driving-hgv', units='mi')
+        cached = route_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Route cache hit for {waypoints}")
+            return cached
+
+        result = await route_flight.ado(cache_key, lambda: self._afetch_multi_leg_route(waypoints, cache_key))
+        if any(leg.get('degraded') for leg in result['legs']):
+            self.degraded = True
+        return result
+
+    async def _afetch_multi_leg_route(self, waypoints: List[Tuple[float, float]], cache_key) -> Dict:
+        url, headers, body = self._directions_request(waypoints)
+
+        if not await sync_to_async(directions_breaker.allow_request)():
+            logger.warning("Directions circuit open, skipping OpenRouteService")
+            return self._fallback_multi_leg_route(waypoints)
+
+        try:
+            logger.info(f"Calculating route through {len(waypoints)} waypoints: {waypoints}")
+            response = await self._request('POST', url, headers=headers, json=body, timeout=async_timeout(directions_timeout()))
+            await sync_to_async(self._record_outcome)(directions_breaker, response)
+
+            if response.status_code == 200:
+                result = self._parse_directions(response.json(), len(waypoints) - 1)
+                if result:
+                    route_cache.set(cache_key, result)
+                    return result
+            else:
+                logger.error(f"Route calculation failed {response.status_code}: {response.text}")
+
+        except httpx.TimeoutException:
+            await sync_to_async(directions_breaker.record_failure)()
+            logger.error("Route calculation timeout")
+        except Exception as e:
+            await sync_to_async(directions_breaker.record_failure)()
+            logger.error(f"Route calculation error: {e}")
+
+        return self._fallback_multi_leg_route(waypoints)
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request with the same policy as the shared requests session:
+        retry connection errors, 429 and 5xx with jittered exponential backoff,
+        honoring Retry-After up to ORS_BACKOFF_MAX
+        """
+        max_retries = getattr(settings, 'ORS_MAX_RETRIES', 2)
+        backoff_factor = getattr(settings, 'ORS_BACKOFF_FACTOR', 0.5)
+        backoff_max = getattr(settings, 'ORS_BACKOFF_MAX', 10)
+
+        for attempt in range(max_retries + 1):
+            retry_after = None
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt == max_retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+                    return response
+                header = response.headers.get('Retry-After', '')
+                retry_after = float(header) if header.replace('.', '', 1).isdigit() else None
+
+            delay = retry_after if retry_after is not None else backoff_factor * (2 ** attempt) + random.uniform(0, backoff_factor)
+            await asyncio.sleep(min(delay, backoff_max))
@@ -0,0 +1,79 @@
+from collections import Counter
+from typing import Dict, Iterator, List, Optional
+from django.conf import settings
+from .cache import geocode_cache
+from .concurrency import Deadline, iter_completed
+from .gazetteer import gazetteer
+from .rate_limit import TokenBucket, geocode_rate_limiter
+from .route_service import RouteService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class BatchGeocoder:
+    """
+    Geocode many locations in one pass. Inputs are deduplicated by their
+    normalized form; cache hits (looked up together, see GeocodeCache.get_many)
+    and exact gazetteer matches are answered immediately, and only the
+    remaining misses go to OpenRouteService through a bounded number of
+    in-flight calls paced by the geocode rate limiter.
+    """
+
+    def __init__(self, route_service: Optional[RouteService] = None, concurrency: Optional[int] = None,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.route_service = route_service or RouteService()
+        self.concurrency = concurrency or getattr(settings, 'BATCH_GEOCODE_CONCURRENCY', 4)
+        self.rate_limiter = rate_limiter or geocode_rate_limiter
+        self.sources = Counter()
+
+    def geocode(self, locations: List[str], deadline: Optional[Deadline] = None) -> Iterator[Dict]:
+        """
+        Yield one result per input location, in the order they resolve. Past
+        the deadline no more upstream results are waited for, so locations
+        without a result timed out.
+        """
+        indices: Dict[str, List[int]] = {}
+        for index, location in enumerate(locations):
+            indices.setdefault(geocode_cache.normalize(location), []).append(index)
+
+        cached = geocode_cache.get_many(key for key in indices if key)
+        misses = []
+        for key, positions in indices.items():
+            if not key:
+                yield from self._results(locations, positions, None, None, False)
+                continue
+
+            if key in cached:
+                coords, degraded = cached[key]
+                if degraded:
+                    self.route_service.degraded = True
+                yield from self._results(locations, positions, coords, 'cache' if coords else None, degraded)
+                continue
+
+            place = gazetteer.exact(key)
+            if place:
+                self.route_service.degraded = True  # fallback coordinates, as from RouteService._geocode_fallback
+                yield from self._results(locations, positions, (place.latitude, place.longitude), 'gazetteer', True)
+                continue
+
+            misses.append(key)
+
+        logger.info(f"Batch geocode: {len(locations)} inputs, {len(indices)} unique, {len(misses)} sent upstream")
+        calls = ((key, lambda key=key: self.route_service.geocode_with_source(key)) for key in misses)
+        completed = iter_completed(calls, self.concurrency, throttle=self.rate_limiter.acquire, deadline=deadline)
+        for key, (coords, source) in completed:
+            yield from self._results(locations, indices[key], coords, source, source == 'gazetteer')
+
+    def _results(self, locations: List[str], positions: List[int], coords, source: Optional[str],
+                 degraded: bool) -> Iterator[Dict]:
+        """`degraded` marks gazetteer estimates, including ones served from the cache"""
+        for index in positions:
+            self.sources[source or 'unresolved'] += 1
+            yield {
+                'index': index,
+                'location': locations[index],
+                'coordinates': list(coords) if coords else None,
+                'source': source,
+                'degraded': degraded
+            }
@@ -0,0 +1,249 @@
+import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the cached value, or ``default`` if it is missing or expired"""
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry when full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class GeocodeCache:
+    """
+    Two-tier geocode cache: an in-process LRU in front of the persistent
+    GeocodeCacheEntry table. Failed lookups are cached as negative entries
+    with a shorter TTL so bad input does not keep spending API quota. Entries
+    remember whether their coordinates are a degraded (gazetteer) estimate.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, negative_ttl: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = LRUCache(maxsize=maxsize)
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'negative_hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def normalize(location: str) -> str:
+        """Normalize a location string into a cache key"""
+        parts = (' '.join(part.split()) for part in location.lower().split(','))
+        return ', '.join(part for part in parts if part)
+
+    def get(self, location: str) -> Tuple[bool, Optional[Tuple[float, float]], bool]:
+        """
+        Look up a location. Returns (found, coords, degraded); coords is None
+        for a cached negative result, degraded is True for gazetteer coordinates.
+        """
+        key = self.normalize(location)
+
+        item = self.memory.get(key)
+        if item is not MISSING:
+            coords, degraded = item
+            self._count('negative_hits' if coords is None else 'memory_hits')
+            return True, coords, degraded
+
+        entry = self._db_get(key)
+        if entry is not None:
+            coords, degraded = self._remember(entry)
+            return True, coords, degraded
+
+        self._count('misses')
+        return False, None, False
+
+    def get_many(self, locations: Iterable[str], chunk_size: int = 500) -> Dict[str, Tuple[Optional[Tuple[float, float]], bool]]:
+        """
+        Look up many locations at once: the LRU first, then one table query per
+        chunk of the remaining keys. Returns {key: (coords, degraded)} for the
+        normalized keys found; any other key is a miss.
+        """
+        found = {}
+        remaining = []
+        for key in dict.fromkeys(self.normalize(location) for location in locations):
+            item = self.memory.get(key)
+            if item is MISSING:
+                remaining.append(key)
+                continue
+            found[key] = item
+            self._count('negative_hits' if item[0] is None else 'memory_hits')
+
+        for start in range(0, len(remaining), chunk_size):
+            for entry in self._db_get_many(remaining[start:start + chunk_size]):
+                found[entry.query] = self._remember(entry)
+        self._count('misses', sum(1 for key in remaining if key not in found))
+        return found
+
+    def set(self, location: str, coords: Optional[Tuple[float, float]], ttl: Optional[int] = None,
+            degraded: bool = False):
+        """Cache a geocoding result; ``None`` records a negative result, ``degraded`` a gazetteer estimate"""
+        key = self.normalize(location)
+        if ttl is None:
+            ttl = self.ttl if coords is not None else self.negative_ttl
+        self.memory.set(key, (coords, degraded), ttl=ttl)
+        if len(key) > 255:
+            return
+
+        from ..models import GeocodeCacheEntry
+        try:
+            GeocodeCacheEntry.objects.update_or_create(
+                query=key,
+                defaults={
+                    'latitude': coords[0] if coords else None,
+                    'longitude': coords[1] if coords else None,
+                    'degraded': degraded,
+                    'expires_at': timezone.now() + timedelta(seconds=ttl),
+                }
+            )
+        except DatabaseError as e:
+            logger.warning(f"Could not persist geocode cache entry for '{key}': {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters for both tiers"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['memory_entries'] = len(self.memory)
+        return stats
+
+    def clear(self):
+        """Drop the in-process tier and reset counters (the table is left alone)"""
+        self.memory.clear()
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def _db_get(self, key: str):
+        from ..models import GeocodeCacheEntry
+        try:
+            return GeocodeCacheEntry.objects.filter(query=key, expires_at__gt=timezone.now()).first()
+        except DatabaseError as e:
+            logger.warning(f"Geocode cache lookup failed for '{key}': {e}")
+            return None
+
+    def _db_get_many(self, keys: List[str]) -> List:
+        from ..models import GeocodeCacheEntry
+        try:
+            return list(GeocodeCacheEntry.objects.filter(query__in=keys, expires_at__gt=timezone.now()))
+        except DatabaseError as e:
+            logger.warning(f"Geocode cache lookup failed for {len(keys)} keys: {e}")
+            return []
+
+    def _remember(self, entry) -> Tuple[Optional[Tuple[float, float]], bool]:
+        """Copy a table entry into the LRU for the rest of its lifetime and count the hit"""
+        coords = (entry.latitude, entry.longitude) if entry.latitude is not None else None
+        remaining = (entry.expires_at - timezone.now()).total_seconds()
+        self.memory.set(entry.query, (coords, entry.degraded), ttl=max(remaining, 1))
+        self._count('negative_hits' if coords is None else 'db_hits')
+        return coords, entry.degraded
+
+    def _count(self, name: str, count: int = 1):
+        with self._stats_lock:
+            self._stats[name] += count
+
+
+class RouteCache:
+    """
+    In-process cache of directions results keyed by waypoints snapped to a
+    grid, so repeated lanes plan without network I/O. Results are stored as
+    zlib-compressed JSON, which keeps hot lanes cheap to hold and hands every
+    caller its own copy.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, grid_degrees: float):
+        self.grid_degrees = grid_degrees
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._stats = {'hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+
+    def key(self, waypoints: List[Tuple[float, float]], profile: str, units: str) -> Tuple:
+        """Cache key: profile, units and every waypoint snapped to the grid"""
+        snapped = tuple(
+            (round(lat / self.grid_degrees), round(lon / self.grid_degrees))
+            for lat, lon in waypoints
+        )
+        return (profile, units, snapped)
+
+    def get(self, key: Tuple) -> Optional[Dict]:
+        blob = self.memory.get(key, None)
+        with self._stats_lock:
+            self._stats['hits' if blob is not None else 'misses'] += 1
+        if blob is None:
+            return None
+        return json.loads(zlib.decompress(blob))
+
+    def set(self, key: Tuple, route: Dict):
+        self.memory.set(key, zlib.compress(json.dumps(route, separators=(',', ':')).encode()))
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['entries'] = len(self.memory)
+        return stats
+
+    def clear(self):
+        self.memory.clear()
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+geocode_cache = GeocodeCache(
+    maxsize=getattr(settings, 'GEOCODE_CACHE_SIZE', 2048),
+    ttl=getattr(settings, 'GEOCODE_CACHE_TTL', 30 * 24 * 3600),
+    negative_ttl=getattr(settings, 'GEOCODE_NEGATIVE_CACHE_TTL', 15 * 60),
+)
+
+route_cache = RouteCache(
+    maxsize=getattr(settings, 'ROUTE_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'ROUTE_CACHE_TTL', 24 * 3600),
+    grid_degrees=getattr(settings, 'ROUTE_CACHE_GRID_DEGREES', 0.01),
+)
@@ -0,0 +1,132 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.core.cache import caches
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one upstream endpoint.
+
+    Each process tracks outcomes over a rolling window. When the failure rate
+    crosses the threshold, the breaker opens by writing an "open until"
+    timestamp to the Django cache, so every worker sharing that cache backend
+    fails fast together. Once the reset timeout passes, the breaker is
+    half-open and a single probe (guarded by cache.add) decides whether it
+    closes again. Only the caller holding the probe can close it: the grant
+    is remembered in a context variable, so a slow call that started before
+    the breaker opened and succeeds late is counted but closes nothing.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5,
+                 window: float = 60, reset_timeout: float = 30, cache_alias: str = 'default'):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.cache_alias = cache_alias
+        self._outcomes = deque()
+        self._lock = threading.Lock()
+        # Set in the context (thread or async task) that was granted the half-open probe
+        self._holds_probe = contextvars.ContextVar(f'circuit_{name}_holds_probe', default=False)
+
+    @property
+    def _cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def _open_key(self) -> str:
+        return f"circuit:{self.name}:open_until"
+
+    @property
+    def _probe_key(self) -> str:
+        return f"circuit:{self.name}:probe"
+
+    @property
+    def state(self) -> str:
+        open_until = self._cache.get(self._open_key)
+        if open_until is None:
+            return self.CLOSED
+        return self.OPEN if time.time() < open_until else self.HALF_OPEN
+
+    def allow_request(self) -> bool:
+        """Whether a call may go upstream right now"""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # Only one caller across all workers gets to probe
+            granted = self._cache.add(self._probe_key, True, timeout=self.reset_timeout)
+            if granted:
+                self._holds_probe.set(True)
+            return granted
+        return False
+
+    def record_success(self):
+        if self._holds_probe.get():
+            self._holds_probe.set(False)
+            logger.info(f"Circuit '{self.name}' closed after a successful probe")
+            self._cache.delete_many([self._open_key, self._probe_key])
+            with self._lock:
+                self._outcomes.clear()
+            return
+        self._record(True)
+
+    def record_failure(self):
+        self._holds_probe.set(False)
+        if self.state == self.HALF_OPEN:
+            self._open("probe failed")
+            return
+        self._record(False)
+
+    def reset(self):
+        self._holds_probe.set(False)
+        self._cache.delete_many([self._open_key, self._probe_key])
+        with self._lock:
+            self._outcomes.clear()
+
+    def _record(self, ok: bool):
+        now = time.time()
+        with self._lock:
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            failures = sum(1 for _, outcome in self._outcomes if not outcome)
+
+        if calls >= self.min_calls and failures / calls >= self.failure_rate:
+            self._open(f"{failures}/{calls} calls failed in the last {self.window:.0f}s")
+
+    def _open(self, reason: str):
+        open_until = time.time() + self.reset_timeout
+        # Keep the marker around past open_until so the half-open state is visible
+        self._cache.set(self._open_key, open_until, timeout=self.reset_timeout * 10)
+        self._cache.delete(self._probe_key)
+        with self._lock:
+            self._outcomes.clear()
+        logger.warning(f"Circuit '{self.name}' opened for {self.reset_timeout:.0f}s: {reason}")
+
+
+def _breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        failure_rate=getattr(settings, 'ORS_CIRCUIT_FAILURE_RATE', 0.5),
+        min_calls=getattr(settings, 'ORS_CIRCUIT_MIN_CALLS', 5),
+        window=getattr(settings, 'ORS_CIRCUIT_WINDOW', 60),
+        reset_timeout=getattr(settings, 'ORS_CIRCUIT_RESET_TIMEOUT', 30),
+        cache_alias=getattr(settings, 'ORS_CIRCUIT_CACHE', 'default'),
+    )
+
+
+geocode_breaker = _breaker('ors-geocode')
+directions_breaker = _breaker('ors-directions')
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, FIRST_EXCEPTION, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from django.conf import settings
+from django.db import close_old_connections
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool shared by every request; lookups are I/O bound so threads are enough
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PLAN_WORKER_THREADS', 16),
+    thread_name_prefix='planner'
+)
+
+# CPU-bound work (HOS scheduling for batches) goes to worker processes, created on first use
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a fan-out does not finish before its deadline. Carries the
+    results that did finish and the names of the calls that timed out.
+    """
+
+    def __init__(self, message: str, results: Optional[Dict[str, Any]] = None, timed_out: Sequence[str] = ()):
+        super().__init__(message)
+        self.results = results or {}
+        self.timed_out = list(timed_out)
+
+
+class Deadline:
+    """Absolute deadline shared by the stages of one plan"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+def _run_in_worker(fn: Callable[[], Any]) -> Any:
+    # Worker threads get their own DB connections; recycle them like Django does per request
+    close_old_connections()
+    try:
+        return fn()
+    finally:
+        close_old_connections()
+
+
+def run_concurrently(calls: Dict[str, Callable[[], Any]], deadline: Deadline) -> Dict[str, Any]:
+    """
+    Run independent calls on the shared pool and return their results by name.
+    As soon as one call raises, or the deadline passes, outstanding calls are
+    cancelled and the error (or DeadlineExceeded) is raised.
+    """
+    futures = {_executor.submit(_run_in_worker, fn): name for name, fn in calls.items()}
+    done, pending = wait(futures, timeout=deadline.remaining(), return_when=FIRST_EXCEPTION)
+
+    for future in done:
+        if future.exception() is not None:
+            for other in pending:
+                other.cancel()
+            raise future.exception()
+
+    if pending:
+        for future in pending:
+            future.cancel()
+        timed_out = sorted(futures[future] for future in pending)
+        names = ', '.join(timed_out)
+        logger.error(f"Deadline exceeded waiting for: {names}")
+        results = {futures[future]: future.result() for future in done}
+        raise DeadlineExceeded(f"Timed out waiting for {names}", results, timed_out)
+
+    return {name: future.result() for future, name in futures.items()}
+
+
+def iter_completed(calls: Iterable[Tuple[Hashable, Callable[[], Any]]], max_in_flight: int,
+                   throttle: Optional[Callable[[], Any]] = None,
+                   deadline: Optional[Deadline] = None) -> Iterator[Tuple[Hashable, Any]]:
+    """
+    Run (key, call) pairs on the shared pool with at most max_in_flight
+    outstanding, yielding (key, result) in completion order. throttle, if
+    given, is called before each submission (e.g. to wait for a rate-limit
+    token). When the deadline passes the iterator stops, so keys it never
+    yielded are the ones that timed out. Closing the iterator early cancels
+    calls that have not started.
+    """
+    calls = iter(calls)
+    pending = {}
+
+    def submit_next() -> bool:
+        call = next(calls, None)
+        if call is None:
+            return False
+        if throttle is not None:
+            throttle()
+        key, fn = call
+        pending[_executor.submit(_run_in_worker, fn)] = key
+        return True
+
+    try:
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        while pending:
+            timeout = deadline.remaining() if deadline is not None else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                names = ', '.join(sorted(str(key) for key in pending.values()))
+                logger.error(f"Deadline exceeded waiting for: {names}")
+                return
+            for future in done:
+                key = pending.pop(future)
+                yield key, future.result()
+            if deadline is not None and not deadline.remaining():
+                return
+            while len(pending) < max_in_flight and submit_next():
+                pass
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _get_process_pool() -> Optional[ProcessPoolExecutor]:
+    global _process_pool
+    processes = getattr(settings, 'PLAN_BATCH_PROCESSES', os.cpu_count() or 1)
+    if processes <= 1:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            # forkserver children do not inherit the parent's threads or DB connections
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _process_pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context(method))
+        return _process_pool
+
+
+def map_in_processes(fn: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+    """
+    fn(item) for each item on the shared process pool, in order. fn and the
+    items must pickle, so fn is a top-level function of a module that does
+    not need Django. Runs inline when PLAN_BATCH_PROCESSES is 1 or there is
+    only one item, and falls back to inline if the pool breaks.
+    """
+    global _process_pool
+    pool = _get_process_pool() if len(items) > 1 else None
+    if pool is None:
+        return [fn(item) for item in items]
+    try:
+        return list(pool.map(fn, items))
+    except BrokenProcessPool:
+        logger.error("Process pool broke; running the batch inline")
+        with _process_pool_lock:
+            if _process_pool is pool:
+                _process_pool = None
+        return [fn(item) for item in items]
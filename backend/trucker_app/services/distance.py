@@ -0,0 +1,60 @@
+from math import radians, sin, cos, sqrt, atan2
+from typing import Sequence, Tuple
+import numpy as np
+
+EARTH_RADIUS_MILES = 3959
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in miles between two points"""
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_MILES * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def _as_radians(points: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """(n, 2) array of [lat, lon] in radians; missing points become NaN rows"""
+    array = np.array(
+        [point if point is not None else (np.nan, np.nan) for point in points],
+        dtype=np.float64
+    ).reshape(-1, 2)
+    return np.radians(array)
+
+
+def haversine_matrix(origins: Sequence[Tuple[float, float]], destinations: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """N x M great-circle distances in miles between (lat, lon) origins and destinations"""
+    a, b = _as_radians(origins), _as_radians(destinations)
+    lat1, lon1 = a[:, 0:1], a[:, 1:2]
+    lat2, lon2 = b[:, 0], b[:, 1]
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_MILES * 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def equirectangular_matrix(origins: Sequence[Tuple[float, float]], destinations: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    N x M distances in miles using the equirectangular approximation.
+    Cheaper than haversine; error grows with distance (about 1% at a few hundred miles).
+    """
+    a, b = _as_radians(origins), _as_radians(destinations)
+    lat1, lon1 = a[:, 0:1], a[:, 1:2]
+    lat2, lon2 = b[:, 0], b[:, 1]
+    x = (lon2 - lon1) * np.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+    return EARTH_RADIUS_MILES * np.hypot(x, y)
+
+
+def nearest_k(matrix: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k smallest entries in each row, closest first (NaN sorts last)"""
+    k = min(k, matrix.shape[1])
+    if k <= 0:
+        return np.empty((matrix.shape[0], 0), dtype=np.intp)
+    filled = np.where(np.isnan(matrix), np.inf, matrix)
+    candidates = np.argpartition(filled, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(filled, candidates, axis=1).argsort(axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+DISTANCE_METHODS = {
+    'haversine': haversine_matrix,
+    'equirectangular': equirectangular_matrix,
+}
@@ -0,0 +1,220 @@
+"""
+Per-driver duty ledger for the rolling 70-hour / 8-day cycle.
+
+On-duty intervals are stored per day bucket, with a Fenwick (binary indexed)
+tree over the daily totals, so "on duty between A and B" costs O(log n) plus
+the intervals of the two boundary days. 34-hour restarts cut the window.
+
+Pure Python (no Django imports) like hos_simulator, which it plugs into
+through LedgerCycle.
+"""
+from bisect import bisect_right, insort
+from copy import deepcopy
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class FenwickTree:
+    """Prefix sums over a growable array of integers"""
+
+    def __init__(self, size: int = 16):
+        self._tree = [0] * (size + 1)
+        self._values = [0] * size
+
+    def __len__(self):
+        return len(self._values)
+
+    def _grow(self, size: int):
+        values = self._values + [0] * (size - len(self._values))
+        self._values = [0] * size
+        self._tree = [0] * (size + 1)
+        for i, value in enumerate(values):
+            if value:
+                self.add(i, value)
+
+    def add(self, index: int, delta: int):
+        if index >= len(self._values):
+            self._grow(max(index + 1, 2 * len(self._values)))
+        self._values[index] += delta
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int) -> int:
+        """Sum of values[0:index]"""
+        total = 0
+        i = min(index, len(self._values))
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def range(self, start: int, end: int) -> int:
+        """Sum of values[start:end]"""
+        if end <= start:
+            return 0
+        return self.prefix(end) - self.prefix(max(start, 0))
+
+
+class DutyLedger:
+    """
+    On-duty history for one driver, in minutes since `epoch` (a midnight).
+    Intervals must not overlap; they may be added in any order. A 34-hour gap
+    is recorded as a restart when the interval after it is appended, and an
+    interval added later inside that gap cancels it.
+    """
+
+    def __init__(self, epoch: datetime, window_days: int = 8, restart_minutes: int = 34 * 60):
+        self.epoch = epoch.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.window = window_days * MINUTES_PER_DAY
+        self.restart_minutes = restart_minutes
+        self._days = FenwickTree()
+        self._intervals: Dict[int, List[Tuple[int, int]]] = {}  # day -> sorted (start, end), clipped to the day
+        self._restarts: List[int] = []  # sorted end minutes of 34-hour rests
+        self._last_end: Optional[int] = None
+
+    @classmethod
+    def seeded(cls, start: datetime, cycle_used_hours: float, days: int = 7, **kwargs) -> 'DutyLedger':
+        """
+        Ledger for a driver whose only known history is the hours used in the
+        current cycle: spread them evenly over the `days` before `start`,
+        one block per day starting at 08:00
+        """
+        ledger = cls(start - timedelta(days=days + 1), **kwargs)
+        per_day = round(cycle_used_hours * 60 / days) if cycle_used_hours > 0 else 0
+        per_day = min(per_day, 16 * 60)
+        start_minute = ledger.minute(start)
+        for day in range(days, 0, -1):
+            block_start = (start_minute // MINUTES_PER_DAY - day) * MINUTES_PER_DAY + 8 * 60
+            block_end = min(block_start + per_day, start_minute)
+            if per_day and block_end > block_start:
+                ledger.add(block_start, block_end)
+        return ledger
+
+    def copy(self) -> 'DutyLedger':
+        """Independent copy, e.g. to try a plan without recording it"""
+        return deepcopy(self)
+
+    def minute(self, when: datetime) -> int:
+        """Ledger minute of a datetime"""
+        return int((when - self.epoch).total_seconds() // 60)
+
+    def at(self, minute: int) -> datetime:
+        return self.epoch + timedelta(minutes=minute)
+
+    def add(self, start: int, end: int):
+        """Record an on-duty interval; a 34-hour gap since the previous one counts as a restart"""
+        if end <= start:
+            return
+        if self._restarts and start < self._restarts[-1]:
+            # Duty inside a recorded 34-hour rest means it was not one
+            self._restarts = [
+                restart for restart in self._restarts
+                if not (restart - self.restart_minutes < end and start < restart)
+            ]
+        if self._last_end is not None and start - self._last_end >= self.restart_minutes:
+            self.add_restart(start)
+        self._last_end = end if self._last_end is None else max(self._last_end, end)
+
+        day = start // MINUTES_PER_DAY
+        while start < end:
+            day_end = (day + 1) * MINUTES_PER_DAY
+            piece_end = min(end, day_end)
+            intervals = self._intervals.setdefault(day, [])
+            # Extend the last interval when appending contiguous time (the common case)
+            if intervals and intervals[-1][1] == start:
+                intervals[-1] = (intervals[-1][0], piece_end)
+            else:
+                insort(intervals, (start, piece_end))
+            self._days.add(day, piece_end - start)
+            start, day = piece_end, day + 1
+
+    def add_restart(self, end: int):
+        """Record a 34-hour rest ending at `end`: earlier duty no longer counts toward the cycle"""
+        if not self._restarts or self._restarts[-1] < end:
+            self._restarts.append(end)
+        elif end not in self._restarts:
+            insort(self._restarts, end)
+
+    def last_restart(self, t: int) -> Optional[int]:
+        index = bisect_right(self._restarts, t)
+        return self._restarts[index - 1] if index else None
+
+    def on_duty_between(self, start: int, end: int) -> int:
+        """On-duty minutes in [start, end)"""
+        if end <= start:
+            return 0
+        first_day, last_day = start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY
+        if first_day == last_day:
+            return self._partial(first_day, start, end)
+        return (
+            self._partial(first_day, start, (first_day + 1) * MINUTES_PER_DAY)
+            + self._days.range(first_day + 1, last_day)
+            + self._partial(last_day, last_day * MINUTES_PER_DAY, end)
+        )
+
+    def window_start(self, t: int) -> int:
+        """Start of the cycle window at t: the trailing 8 days, cut at the last restart"""
+        restart = self.last_restart(t)
+        start = t - self.window
+        return max(start, restart) if restart is not None else start
+
+    def cycle_used(self, t: int) -> int:
+        """On-duty minutes counting toward the cycle at t"""
+        return self.on_duty_between(self.window_start(t), t)
+
+    def recovered_between(self, t0: int, t1: int) -> int:
+        """On-duty minutes that drop out of the trailing window between t0 and t1"""
+        return self.on_duty_between(t0 - self.window, t1 - self.window)
+
+    def recovery_time(self, t: int, needed: int, limit: int) -> int:
+        """
+        Earliest time from t at which `needed` cycle minutes are available,
+        assuming no further duty: walk the window's intervals in order, since
+        they drop out exactly 8 days after they happened
+        """
+        excess = self.cycle_used(t) - (limit - needed)
+        if excess <= 0:
+            return t
+        start = self.window_start(t)
+        for day in range(start // MINUTES_PER_DAY, t // MINUTES_PER_DAY + 1):
+            for begin, finish in self._intervals.get(day, ()):
+                begin, finish = max(begin, start), min(finish, t)
+                if finish <= begin:
+                    continue
+                if finish - begin >= excess:
+                    return begin + excess + self.window
+                excess -= finish - begin
+        return t + self.window
+
+    def _partial(self, day: int, start: int, end: int) -> int:
+        intervals = self._intervals.get(day)
+        if not intervals:
+            return 0
+        if start <= day * MINUTES_PER_DAY and end >= (day + 1) * MINUTES_PER_DAY:
+            return self._days.range(day, day + 1)
+        return sum(max(0, min(finish, end) - max(begin, start)) for begin, finish in intervals)
+
+
+class LedgerCycle:
+    """Cycle model for HOSSimulator backed by a DutyLedger; simulator minute 0 is ledger minute `offset`"""
+
+    def __init__(self, ledger: DutyLedger, offset: int, limit: int):
+        self.ledger = ledger
+        self.offset = offset
+        self.limit = limit
+
+    def available(self, t: int) -> int:
+        return self.limit - self.ledger.cycle_used(self.offset + t)
+
+    def record(self, start: int, end: int):
+        self.ledger.add(self.offset + start, self.offset + end)
+
+    def restart(self, t: int):
+        self.ledger.add_restart(self.offset + t)
+
+    def recovery_time(self, t: int, needed: int) -> Optional[int]:
+        return self.ledger.recovery_time(self.offset + t, needed, self.limit) - self.offset
@@ -0,0 +1,283 @@
+"""
+Compact schedule model for the HOS planner.
+
+A DutyTimeline keeps duty intervals as parallel arrays (start minute, end
+minute, status code, location id, remarks id, miles), with locations and
+remarks interned in one string table. Daily logs are day-sized slices of the
+same shape. Nothing is expanded into the nested API dicts until to_dict()
+at the response boundary.
+
+Pure Python (no Django imports) like hos_simulator.
+"""
+from array import array
+from datetime import datetime, time, timedelta
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+OFF_DUTY = 'off_duty'
+SLEEPER_BERTH = 'sleeper_berth'
+DRIVING = 'driving'
+ON_DUTY = 'on_duty_not_driving'
+DUTY_STATUSES = (OFF_DUTY, SLEEPER_BERTH, DRIVING, ON_DUTY)  # index = status code
+STATUS_CODES = {status: code for code, status in enumerate(DUTY_STATUSES)}
+OFF_DUTY_CODE, SLEEPER_BERTH_CODE, DRIVING_CODE, ON_DUTY_CODE = range(len(DUTY_STATUSES))
+
+MINUTES_PER_DAY = 24 * 60
+
+
+class Interval(NamedTuple):
+    """One row of a DutyTimeline, expanded"""
+    start: int  # minutes from the simulation start
+    end: int
+    status: str
+    location: str
+    remarks: str
+    miles: float = 0.0
+
+
+class DutyTimeline:
+    """Continuous duty intervals as parallel arrays"""
+    __slots__ = ('starts', 'ends', 'statuses', 'locations', 'remarks', 'miles', 'strings', '_string_ids')
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.statuses = array('b')
+        self.locations = array('l')  # ids into strings
+        self.remarks = array('l')
+        self.miles = array('d')
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Interval]:
+        return (self.interval(i) for i in range(len(self.starts)))
+
+    @property
+    def end(self) -> int:
+        return self.ends[-1] if self.ends else 0
+
+    def intern(self, text: str) -> int:
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = self._string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return string_id
+
+    def append(self, start: int, end: int, status: int, location: str, remarks: str, miles: float = 0.0):
+        """Add an interval, extending the last one when it continues it with the same status, location and remarks"""
+        location_id, remarks_id = self.intern(location), self.intern(remarks)
+        last = len(self.starts) - 1
+        if (last >= 0 and self.ends[last] == start and self.statuses[last] == status
+                and self.locations[last] == location_id and self.remarks[last] == remarks_id):
+            self.ends[last] = end
+            self.miles[last] += miles
+            return
+        self.starts.append(start)
+        self.ends.append(end)
+        self.statuses.append(status)
+        self.locations.append(location_id)
+        self.remarks.append(remarks_id)
+        self.miles.append(miles)
+
+    def extend(self, other: 'DutyTimeline', offset: int = 0):
+        """Append another timeline's intervals, shifted by `offset` minutes"""
+        strings = other.strings
+        for i in range(len(other.starts)):
+            self.append(other.starts[i] + offset, other.ends[i] + offset, other.statuses[i],
+                        strings[other.locations[i]], strings[other.remarks[i]], other.miles[i])
+
+    def until(self, minute: int) -> 'DutyTimeline':
+        """Copy of the timeline up to `minute`, splitting the interval it falls in (miles pro rata)"""
+        timeline = DutyTimeline()
+        for i in range(len(self.starts)):
+            start, end = self.starts[i], self.ends[i]
+            if start >= minute:
+                break
+            miles = self.miles[i] if end <= minute else self.miles[i] * (minute - start) / (end - start)
+            timeline.append(start, min(end, minute), self.statuses[i],
+                            self.strings[self.locations[i]], self.strings[self.remarks[i]], miles)
+        return timeline
+
+    def interval(self, i: int) -> Interval:
+        return Interval(
+            self.starts[i], self.ends[i], DUTY_STATUSES[self.statuses[i]],
+            self.strings[self.locations[i]], self.strings[self.remarks[i]], self.miles[i]
+        )
+
+
+def _clock(minute_of_day: int) -> time:
+    return time((minute_of_day // 60) % 24, minute_of_day % 60)
+
+
+class DayLog:
+    """One calendar day of a timeline; entry times are minutes of the day (1440 is midnight at the end)"""
+    __slots__ = ('date', 'number', 'starts', 'ends', 'statuses', 'locations', 'remarks', 'totals', 'miles')
+
+    def __init__(self, date, number: int):
+        self.date = date
+        self.number = number
+        self.starts = array('l')
+        self.ends = array('l')
+        self.statuses = array('b')
+        self.locations = array('l')
+        self.remarks = array('l')
+        self.totals = array('l', [0] * len(DUTY_STATUSES))  # minutes per status code
+        self.miles = 0.0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def push(self, status: int, begin: int, finish: int, location: int, remarks: int):
+        if finish <= begin:
+            return
+        self.totals[status] += finish - begin
+        last = len(self.starts) - 1
+        # Entries merge on status and location; the first entry's remarks are kept
+        if last >= 0 and self.statuses[last] == status and self.locations[last] == location:
+            self.ends[last] = finish
+            return
+        self.starts.append(begin)
+        self.ends.append(finish)
+        self.statuses.append(status)
+        self.locations.append(location)
+        self.remarks.append(remarks)
+
+    def hours(self, status: int) -> float:
+        return round(self.totals[status] / 60, 2)
+
+    def entry_times(self, i: int):
+        """(start_time, end_time) of entry i as datetime.time"""
+        return _clock(self.starts[i]), _clock(self.ends[i])
+
+    def to_dict(self, strings: List[str]) -> Dict:
+        entries = []
+        for i in range(len(self.starts)):
+            start_time, end_time = self.entry_times(i)
+            entries.append({
+                'duty_status': DUTY_STATUSES[self.statuses[i]],
+                'start_time': start_time,
+                'end_time': end_time,
+                'location': strings[self.locations[i]],
+                'remarks': strings[self.remarks[i]]
+            })
+        return {
+            'date': self.date,
+            'day_number': self.number,
+            'entries': entries,
+            'totals': {
+                'off_duty': self.hours(OFF_DUTY_CODE),
+                'sleeper_berth': self.hours(SLEEPER_BERTH_CODE),
+                'driving': self.hours(DRIVING_CODE),
+                'on_duty_not_driving': self.hours(ON_DUTY_CODE),
+                'total_miles': round(self.miles, 1)
+            }
+        }
+
+
+def split_days(timeline: DutyTimeline, start: datetime, origin: str) -> List[DayLog]:
+    """Split a timeline at midnight into day logs covering each full day, filling gaps with off duty"""
+    if not len(timeline):
+        return []
+    offset = start.hour * 60 + start.minute  # minute of day at simulation start
+    day_count = (offset + timeline.end - 1) // MINUTES_PER_DAY + 1
+    starts, ends, miles = timeline.starts, timeline.ends, timeline.miles
+    statuses, locations, remarks = timeline.statuses, timeline.locations, timeline.remarks
+    off_duty_remarks = timeline.intern('Off duty')
+
+    days = []
+    index = 0
+    where = timeline.intern(origin)  # location of the latest interval, used for off-duty gaps
+    for number in range(day_count):
+        day_start = number * MINUTES_PER_DAY - offset
+        day_end = day_start + MINUTES_PER_DAY
+        day = DayLog(start.date() + timedelta(days=number), number + 1)
+
+        cursor = day_start
+        while index < len(starts) and starts[index] < day_end:
+            begin, finish = max(starts[index], day_start), min(ends[index], day_end)
+            day.push(OFF_DUTY_CODE, cursor - day_start, begin - day_start, where, off_duty_remarks)
+            day.push(statuses[index], begin - day_start, finish - day_start, locations[index], remarks[index])
+            if miles[index] and finish > begin:
+                day.miles += miles[index] * (finish - begin) / (ends[index] - starts[index])
+            where = locations[index]
+            cursor = max(cursor, finish)
+            if ends[index] > day_end:
+                break
+            index += 1
+        day.push(OFF_DUTY_CODE, cursor - day_start, MINUTES_PER_DAY, where, off_duty_remarks)
+        days.append(day)
+    return days
+
+
+class Stop:
+    __slots__ = ('kind', 'start', 'minutes', 'distance', 'location', 'description')
+
+    def __init__(self, kind: str, start: int, minutes: int, distance: float, location: str, description: str):
+        self.kind = kind
+        self.start = start  # minutes from the simulation start
+        self.minutes = minutes
+        self.distance = distance  # miles from the start
+        self.location = location
+        self.description = description
+
+    def to_dict(self, start: Optional[datetime] = None) -> Dict:
+        return {
+            'type': self.kind,
+            'start': start + timedelta(minutes=self.start) if start is not None else self.start,
+            'duration': self.minutes / 60,
+            'distance_from_start': round(self.distance, 1),
+            'location': self.location,
+            'description': self.description
+        }
+
+
+class DutySchedule:
+    """A planned trip: timeline, stops and summary, expanded to the API format by to_dict()"""
+    __slots__ = ('timeline', 'stops', 'start', 'origin', 'total_distance', 'total_drive_time', 'warnings', '_days')
+
+    def __init__(self, timeline: DutyTimeline, stops: List[Stop], start: datetime, origin: str,
+                 total_distance: float, total_drive_time: float, warnings: Optional[List[str]] = None):
+        self.timeline = timeline
+        self.stops = stops
+        self.start = start
+        self.origin = origin
+        self.total_distance = total_distance
+        self.total_drive_time = total_drive_time
+        self.warnings = warnings or []
+        self._days: Optional[List[DayLog]] = None
+
+    @property
+    def end(self) -> datetime:
+        return self.start + timedelta(minutes=self.timeline.end)
+
+    def days(self) -> List[DayLog]:
+        if self._days is None:
+            self._days = split_days(self.timeline, self.start, self.origin)
+        return self._days
+
+    def count(self, kind: str) -> int:
+        return sum(1 for stop in self.stops if stop.kind == kind)
+
+    def summary(self) -> Dict:
+        """The trip_summary dict"""
+        return {
+            'total_distance': self.total_distance,
+            'total_drive_time': self.total_drive_time,
+            'estimated_total_time': self.timeline.end / 60,
+            'number_of_days': len(self.days()),
+            'fuel_stops_count': self.count('fuel'),
+            'mandatory_breaks_count': self.count('mandatory_break'),
+            'start_time': self.start,
+            'end_time': self.end
+        }
+
+    def to_dict(self) -> Dict:
+        """Schedule dict in the API format (trip_summary, daily_logs, stops, warnings)"""
+        return {
+            'trip_summary': self.summary(),
+            'daily_logs': [day.to_dict(self.timeline.strings) for day in self.days()],
+            'stops': [stop.to_dict(self.start) for stop in self.stops],
+            'warnings': list(self.warnings)
+        }
@@ -0,0 +1,198 @@
+import os
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'us_places.tsv')
+
+STATES = {
+    'al': 'alabama', 'ak': 'alaska', 'az': 'arizona', 'ar': 'arkansas', 'ca': 'california',
+    'co': 'colorado', 'ct': 'connecticut', 'de': 'delaware', 'dc': 'district of columbia',
+    'fl': 'florida', 'ga': 'georgia', 'hi': 'hawaii', 'id': 'idaho', 'il': 'illinois',
+    'in': 'indiana', 'ia': 'iowa', 'ks': 'kansas', 'ky': 'kentucky', 'la': 'louisiana',
+    'me': 'maine', 'md': 'maryland', 'ma': 'massachusetts', 'mi': 'michigan', 'mn': 'minnesota',
+    'ms': 'mississippi', 'mo': 'missouri', 'mt': 'montana', 'ne': 'nebraska', 'nv': 'nevada',
+    'nh': 'new hampshire', 'nj': 'new jersey', 'nm': 'new mexico', 'ny': 'new york',
+    'nc': 'north carolina', 'nd': 'north dakota', 'oh': 'ohio', 'ok': 'oklahoma', 'or': 'oregon',
+    'pa': 'pennsylvania', 'ri': 'rhode island', 'sc': 'south carolina', 'sd': 'south dakota',
+    'tn': 'tennessee', 'tx': 'texas', 'ut': 'utah', 'vt': 'vermont', 'va': 'virginia',
+    'wa': 'washington', 'wv': 'west virginia', 'wi': 'wisconsin', 'wy': 'wyoming',
+}
+STATE_ABBREVIATIONS = {name: abbr for abbr, name in STATES.items()}
+STATE_ABBREVIATIONS.update({abbr: abbr for abbr in STATES})
+STATE_ABBREVIATIONS['washington dc'] = 'dc'
+
+# Abbreviations expanded inside city names ("St. Louis" -> "saint louis")
+CITY_WORDS = {'st': 'saint', 'ste': 'sainte', 'ft': 'fort', 'mt': 'mount', 'pt': 'port'}
+COUNTRY_SUFFIXES = {'us', 'usa', 'united states', 'united states of america'}
+PUNCTUATION = str.maketrans({'.': '', "'": '', '-': ' ', '/': ' '})
+
+
+class Place(NamedTuple):
+    name: str
+    state: str
+    latitude: float
+    longitude: float
+
+
+def parse_location(location: str) -> Tuple[str, Optional[str]]:
+    """Split a free-form location into a normalized (city, state abbreviation) pair"""
+    parts = [' '.join(part.translate(PUNCTUATION).split()) for part in location.lower().split(',')]
+    parts = [part for part in parts if part and part not in COUNTRY_SUFFIXES]
+    if not parts:
+        return '', None
+
+    state = None
+    if len(parts) > 1:
+        state = STATE_ABBREVIATIONS.get(parts[1])
+        words = parts[0].split()
+    else:
+        # "Dallas TX" / "Dallas Texas": peel the longest trailing state name, keeping a city word
+        words = parts[0].split()
+        for size in (3, 2, 1):
+            if len(words) > size and ' '.join(words[-size:]) in STATE_ABBREVIATIONS:
+                state = STATE_ABBREVIATIONS[' '.join(words[-size:])]
+                words = words[:-size]
+                break
+
+    city = ' '.join(CITY_WORDS.get(word, word) for word in words)
+    return city, state
+
+
+def _deletes(word: str) -> List[str]:
+    return [word[:i] + word[i + 1:] for i in range(len(word))]
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)"""
+    previous_previous, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class Gazetteer:
+    """
+    Offline place lookup loaded once from a bundled TSV file. Indexes are
+    built at load time: exact (city, state) and city-only hash maps, a sorted
+    name list for prefix search, and a single-deletion map for typo-tolerant
+    matching, so a lookup never scans the whole table.
+    """
+
+    MIN_PREFIX_LENGTH = 4
+
+    def __init__(self, places: List[Place]):
+        self.places = places
+        self._exact: Dict[Tuple[str, str], Place] = {}
+        self._by_city: Dict[str, List[Place]] = {}
+        self._deletions: Dict[str, List[str]] = {}
+
+        for place in places:
+            city, state = parse_location(f"{place.name}, {place.state}")
+            self._exact[(city, state)] = place
+            self._by_city.setdefault(city, []).append(place)
+
+        self._names = sorted(self._by_city)
+        for city in self._names:
+            for deleted in set(_deletes(city)):
+                self._deletions.setdefault(deleted, []).append(city)
+
+    @classmethod
+    def load(cls, path: str) -> 'Gazetteer':
+        places = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                name, state, latitude, longitude = line.rstrip('\n').split('\t')
+                places.append(Place(name, state, float(latitude), float(longitude)))
+        logger.info(f"Loaded {len(places)} gazetteer places from {path}")
+        return cls(places)
+
+    def __len__(self):
+        return len(self.places)
+
+    def lookup(self, location: str) -> Optional[Place]:
+        """Resolve a location string: exact, then unique city, prefix and typo-tolerant matches (not for state names)"""
+        city, state = parse_location(location)
+        if not city:
+            return None
+
+        if state:
+            place = self._exact.get((city, state))
+            if place:
+                return place
+
+        place = self._pick(self._by_city.get(city, ()), state)
+        if place:
+            return place
+
+        if city in STATE_ABBREVIATIONS:
+            # A bare state is not a partial city name: "Indiana" must not resolve to Indianapolis
+            return None
+
+        place = self._pick(self._prefix_matches(city), state)
+        if place:
+            return place
+
+        return self._pick(self._fuzzy_matches(city), state)
+
+    def exact(self, location: str) -> Optional[Place]:
+        """Resolve only unambiguous exact matches: (city, state), or a city name that is unique"""
+        city, state = parse_location(location)
+        if state:
+            return self._exact.get((city, state))
+        return self._pick(self._by_city.get(city, ()), None)
+
+    def search(self, prefix: str, limit: int = 10) -> List[Place]:
+        """Places whose city name starts with the given text"""
+        city, state = parse_location(prefix)
+        matches = [place for place in self._prefix_matches(city) if not state or place.state.lower() == state]
+        return matches[:limit]
+
+    def _prefix_matches(self, city: str) -> List[Place]:
+        if len(city) < self.MIN_PREFIX_LENGTH:
+            return []
+        matches = []
+        for i in range(bisect_left(self._names, city), len(self._names)):
+            if not self._names[i].startswith(city):
+                break
+            matches.extend(self._by_city[self._names[i]])
+        return matches
+
+    def _fuzzy_matches(self, city: str) -> List[Place]:
+        candidates = set(self._deletions.get(city, ()))
+        for deleted in _deletes(city):
+            if deleted in self._by_city:
+                candidates.add(deleted)
+            candidates.update(self._deletions.get(deleted, ()))
+
+        best, matches = None, []
+        for candidate in candidates:
+            distance = _edit_distance(city, candidate)
+            if distance > 1 and len(city) < 8:
+                continue
+            if best is None or distance < best:
+                best, matches = distance, list(self._by_city[candidate])
+            elif distance == best:
+                matches.extend(self._by_city[candidate])
+        return matches
+
+    @staticmethod
+    def _pick(places, state: Optional[str]) -> Optional[Place]:
+        """Return the single match consistent with the state, if there is exactly one"""
+        if state:
+            places = [place for place in places if place.state.lower() == state]
+        return places[0] if len(places) == 1 else None
+
+
+gazetteer = Gazetteer.load(getattr(settings, 'GAZETTEER_PATH', DEFAULT_GAZETTEER_PATH))
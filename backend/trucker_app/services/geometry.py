@@ -0,0 +1,118 @@
+from math import hypot
+from typing import Dict, List, Optional, Sequence, Tuple
+from .distance import haversine_matrix
+
+GEOMETRY_FORMATS = ('geojson', 'polyline')
+
+
+def tolerance_for_zoom(zoom: float) -> float:
+    """Simplification tolerance in degrees: roughly one screen pixel at the given web-map zoom"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify(coordinates: List[Sequence[float]], tolerance: float) -> List[Sequence[float]]:
+    """Douglas-Peucker simplification (iterative, keeps both endpoints)"""
+    if tolerance <= 0 or len(coordinates) < 3:
+        return list(coordinates)
+
+    xs = [point[0] for point in coordinates]
+    ys = [point[1] for point in coordinates]
+    keep = [False] * len(coordinates)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(coordinates) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xs[first], ys[first]
+        dx, dy = xs[last] - ax, ys[last] - ay
+        length = hypot(dx, dy)
+        index = -1
+        if length == 0:
+            # Closed loop: measure distance from the shared endpoint instead
+            max_distance = tolerance
+            for i in range(first + 1, last):
+                distance = hypot(xs[i] - ax, ys[i] - ay)
+                if distance > max_distance:
+                    index, max_distance = i, distance
+        else:
+            # Compare |cross product| against tolerance * length to avoid a division per point
+            max_cross = tolerance * length
+            for i in range(first + 1, last):
+                cross = abs(dy * (xs[i] - ax) - dx * (ys[i] - ay))
+                if cross > max_cross:
+                    index, max_cross = i, cross
+        if index != -1:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(coordinates, keep) if kept]
+
+
+def driven_part(coordinates: List[Sequence[float]], position: Tuple[float, float]) -> List[Sequence[float]]:
+    """GeoJSON [lon, lat] coordinates up to the vertex nearest a (lat, lon) position: the part already driven"""
+    if not coordinates:
+        return []
+    miles = haversine_matrix([position], [(lat, lon) for lon, lat, *_ in coordinates])[0]
+    return list(coordinates[:int(miles.argmin()) + 1])
+
+
+def encode_polyline(coordinates: List[Sequence[float]], precision: int = 5) -> str:
+    """Encode GeoJSON [lon, lat] coordinates with Google's encoded polyline algorithm"""
+    factor = 10 ** precision
+    chunks = []
+    previous_lat = previous_lon = 0
+    for lon, lat, *_ in coordinates:
+        lat, lon = int(round(lat * factor)), int(round(lon * factor))
+        for delta in (lat - previous_lat, lon - previous_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            chunks.append(chr(value + 63))
+        previous_lat, previous_lon = lat, lon
+    return ''.join(chunks)
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> List[List[float]]:
+    """Decode an encoded polyline back into GeoJSON [lon, lat] coordinates"""
+    factor = 10 ** precision
+    coordinates = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coordinates.append([lon / factor, lat / factor])
+    return coordinates
+
+
+def compact_route(route: Dict, tolerance: Optional[float] = None, geometry_format: str = 'geojson',
+                  include_instructions: bool = True) -> Dict:
+    """
+    Return a copy of a route result prepared for the API response: geometry
+    simplified to the tolerance, optionally polyline-encoded, and instructions
+    optionally dropped.
+    """
+    compacted = dict(route)
+    coordinates = route['geometry']['coordinates']
+    if tolerance:
+        coordinates = simplify(coordinates, tolerance)
+
+    if geometry_format == 'polyline':
+        compacted['geometry'] = {'type': 'polyline', 'precision': 5, 'points': encode_polyline(coordinates)}
+    else:
+        compacted['geometry'] = {'type': 'LineString', 'coordinates': coordinates}
+
+    if not include_instructions:
+        compacted.pop('instructions', None)
+    return compacted
@@ -1,6 +1,11 @@
-from datetime import datetime, timedelta, time
-from typing import List, Dict, Tuple
-from ..models import Trip, DailyLog, LogEntry
+from datetime import datetime, time, timedelta
+from typing import List, Dict, Optional, Sequence, Tuple, Union
+from ..models import Trip
+from .hos_simulator import HOSSimulator, Leg, PROPERTY_70_8, timeline_from_logs, as_date
+from .duty_schedule import DutySchedule, DutyTimeline
+from .duty_ledger import DutyLedger
+from .schedule_planner import ScheduleRequest, Replanned, plan_schedule, replan_schedule, validate_timeline
+from .schedule_sweep import sweep, best_options
 
 class HOSComplianceService:
     """Service for Hours of Service compliance calculations"""
@@ -14,225 +19,116 @@ class HOSComplianceService:
     MIN_OFF_DUTY_HOURS = 10
     
     def __init__(self):
-        pass
+        self.rules = PROPERTY_70_8
+        self.simulator = HOSSimulator(self.rules)
     
-    def calculate_trip_schedule(self, trip: Trip, route_data: Dict) -> Dict:
+    def calculate_trip_schedule(self, trip: Trip, route_data: Dict, start_time: Optional[datetime] = None,
+                                ledger: Optional[DutyLedger] = None) -> DutySchedule:
         """
         Calculate complete trip schedule with HOS compliance
-        Returns schedule with daily logs, stops, and rest periods
-        """
-        total_distance = route_data['distance']
-        total_drive_time = route_data['duration']
-        
-        # Calculate required stops
-        fuel_stops = self._calculate_fuel_stops(total_distance)
-        mandatory_breaks = self._calculate_mandatory_breaks(total_drive_time)
-        daily_rest_periods = self._calculate_daily_rest_periods(total_drive_time, trip.current_cycle_used)
-        
-        # Generate schedule
-        schedule = self._generate_schedule(
-            trip, total_distance, total_drive_time, 
-            fuel_stops, mandatory_breaks, daily_rest_periods
-        )
+        Returns a DutySchedule; its to_dict() has the daily logs, stops, and rest periods
         
-        return schedule
+        Pass the driver's DutyLedger to plan against their real duty history
+        (it is updated with this trip); otherwise trip.current_cycle_used is
+        spread over the previous 7 days.
+        """
+        # One simulation pass over both legs: drive to pickup, load, drive to dropoff, unload
+        return plan_schedule(self.schedule_request(trip, route_data, start_time), self.rules, ledger)
     
-    def _calculate_fuel_stops(self, total_distance: float) -> List[Dict]:
-        """Calculate fuel stops every 1000 miles"""
-        fuel_stops = []
-        miles_per_fuel_stop = 1000
-        
-        num_fuel_stops = int(total_distance // miles_per_fuel_stop)
-        
-        for i in range(num_fuel_stops):
-            distance_from_start = (i + 1) * miles_per_fuel_stop
-            fuel_stops.append({
-                'type': 'fuel',
-                'distance_from_start': distance_from_start,
-                'duration': 1.0,  # 1 hour for fueling
-                'description': f'Fuel Stop at {distance_from_start} miles'
-            })
-        
-        return fuel_stops
+    def schedule_request(self, trip: Trip, route_data: Dict, start_time: Optional[datetime] = None,
+                         picked_up: bool = False) -> ScheduleRequest:
+        """Picklable scheduling input for a routed trip (see schedule_planner)"""
+        return ScheduleRequest(
+            tuple(self._trip_legs(trip, route_data, picked_up)),
+            trip.current_location,
+            start_time or datetime.now(),
+            trip.current_cycle_used,
+            route_data['distance'],
+            route_data['duration'],
+            trip.sleeper_split
+        )
     
-    def _calculate_mandatory_breaks(self, total_drive_time: float) -> List[Dict]:
-        """Calculate mandatory 30-minute breaks every 8 hours of driving"""
-        breaks = []
-        cumulative_drive_time = 0
-        
-        while cumulative_drive_time + self.MANDATORY_BREAK_AFTER_HOURS < total_drive_time:
-            cumulative_drive_time += self.MANDATORY_BREAK_AFTER_HOURS
-            breaks.append({
-                'type': 'mandatory_break',
-                'after_drive_hours': cumulative_drive_time,
-                'duration': self.MANDATORY_BREAK_HOURS,
-                'description': f'Mandatory 30-min break after {cumulative_drive_time} hours driving'
-            })
-        
-        return breaks
+    def replan_from_position(self, trip: Trip, history: DutyTimeline, history_start: datetime, route_data: Dict,
+                             position: str, at: datetime, picked_up: bool) -> Replanned:
+        """
+        Re-plan the rest of a trip from a position update at `at`. route_data
+        runs from the position (via the pickup unless picked_up) to the
+        dropoff; `history` is the logged schedule, minute 0 at history_start.
+        """
+        request = self.schedule_request(trip, route_data, at, picked_up)._replace(origin=position)
+        return replan_schedule(history, history_start, request, self.rules)
     
-    def _calculate_daily_rest_periods(self, total_drive_time: float, current_cycle_used: float) -> List[Dict]:
-        """Calculate required daily rest periods"""
-        rest_periods = []
-        cumulative_hours = current_cycle_used
-        day = 1
-        
-        # Simulate daily driving schedule
-        remaining_drive_time = total_drive_time
-        
-        while remaining_drive_time > 0:
-            # Calculate how much we can drive today considering HOS limits
-            hours_available_in_cycle = max(0, self.MAX_CYCLE_HOURS - cumulative_hours)
-            max_duty_today = min(self.MAX_DUTY_HOURS_WINDOW, hours_available_in_cycle)
-            max_drive_today = min(self.MAX_DRIVING_HOURS_PER_DAY, remaining_drive_time)
-            
-            # Account for breaks and other duties (pickup/delivery time, fuel stops)
-            estimated_non_drive_time = 2  # Base time for inspections, breaks, etc.
-            
-            if max_duty_today <= estimated_non_drive_time:
-                # Need rest before continuing
-                rest_periods.append({
-                    'type': 'daily_rest',
-                    'day': day,
-                    'duration': self.MIN_OFF_DUTY_HOURS,
-                    'reason': 'Daily rest period - HOS compliance',
-                    'cumulative_cycle_hours': cumulative_hours
-                })
-                cumulative_hours = max(0, cumulative_hours - 24)  # Hours drop off after 8 days
-                day += 1
-                continue
-            
-            # Calculate actual drive time for today
-            actual_drive_today = min(max_drive_today, max_duty_today - estimated_non_drive_time)
-            actual_duty_today = actual_drive_today + estimated_non_drive_time
-            
-            remaining_drive_time -= actual_drive_today
-            cumulative_hours += actual_duty_today
-            
-            if remaining_drive_time > 0:
-                # Need daily rest
-                rest_periods.append({
-                    'type': 'daily_rest',
-                    'day': day,
-                    'duration': self.MIN_OFF_DUTY_HOURS,
-                    'drive_time_today': actual_drive_today,
-                    'duty_time_today': actual_duty_today,
-                    'cumulative_cycle_hours': cumulative_hours
-                })
-            
-            day += 1
-        
-        return rest_periods
+    def _trip_legs(self, trip: Trip, route_data: Dict, picked_up: bool = False) -> List[Leg]:
+        """Simulator legs from the route; a route without per-leg data is driven as one leg"""
+        if picked_up:
+            return [Leg(route_data['distance'], route_data['duration'], trip.dropoff_location, 'dropoff')]
+        legs = route_data.get('legs')
+        if not legs:
+            return [
+                Leg(0, 0, trip.pickup_location, 'pickup'),
+                Leg(route_data['distance'], route_data['duration'], trip.dropoff_location, 'dropoff')
+            ]
+        to_pickup, to_dropoff = legs
+        return [
+            Leg(to_pickup['distance'], to_pickup['duration'], trip.pickup_location, 'pickup'),
+            Leg(to_dropoff['distance'], to_dropoff['duration'], trip.dropoff_location, 'dropoff')
+        ]
     
-    def _generate_schedule(self, trip: Trip, total_distance: float, total_drive_time: float,
-                          fuel_stops: List[Dict], mandatory_breaks: List[Dict], 
-                          daily_rest_periods: List[Dict]) -> Dict:
-        """Generate complete trip schedule"""
+    def sweep_departures(self, trip: Trip, route_data: Dict, departures: Sequence[datetime],
+                         cycle_hours: Sequence[float], dock_hours: Optional[Tuple[int, int]] = None,
+                         include_all: bool = False) -> Dict:
+        """
+        What-if schedules for every departure x cycle-hours combination, with
+        the Pareto-best options per cycle-hours value. Uses the batched
+        simulator, which models cycle hours as a running total with 34-hour
+        restarts rather than the rolling 8-day ledger.
+        """
+        departures = [when.replace(second=0, microsecond=0) for when in departures]
+        reference = min(departures).replace(hour=0, minute=0)
+        minutes = [int((when - reference).total_seconds() // 60) for when in departures]
+        used = [round(hours * 60) for hours in cycle_hours]
+        
+        result = sweep(
+            self._trip_legs(trip, route_data),
+            [minute for _ in used for minute in minutes],
+            [value for value in used for _ in minutes],
+            self.rules,
+            dock_hours
+        )
         
-        # Start time (current time for simplicity)
-        current_time = datetime.now()
+        def option(i: int) -> Dict:
+            return {
+                'departure': reference + timedelta(minutes=int(result.departure[i])),
+                'arrival': reference + timedelta(minutes=int(result.arrival[i])),
+                'cycle_used': int(result.cycle_used[i]) / 60,
+                'elapsed_hours': round(int(result.elapsed[i]) / 60, 2),
+                'number_of_days': int(result.days[i]),
+                'daily_rests': int(result.daily_rests[i]),
+                'restarts': int(result.restarts[i]),
+                'mandatory_breaks': int(result.breaks[i]),
+                'fuel_stops': int(result.fuel_stops[i]),
+                'dock_wait_hours': round(int(result.dock_wait[i]) / 60, 2)
+            }
         
-        schedule = {
-            'trip_summary': {
-                'total_distance': total_distance,
-                'total_drive_time': total_drive_time,
-                'estimated_total_time': total_drive_time + sum(stop['duration'] for stop in fuel_stops) + 
-                                      sum(break_['duration'] for break_ in mandatory_breaks) +
-                                      sum(rest['duration'] for rest in daily_rest_periods),
-                'number_of_days': len(daily_rest_periods) + 1,
-                'fuel_stops_count': len(fuel_stops),
-                'mandatory_breaks_count': len(mandatory_breaks)
-            },
-            'daily_logs': [],
-            'stops': [],
-            'warnings': []
+        response = {
+            'candidates': len(result.departure),
+            'total_distance': route_data['distance'],
+            'total_drive_time': route_data['duration'],
+            'options': [
+                {'cycle_used': value / 60, 'pareto': [option(i) for i in front]}
+                for value, front in best_options(result).items()
+            ]
         }
-        
-        # Check cycle hours compliance
-        final_cycle_hours = trip.current_cycle_used + schedule['trip_summary']['estimated_total_time']
-        if final_cycle_hours > self.MAX_CYCLE_HOURS:
-            schedule['warnings'].append(
-                f"Trip may exceed 70-hour cycle limit. Current: {trip.current_cycle_used:.1f}h, "
-                f"Estimated additional: {schedule['trip_summary']['estimated_total_time']:.1f}h"
-            )
-        
-        # Generate daily logs
-        self._generate_daily_logs(schedule, daily_rest_periods, current_time)
-        
-        return schedule
+        if include_all:
+            response['all'] = [option(i) for i in range(len(result.departure))]
+        return response
     
-    def _generate_daily_logs(self, schedule: Dict, daily_rest_periods: List[Dict], start_time: datetime):
-        """Generate daily log entries for the trip"""
-        current_time = start_time
-        
-        for i, rest_period in enumerate(daily_rest_periods):
-            day_number = i + 1
-            
-            # Calculate drive time and duty time for this day
-            drive_time = rest_period.get('drive_time_today', 0)
-            duty_time = rest_period.get('duty_time_today', 0)
-            
-            daily_log = {
-                'date': current_time.date(),
-                'day_number': day_number,
-                'entries': [],
-                'totals': {
-                    'off_duty': rest_period['duration'],
-                    'sleeper_berth': 0,
-                    'driving': drive_time,
-                    'on_duty_not_driving': duty_time - drive_time,
-                    'total_miles': 0  # Would be calculated based on route segments
-                }
-            }
-            
-            # Add log entries for the day
-            day_start = current_time.replace(hour=6, minute=0, second=0, microsecond=0)
-            
-            # Off duty period (previous night's rest)
-            if i > 0:
-                daily_log['entries'].append({
-                    'duty_status': 'off_duty',
-                    'start_time': time(0, 0),
-                    'end_time': time(6, 0),
-                    'location': 'Rest Area',
-                    'remarks': 'Daily rest period'
-                })
-            
-            # On duty and driving periods
-            if drive_time > 0:
-                driving_start = 6.0  # 6:00 AM
-                driving_end = driving_start + drive_time
-                
-                daily_log['entries'].append({
-                    'duty_status': 'driving',
-                    'start_time': time(int(driving_start), int((driving_start % 1) * 60)),
-                    'end_time': time(int(driving_end), int((driving_end % 1) * 60)),
-                    'location': 'En Route',
-                    'remarks': 'Driving to destination'
-                })
-            
-            schedule['daily_logs'].append(daily_log)
-            current_time += timedelta(days=1)
-    
-    def validate_hos_compliance(self, schedule: Dict) -> List[str]:
-        """Validate the schedule against HOS regulations"""
-        violations = []
-        
-        for daily_log in schedule['daily_logs']:
-            # Check 11-hour driving limit
-            if daily_log['totals']['driving'] > self.MAX_DRIVING_HOURS_PER_DAY:
-                violations.append(
-                    f"Day {daily_log['day_number']}: Exceeds 11-hour driving limit "
-                    f"({daily_log['totals']['driving']:.1f} hours)"
-                )
-            
-            # Check 14-hour duty window
-            total_duty = (daily_log['totals']['driving'] + 
-                         daily_log['totals']['on_duty_not_driving'])
-            if total_duty > self.MAX_DUTY_HOURS_WINDOW:
-                violations.append(
-                    f"Day {daily_log['day_number']}: Exceeds 14-hour duty window "
-                    f"({total_duty:.1f} hours)"
-                )
-        
-        return violations
+    def validate_hos_compliance(self, schedule: Union[DutySchedule, Dict], current_cycle_used: float = 0) -> List[str]:
+        """Validate a DutySchedule (or a schedule dict) against HOS regulations, shift by shift"""
+        if isinstance(schedule, DutySchedule):
+            timeline, start = schedule.timeline, schedule.start
+        else:
+            # Rebuilt timelines start at midnight of the first log day
+            timeline = timeline_from_logs(schedule['daily_logs'])
+            start = datetime.combine(as_date(schedule['daily_logs'][0]['date']), time(0)) if timeline else datetime.now()
+        return validate_timeline(timeline, start, current_cycle_used, self.rules)
@@ -0,0 +1,464 @@
+"""
+Event-driven Hours of Service simulator (property-carrying, 70 hours / 8 days).
+
+The driver clock advances once through drive, on-duty, break, fuel and rest
+events, enforcing the 11-hour driving, 14-hour window, 30-minute break and
+cycle limits inline. Output is an exact minute-resolution DutyTimeline.
+
+This module is pure Python with no Django imports so it can run in worker
+processes.
+"""
+from datetime import date, datetime, time
+from math import ceil
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from .duty_schedule import (
+    STATUS_CODES, MINUTES_PER_DAY, OFF_DUTY_CODE, SLEEPER_BERTH_CODE, DRIVING_CODE, ON_DUTY_CODE,
+    DutyTimeline, DutySchedule, Stop
+)
+
+
+class Rules(NamedTuple):
+    """HOS limits in minutes (miles for the fuel interval)"""
+    max_driving: int = 11 * 60
+    duty_window: int = 14 * 60
+    cycle_limit: int = 70 * 60
+    cycle_days: int = 8
+    break_after: int = 8 * 60
+    break_length: int = 30
+    daily_rest: int = 10 * 60
+    restart: int = 34 * 60
+    fuel_interval: float = 1000.0
+    fuel_time: int = 60
+    stop_time: int = 60  # pickup / dropoff
+    # Split sleeper berth: two rests of at least split_rest and split_sleeper (in the berth)
+    # totalling daily_rest; (sleeper, companion) pairs the planner may use
+    split_sleeper: int = 7 * 60
+    split_rest: int = 2 * 60
+    splits: Tuple[Tuple[int, int], ...] = ((7 * 60, 3 * 60), (8 * 60, 2 * 60))
+
+
+PROPERTY_70_8 = Rules()
+
+
+class Leg(NamedTuple):
+    """One driving leg; `stop` ('pickup' / 'dropoff') adds on-duty time on arrival"""
+    miles: float
+    hours: float
+    destination: str
+    stop: Optional[str] = None
+
+
+class DriverClocks(NamedTuple):
+    """Driver state when the simulation starts, in minutes"""
+    driving: int = 0  # driven since the last 10-hour rest (or qualifying split)
+    window: Optional[int] = None  # counted toward the current 14-hour window; None if rested
+    since_break: int = 0  # driven since the last 30-minute interruption
+    cycle_used: int = 0  # on duty within the cycle
+    resting: int = 0  # off duty / sleeper berth just before the start; credited to a 10-hour rest taken right away
+
+
+class SimpleCycle:
+    """
+    Cycle hours as one running total: nothing drops off, only a 34-hour
+    restart recovers time. duty_ledger.LedgerCycle is the rolling-window model.
+    """
+
+    def __init__(self, used: int, limit: int):
+        self.used = used
+        self.limit = limit
+
+    def available(self, t: int) -> int:
+        return self.limit - self.used
+
+    def record(self, start: int, end: int):
+        self.used += end - start
+
+    def restart(self, t: int):
+        self.used = 0
+
+    def recovery_time(self, t: int, needed: int) -> Optional[int]:
+        """Earliest time `needed` minutes become available without a restart (None: never)"""
+        return None
+
+
+class RestChoice(NamedTuple):
+    """A rest the simulator can take at a decision point"""
+    kind: str  # stop type
+    status: int
+    minutes: int
+    remarks: str
+    split: bool = False  # one half of a split sleeper-berth pair
+
+
+def pairs(first: Tuple[int, int], second: Tuple[int, int], rules: Rules = PROPERTY_70_8) -> bool:
+    """Whether two (status, minutes) rests form a split sleeper-berth pair"""
+    (status_a, minutes_a), (status_b, minutes_b) = first, second
+    if minutes_a + minutes_b < rules.daily_rest or min(minutes_a, minutes_b) < rules.split_rest:
+        return False
+    return any(
+        status == SLEEPER_BERTH_CODE and minutes >= rules.split_sleeper
+        for status, minutes in (first, second)
+    )
+
+
+def _split_rest(status: int, minutes: int) -> RestChoice:
+    if status == SLEEPER_BERTH_CODE:
+        return RestChoice('sleeper_berth', SLEEPER_BERTH_CODE, minutes, f"Sleeper berth ({minutes // 60}h split)", True)
+    return RestChoice('split_rest', OFF_DUTY_CODE, minutes, f"Off duty ({minutes // 60}h split)", True)
+
+
+def rest_options(rules: Rules, at_limit: bool, pending: Optional[Tuple[int, int]]) -> List[RestChoice]:
+    """
+    Rests allowed at a decision point: at a driving or window limit (at_limit)
+    or when the 30-minute break is due. The first option is the plain
+    10-hour rest or 30-minute break; the others start a split pair, or
+    complete the pending half of one.
+    """
+    if at_limit:
+        options = [RestChoice('daily_rest', OFF_DUTY_CODE, rules.daily_rest, 'Daily rest period')]
+    else:
+        options = [RestChoice('mandatory_break', OFF_DUTY_CODE, rules.break_length, '30-minute break')]
+    if pending is not None:
+        status, minutes = pending
+        if status == SLEEPER_BERTH_CODE:
+            options.append(_split_rest(OFF_DUTY_CODE, max(rules.split_rest, rules.daily_rest - minutes)))
+        else:
+            options.append(_split_rest(SLEEPER_BERTH_CODE, max(rules.split_sleeper, rules.daily_rest - minutes)))
+    elif not at_limit:
+        # Starting a pair at the limit gains nothing: the time before it still counts
+        for sleeper, companion in rules.splits:
+            options.append(_split_rest(OFF_DUTY_CODE, companion))
+            options.append(_split_rest(SLEEPER_BERTH_CODE, sleeper))
+    return options
+
+
+class SimulationResult(NamedTuple):
+    timeline: DutyTimeline
+    stops: List[Stop]
+    end: int
+    miles: float
+    clocks: DriverClocks
+
+
+class HOSSimulator:
+    """Single linear pass over the legs of a trip"""
+
+    def __init__(self, rules: Rules = PROPERTY_70_8):
+        self.rules = rules
+
+    def run(self, legs: Sequence[Leg], origin: str, clocks: DriverClocks = DriverClocks(),
+            cycle=None, rests: Sequence[int] = ()) -> SimulationResult:
+        """
+        `rests` picks, for each decision point in order, an index into its
+        rest_options; missing or out-of-range entries take the plain rest
+        """
+        rules = self.rules
+        cycle = cycle if cycle is not None else SimpleCycle(clocks.cycle_used, rules.cycle_limit)
+        timeline = DutyTimeline()
+        stops: List[Stop] = []
+
+        t = 0
+        driving = clocks.driving
+        window = clocks.window  # None until the window opens
+        since_break = clocks.since_break
+        miles_done = 0.0
+        miles_since_fuel = 0.0
+        # Unpaired split rest (status, minutes), and driving / window time since it ended
+        pending = None
+        drive_after = window_after = 0
+        decisions = 0
+        resting = clocks.resting  # rest in progress, until the first on-duty time
+
+        def add(status: int, minutes: int, where: str, remarks: str, miles: float = 0.0, split: bool = False):
+            nonlocal t, window, window_after, resting
+            if minutes <= 0:
+                return
+            if status in (DRIVING_CODE, ON_DUTY_CODE):
+                resting = 0
+                cycle.record(t, t + minutes)
+                if window is None:
+                    window = 0
+            # Split rests do not count toward the 14-hour window
+            if window is not None and not split:
+                window += minutes
+                window_after += minutes
+            timeline.append(t, t + minutes, status, where, remarks, miles)
+            t += minutes
+
+        def stop(kind: str, status: int, minutes: int, where: str, remarks: str, split: bool = False):
+            nonlocal driving, window, since_break, pending, drive_after, window_after, resting
+            if kind in ('daily_rest', 'cycle_restart') and resting:
+                # A rest already in progress at the start counts toward it
+                minutes = max(1, minutes - resting)
+                rested, resting = minutes + resting, 0
+            else:
+                rested = minutes
+            stops.append(Stop(kind, t, minutes, miles_done, where, remarks))
+            add(status, minutes, where, remarks, split=split)
+            if minutes >= rules.break_length:
+                since_break = 0
+            if status in (OFF_DUTY_CODE, SLEEPER_BERTH_CODE) and rested >= rules.daily_rest:
+                driving = 0
+                window = None
+                pending = None
+            elif split:
+                # Completing a pair recalculates the limits from the end of its first rest
+                if pending is not None and pairs(pending, (status, minutes), rules):
+                    driving, window = drive_after, window_after
+                pending = (status, minutes)
+                drive_after = window_after = 0
+
+        def rest(at_limit: bool, where: str):
+            nonlocal decisions
+            options = rest_options(rules, at_limit, pending)
+            index = rests[decisions] if decisions < len(rests) else 0
+            decisions += 1
+            choice = options[index] if 0 <= index < len(options) else options[0]
+            stop(choice.kind, choice.status, choice.minutes, where, choice.remarks, choice.split)
+
+        for leg in legs:
+            remaining = max(1, round(leg.hours * 60)) if leg.hours > 0 or leg.miles > 0 else 0
+            miles_per_minute = leg.miles / remaining if remaining else 0.0
+            leg_miles = leg.miles
+            en_route = f"En route to {leg.destination}"
+
+            while remaining > 0:
+                mile_marker = f"mile {miles_done:.0f}"
+                if miles_since_fuel >= rules.fuel_interval - 1e-6:
+                    stop('fuel', ON_DUTY_CODE, rules.fuel_time, f"Fuel stop ({mile_marker})", 'Fueling')
+                    miles_since_fuel = 0.0
+                    continue
+
+                window_left = rules.duty_window - window if window is not None else rules.duty_window
+                cycle_left = cycle.available(t)
+                if cycle_left <= 0:
+                    # Off duty until enough hours roll out of the window, or a 34-hour restart if sooner
+                    recovery = cycle.recovery_time(t, min(remaining, rules.max_driving))
+                    wait = rules.restart if recovery is None else min(rules.restart, recovery - t)
+                    if wait >= rules.restart:
+                        stop('cycle_restart', OFF_DUTY_CODE, wait, f"Rest area ({mile_marker})", '34-hour restart')
+                        cycle.restart(t)
+                    else:
+                        stop('cycle_recovery', OFF_DUTY_CODE, wait, f"Rest area ({mile_marker})", 'Off duty until cycle hours recover')
+                    continue
+                if driving >= rules.max_driving or window_left <= 0:
+                    rest(True, f"Rest area ({mile_marker})")
+                    continue
+                if since_break >= rules.break_after:
+                    rest(False, f"Rest stop ({mile_marker})")
+                    continue
+
+                # Drive until the leg ends or the next limit or fuel stop is reached
+                chunk = min(remaining, rules.max_driving - driving, window_left, rules.break_after - since_break, cycle_left)
+                if miles_per_minute > 0:
+                    chunk = min(chunk, max(1, ceil((rules.fuel_interval - miles_since_fuel) / miles_per_minute - 1e-9)))
+                # The last chunk takes the leg's remaining miles so legs add up to the routed distance
+                miles = leg_miles if chunk == remaining else min(leg_miles, chunk * miles_per_minute)
+                add(DRIVING_CODE, chunk, en_route, f"Driving to {leg.destination}", miles)
+                remaining -= chunk
+                leg_miles -= miles
+                driving += chunk
+                drive_after += chunk
+                since_break += chunk
+                miles_done += miles
+                miles_since_fuel += miles
+
+            if leg.stop:
+                stop(leg.stop, ON_DUTY_CODE, rules.stop_time, leg.destination, leg.stop.capitalize())
+
+        final_clocks = DriverClocks(driving, window, since_break, rules.cycle_limit - cycle.available(t))
+        return SimulationResult(timeline, stops, t, miles_done, final_clocks)
+
+
+def build_schedule(result: SimulationResult, start: datetime, origin: str, total_distance: float,
+                   total_drive_time: float, rules: Rules = PROPERTY_70_8) -> DutySchedule:
+    """DutySchedule for a simulation run starting at `start`, with cycle warnings"""
+    warnings = []
+    restarts = sum(1 for stop in result.stops if stop.kind == 'cycle_restart')
+    if restarts:
+        warnings.append(
+            f"Trip requires {restarts} 34-hour restart{'s' if restarts > 1 else ''} "
+            f"to stay within the {rules.cycle_limit // 60}-hour cycle limit"
+        )
+    if any(stop.kind == 'cycle_recovery' for stop in result.stops):
+        warnings.append(f"Trip waits off duty for {rules.cycle_limit // 60}-hour cycle hours to recover")
+    return DutySchedule(result.timeline, result.stops, start, origin, total_distance, total_drive_time, warnings)
+
+
+class ShiftReplay:
+    """
+    Driver clocks replayed over a duty timeline shift by shift, flagging
+    violations as they happen: a shift ends with 10 consecutive hours off duty
+    or in the sleeper berth, or with a split sleeper-berth pair, and a 34-hour
+    rest restarts the cycle. Used by validate() and clocks_after().
+    """
+
+    def __init__(self, clocks: DriverClocks = DriverClocks(), rules: Rules = PROPERTY_70_8, cycle=None):
+        self.rules = rules
+        self.cycle = cycle if cycle is not None else SimpleCycle(clocks.cycle_used, rules.cycle_limit)
+        self.violations: List[str] = []
+        self.driving = clocks.driving
+        # clocks.window counts the rest in progress; here it is added when the rest ends
+        window = clocks.window - clocks.resting if clocks.window is not None else None
+        self.window = window  # excluding rests that may pair into a split
+        self.strict_window = window  # counting them
+        self.since_break = clocks.since_break
+        self.pending = None  # latest rest that can be half of a split pair, as (status, minutes)
+        self.drive_after = self.window_after = 0
+        self.overrun = False  # drove past the strict window, legal only if the pending rest pairs
+        self.resting = clocks.resting  # current run of rest
+        self.sleeping = 0  # the sleeper-berth part of it
+        self.end = 0
+        self.shift = 1
+        self._flagged = set()
+
+    def flag(self, kind: str, message: str):
+        if (self.shift, kind) not in self._flagged:
+            self._flagged.add((self.shift, kind))
+            self.violations.append(f"Shift {self.shift}: {message}")
+
+    def flag_overrun(self):
+        if self.overrun:
+            self.flag('window', f"Drives after the {self.rules.duty_window // 60}-hour duty window")
+        self.overrun = False
+
+    def end_rest(self):
+        rules, resting = self.rules, self.resting
+        if resting >= rules.break_length:
+            self.since_break = 0
+        if resting >= rules.restart:
+            self.cycle.restart(self.end)
+        if resting >= rules.daily_rest:
+            if self.driving or self.window is not None:
+                self.flag_overrun()
+                self.driving, self.window, self.strict_window, self.pending = 0, None, None, None
+                self.shift += 1
+        elif resting >= rules.split_rest:
+            rested = (SLEEPER_BERTH_CODE if self.sleeping >= rules.split_sleeper else OFF_DUTY_CODE, resting)
+            if self.pending is not None and pairs(self.pending, rested, rules):
+                self.driving, self.window, self.strict_window = self.drive_after, self.window_after, self.window_after
+                self.overrun = False
+                self.shift += 1
+            else:
+                self.flag_overrun()
+                if self.strict_window is not None:
+                    self.strict_window += resting
+            self.pending = rested
+            self.drive_after = self.window_after = 0
+        elif self.window is not None:
+            self.window += resting
+            self.strict_window += resting
+            self.window_after += resting
+        self.resting = self.sleeping = 0
+
+    def add(self, start: int, end: int, status: int):
+        rules, minutes = self.rules, end - start
+        self.end = end
+        if status == OFF_DUTY_CODE or status == SLEEPER_BERTH_CODE:
+            self.resting += minutes
+            self.sleeping = self.sleeping + minutes if status == SLEEPER_BERTH_CODE else 0
+            return
+        if self.resting:
+            self.end = start
+            self.end_rest()
+            self.end = end
+
+        self.window = (self.window or 0) + minutes
+        self.strict_window = (self.strict_window or 0) + minutes
+        self.window_after += minutes
+        self.cycle.record(start, end)
+        if status == ON_DUTY_CODE:
+            if minutes >= rules.break_length:
+                self.since_break = 0
+            return
+
+        self.driving += minutes
+        self.drive_after += minutes
+        self.since_break += minutes
+        if self.driving > rules.max_driving:
+            self.flag('driving', f"Exceeds {rules.max_driving // 60}-hour driving limit ({self.driving / 60:.1f} hours)")
+        if self.window > rules.duty_window:
+            self.flag('window', f"Drives after the {rules.duty_window // 60}-hour duty window")
+        elif self.strict_window > rules.duty_window:
+            self.overrun = True
+        if self.since_break > rules.break_after:
+            self.flag('break', f"Drives more than {rules.break_after // 60} hours without a 30-minute break")
+        if self.cycle.available(end) < 0:
+            cycle_used = rules.cycle_limit - self.cycle.available(end)
+            self.flag('cycle', f"Exceeds {rules.cycle_limit // 60}-hour cycle limit ({cycle_used / 60:.1f} hours)")
+
+    def replay(self, timeline: DutyTimeline) -> 'ShiftReplay':
+        """Feed a timeline; a rest it ends with stays open (see end_rest)"""
+        for start, end, status in zip(timeline.starts, timeline.ends, timeline.statuses):
+            self.add(start, end, status)
+        return self
+
+    def clocks(self) -> DriverClocks:
+        """
+        Clocks to continue from, as HOSSimulator.run takes them. The window
+        counts unpaired split rests, since the simulator starts without one,
+        and a short rest still open is passed on as `resting`
+        """
+        resting = self.resting
+        if resting >= self.rules.daily_rest:
+            self.end_rest()
+            resting = 0
+        window = self.strict_window + resting if self.strict_window is not None else None
+        since_break = 0 if resting >= self.rules.break_length else self.since_break
+        cycle_used = self.rules.cycle_limit - self.cycle.available(self.end)
+        return DriverClocks(self.driving, window, since_break, cycle_used, resting)
+
+
+def validate(timeline: DutyTimeline, clocks: DriverClocks = DriverClocks(),
+             rules: Rules = PROPERTY_70_8, cycle=None) -> List[str]:
+    """
+    Check a duty timeline shift by shift (see ShiftReplay).
+    Pass the cycle model the schedule was planned with (e.g. a fresh
+    LedgerCycle) to check cycle hours the same way; by default they are a
+    running total from clocks.cycle_used.
+    """
+    replay = ShiftReplay(clocks, rules, cycle).replay(timeline)
+    if replay.resting:
+        replay.end_rest()
+    replay.flag_overrun()
+    return replay.violations
+
+
+def clocks_after(timeline: DutyTimeline, clocks: DriverClocks = DriverClocks(),
+                 rules: Rules = PROPERTY_70_8, cycle=None) -> DriverClocks:
+    """Driver clocks at the end of a timeline that started with `clocks`"""
+    return ShiftReplay(clocks, rules, cycle).replay(timeline).clocks()
+
+
+def timeline_from_logs(logs: Sequence[Dict]) -> DutyTimeline:
+    """Rebuild a continuous timeline from daily log dicts, with each day's miles on its driving entries"""
+    timeline = DutyTimeline()
+    if not logs:
+        return timeline
+    origin = datetime.combine(as_date(logs[0]['date']), time(0))
+    for log in logs:
+        day_start = int((datetime.combine(as_date(log['date']), time(0)) - origin).total_seconds() // 60)
+        entries = []
+        for entry in log['entries']:
+            start = day_start + _minute_of_day(entry['start_time'])
+            end = day_start + _minute_of_day(entry['end_time'])
+            if end <= start:
+                end += MINUTES_PER_DAY
+            entries.append((start, end, STATUS_CODES[entry['duty_status']], entry))
+        # The day's miles are spread over its driving time
+        total_miles = log.get('total_miles', log.get('totals', {}).get('total_miles', 0)) or 0
+        driving = sum(end - start for start, end, status, _ in entries if status == DRIVING_CODE)
+        for start, end, status, entry in entries:
+            miles = total_miles * (end - start) / driving if status == DRIVING_CODE and driving else 0.0
+            timeline.append(start, end, status, entry.get('location', ''), entry.get('remarks', ''), miles)
+    return timeline
+
+
+def as_date(value) -> date:
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _minute_of_day(value) -> int:
+    if isinstance(value, str):
+        value = time.fromisoformat(value)
+    return value.hour * 60 + value.minute
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import weakref
+from typing import Optional
+import httpx
+import requests
+from urllib3.util.retry import Retry
+from django.conf import settings
+from .ors_transport import make_adapter, make_async_transport
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class CappedRetry(Retry):
+    """Retry policy that honors Retry-After but never sleeps longer than backoff_max"""
+
+    def get_retry_after(self, response) -> Optional[float]:
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.backoff_max)
+
+
+def build_session(pool_size: int, max_retries: int, backoff_factor: float, backoff_max: float) -> requests.Session:
+    """Build a keep-alive session with pooled adapters and jittered exponential backoff"""
+    retry = CappedRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=frozenset({'GET', 'POST'}),  # ORS directions POSTs are idempotent
+        backoff_factor=backoff_factor,
+        backoff_max=backoff_max,
+        backoff_jitter=backoff_factor,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # Live, recording or replaying adapter depending on ORS_TRANSPORT
+    adapter = make_adapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=False)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Accept': 'application/json', 'Connection': 'keep-alive'})
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide OpenRouteService session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session(
+                    pool_size=getattr(settings, 'ORS_HTTP_POOL_SIZE', 20),
+                    max_retries=getattr(settings, 'ORS_MAX_RETRIES', 2),
+                    backoff_factor=getattr(settings, 'ORS_BACKOFF_FACTOR', 0.5),
+                    backoff_max=getattr(settings, 'ORS_BACKOFF_MAX', 10),
+                )
+                logger.info("Created shared OpenRouteService HTTP session")
+    return _session
+
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the OpenRouteService AsyncClient for the running event loop.
+    httpx clients are bound to the loop they were created on, so there is
+    one per loop (a single one under ASGI).
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool_size = getattr(settings, 'ORS_ASYNC_POOL_SIZE', 100)
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        client = httpx.AsyncClient(
+            limits=limits,
+            transport=make_async_transport(limits),
+            headers={'Accept': 'application/json'},
+        )
+        _async_clients[loop] = client
+        logger.info("Created OpenRouteService async HTTP client")
+    return client
+
+
+def async_timeout(timeout) -> httpx.Timeout:
+    """httpx equivalent of a (connect, read) timeout tuple"""
+    connect, read = timeout
+    return httpx.Timeout(read, connect=connect)
+
+
+def geocode_timeout():
+    """(connect, read) timeout for geocoding calls"""
+    return (getattr(settings, 'ORS_CONNECT_TIMEOUT', 3.05), getattr(settings, 'ORS_GEOCODE_READ_TIMEOUT', 10))
+
+
+def directions_timeout():
+    """(connect, read) timeout for directions calls"""
+    return (getattr(settings, 'ORS_CONNECT_TIMEOUT', 3.05), getattr(settings, 'ORS_DIRECTIONS_READ_TIMEOUT', 15))
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import MaxRetryError
+from urllib3.response import HTTPResponse
+from django.conf import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRANSPORTS = ('live', 'record', 'replay')
+
+# Query parameters that identify the caller rather than the request
+IGNORED_PARAMS = {'api_key'}
+
+
+def fixture_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """
+    Stable fixture name for a request: method, path, sorted query and
+    canonical JSON body. The host is left out so recordings replay against
+    any ORS_BASE_URL, and credentials are never part of the key.
+    """
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if k not in IGNORED_PARAMS)
+    if body:
+        try:
+            body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':'))
+        except ValueError:
+            body = body.decode('utf-8', 'replace') if isinstance(body, bytes) else body
+    digest = hashlib.sha1(json.dumps([method.upper(), parts.path, query, body or '']).encode('utf-8')).hexdigest()
+    kind = parts.path.strip('/').replace('/', '_') or 'root'
+    return f"{kind}-{digest[:20]}"
+
+
+class FixtureStore:
+    """Recorded upstream responses, one JSON file per distinct request"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._memory: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._memory[key] = fixture
+        return fixture
+
+    def save(self, key: str, method: str, url: str, status: int, content_type: str, body: str):
+        parts = urlsplit(url)
+        fixture = {
+            'method': method.upper(),
+            'path': parts.path,
+            'query': [[k, v] for k, v in parse_qsl(parts.query) if k not in IGNORED_PARAMS],
+            'status': status,
+            'content_type': content_type,
+            'body': body,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename so concurrent replays never read a partial file
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(fixture, f, indent=1)
+        os.replace(tmp_path, self._path(key))
+        with self._lock:
+            self._memory[key] = fixture
+        logger.info(f"Recorded ORS fixture {key} ({status})")
+
+
+class FaultInjector:
+    """
+    Decides the latency and outcome of each replayed call. Latency is a fixed
+    base plus an exponential tail; a fraction of calls fail with 503 or are
+    throttled with 429 and a Retry-After header.
+    """
+
+    def __init__(self, latency: float = 0.0, latency_tail: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        self.latency = latency
+        self.latency_tail = latency_tail
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next(self) -> Tuple[float, Optional[int]]:
+        """(delay in seconds, injected status or None)"""
+        with self._lock:
+            delay = self.latency + (self._random.expovariate(1 / self.latency_tail) if self.latency_tail > 0 else 0.0)
+            roll = self._random.random()
+        if roll < self.error_rate:
+            return delay, 503
+        if roll < self.error_rate + self.throttle_rate:
+            return delay, 429
+        return delay, None
+
+    def respond(self, store: FixtureStore, method: str, url: str, body: Optional[bytes]) -> Tuple[float, int, Dict[str, str], bytes]:
+        """(delay, status, headers, body) for a replayed request"""
+        delay, injected = self.next()
+        if injected == 503:
+            return delay, 503, {'Content-Type': 'application/json'}, b'{"error": "injected upstream error"}'
+        if injected == 429:
+            headers = {'Content-Type': 'application/json', 'Retry-After': str(self.retry_after)}
+            return delay, 429, headers, b'{"error": "injected rate limit"}'
+
+        key = fixture_key(method, url, body)
+        fixture = store.load(key)
+        if fixture is None:
+            logger.warning(f"No ORS fixture {key} for {method} {url}")
+            message = json.dumps({'error': f'No recorded fixture {key}'}).encode('utf-8')
+            return delay, 404, {'Content-Type': 'application/json'}, message
+        return delay, fixture['status'], {'Content-Type': fixture['content_type']}, fixture['body'].encode('utf-8')
+
+
+def _recordable(status: int) -> bool:
+    # Throttling and server errors are transient; keep the fixtures deterministic
+    return status != 429 and status < 500
+
+
+class RecordingAdapter(HTTPAdapter):
+    """requests adapter that calls the live API and saves each response as a fixture"""
+
+    def __init__(self, store: FixtureStore, **kwargs):
+        self.store = store
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        if _recordable(response.status_code):
+            key = fixture_key(request.method, request.url, request.body)
+            self.store.save(key, request.method, request.url, response.status_code,
+                            response.headers.get('Content-Type', 'application/json'), response.text)
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    requests adapter that serves recorded fixtures without touching the
+    network. Injected 429/503 responses go through the adapter's Retry
+    policy, so backoff and Retry-After handling behave as they do live.
+    """
+
+    def __init__(self, store: FixtureStore, faults: FaultInjector, **kwargs):
+        self.store = store
+        self.faults = faults
+        super().__init__(**kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body.encode('utf-8') if isinstance(request.body, str) else request.body
+        retries = self.max_retries
+        while True:
+            delay, status, headers, content = self.faults.respond(self.store, request.method, request.url, body)
+            time.sleep(delay)
+            raw = HTTPResponse(body=content, headers=headers, status=status, preload_content=False)
+            if not retries.is_retry(request.method, status, has_retry_after='Retry-After' in headers):
+                break
+            try:
+                retries = retries.increment(request.method, request.url, response=raw)
+            except MaxRetryError:
+                if retries.raise_on_status:
+                    raise
+                break
+            retries.sleep(raw)
+        return self._build_replay_response(request, status, headers, content)
+
+    @staticmethod
+    def _build_replay_response(request, status: int, headers: Dict[str, str], content: bytes) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = content
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'Replayed'
+        return response
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that calls the live API and saves each response as a fixture"""
+
+    def __init__(self, store: FixtureStore, transport: httpx.AsyncBaseTransport):
+        self.store = store
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+        if _recordable(response.status_code):
+            key = fixture_key(request.method, str(request.url), request.content)
+            self.store.save(key, request.method, str(request.url), response.status_code,
+                            response.headers.get('Content-Type', 'application/json'), content.decode('utf-8', 'replace'))
+        return httpx.Response(response.status_code, headers=response.headers, content=content, request=request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """httpx transport that serves recorded fixtures with injected latency and faults"""
+
+    def __init__(self, store: FixtureStore, faults: FaultInjector):
+        self.store = store
+        self.faults = faults
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        delay, status, headers, content = self.faults.respond(self.store, request.method, str(request.url), request.content)
+        await asyncio.sleep(delay)
+        return httpx.Response(status, headers=headers, content=content, request=request)
+
+
+_store = None
+_faults = None
+_lock = threading.Lock()
+
+
+def get_transport_mode() -> str:
+    mode = getattr(settings, 'ORS_TRANSPORT', 'live')
+    if mode not in TRANSPORTS:
+        raise ValueError(f"ORS_TRANSPORT must be one of {', '.join(TRANSPORTS)}, got '{mode}'")
+    return mode
+
+
+def _shared() -> Tuple[FixtureStore, FaultInjector]:
+    global _store, _faults
+    with _lock:
+        if _store is None:
+            _store = FixtureStore(settings.ORS_FIXTURES_DIR)
+            _faults = FaultInjector(
+                latency=getattr(settings, 'ORS_REPLAY_LATENCY_MS', 0) / 1000,
+                latency_tail=getattr(settings, 'ORS_REPLAY_LATENCY_TAIL_MS', 0) / 1000,
+                error_rate=getattr(settings, 'ORS_REPLAY_ERROR_RATE', 0.0),
+                throttle_rate=getattr(settings, 'ORS_REPLAY_THROTTLE_RATE', 0.0),
+                retry_after=getattr(settings, 'ORS_REPLAY_RETRY_AFTER', 1),
+                seed=getattr(settings, 'ORS_REPLAY_SEED', None),
+            )
+        return _store, _faults
+
+
+def make_adapter(**kwargs) -> HTTPAdapter:
+    """HTTPAdapter for the configured ORS_TRANSPORT"""
+    mode = get_transport_mode()
+    if mode == 'live':
+        return HTTPAdapter(**kwargs)
+    store, faults = _shared()
+    logger.info(f"OpenRouteService {mode} transport using fixtures in {store.directory}")
+    if mode == 'record':
+        return RecordingAdapter(store, **kwargs)
+    return ReplayAdapter(store, faults, **kwargs)
+
+
+def make_async_transport(limits: httpx.Limits) -> Optional[httpx.AsyncBaseTransport]:
+    """httpx transport for the configured ORS_TRANSPORT (None means httpx's default)"""
+    mode = get_transport_mode()
+    if mode == 'live':
+        return None
+    store, faults = _shared()
+    if mode == 'record':
+        return RecordingTransport(store, httpx.AsyncHTTPTransport(limits=limits))
+    return ReplayTransport(store, faults)
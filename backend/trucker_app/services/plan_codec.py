@@ -0,0 +1,45 @@
+"""
+Compact encodings for a persisted trip plan (models.TripPlan).
+
+Route geometry is stored as zlib-compressed little-endian int32 deltas of
+[lon, lat] in 1e-5 degrees (the encoded-polyline precision, about a metre):
+consecutive route points are close, so the deltas are small and compress
+well. Everything else in a plan (leg summaries, instructions, stops, the
+schedule) is zlib-compressed JSON.
+
+Pure Python apart from numpy; no Django imports.
+"""
+import json
+import zlib
+from typing import Any, List, Optional, Sequence, Type
+
+import numpy as np
+
+PRECISION = 5  # decimal places kept, as in geometry.encode_polyline
+_SCALE = 10 ** PRECISION
+
+
+def encode_geometry(coordinates: Sequence[Sequence[float]]) -> bytes:
+    """GeoJSON [lon, lat] coordinates as compressed int32 deltas (any elevation is dropped)"""
+    if not len(coordinates):
+        return b''
+    points = np.rint(np.array([point[:2] for point in coordinates], dtype=np.float64) * _SCALE).astype(np.int64)
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    return zlib.compress(deltas.astype('<i4').tobytes())
+
+
+def decode_geometry(blob: bytes) -> List[List[float]]:
+    """GeoJSON [lon, lat] coordinates back from encode_geometry"""
+    if not blob:
+        return []
+    deltas = np.frombuffer(zlib.decompress(blob), dtype='<i4').reshape(-1, 2)
+    return (np.cumsum(deltas, axis=0, dtype=np.int64) / _SCALE).tolist()
+
+
+def encode_document(document: Any, encoder: Optional[Type[json.JSONEncoder]] = None) -> bytes:
+    """A JSON-serializable document as compressed JSON; `encoder` handles dates and times"""
+    return zlib.compress(json.dumps(document, cls=encoder, separators=(',', ':')).encode())
+
+
+def decode_document(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
@@ -0,0 +1,231 @@
+import heapq
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from .distance import haversine_miles
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROAD_GRAPH_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'us_highways.tsv')
+
+
+class RoadGraph:
+    """
+    Offline HGV router over the bundled interstate/US-highway graph.
+
+    Adjacency is stored CSR-style in flat arrays (offsets/targets/weights).
+    Queries run A* on travel time with an ALT heuristic: exact travel times
+    from a few landmarks, precomputed at load time, give a tight admissible
+    lower bound alongside the straight-line bound.
+    """
+
+    ACCESS_DETOUR = 1.2  # straight-line to road distance for the legs on/off the network
+    ACCESS_MPH = 45
+    MAX_SNAP_MILES = 150
+    LANDMARK_COUNT = 6
+
+    def __init__(self, nodes: List[Tuple[str, float, float]], edges: List[Tuple[int, int, float, float, str]]):
+        self.names = [name for name, _, _ in nodes]
+        self.latitudes = array('d', (lat for _, lat, _ in nodes))
+        self.longitudes = array('d', (lon for _, _, lon in nodes))
+        self.highway_names = sorted({highway for *_, highway in edges})
+        highway_ids = {name: i for i, name in enumerate(self.highway_names)}
+
+        adjacency = [[] for _ in nodes]
+        for a, b, miles, mph, highway in edges:
+            adjacency[a].append((b, miles, mph, highway_ids[highway]))
+            adjacency[b].append((a, miles, mph, highway_ids[highway]))
+
+        self.offsets = array('i', [0])
+        self.targets = array('i')
+        self.miles = array('d')
+        self.hours = array('d')
+        self.highways = array('H')
+        for neighbours in adjacency:
+            for target, miles, mph, highway in neighbours:
+                self.targets.append(target)
+                self.miles.append(miles)
+                self.hours.append(miles / mph)
+                self.highways.append(highway)
+            self.offsets.append(len(self.targets))
+
+        self.max_mph = max(mph for *_, mph, _ in edges)
+        self.landmarks = self._select_landmarks(self.LANDMARK_COUNT)
+
+    @classmethod
+    def load(cls, path: str) -> 'RoadGraph':
+        nodes, edges = [], []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                if fields[0] == 'N':
+                    nodes.append((f"{fields[2]}, {fields[3]}", float(fields[4]), float(fields[5])))
+                elif fields[0] == 'E':
+                    edges.append((int(fields[1]), int(fields[2]), float(fields[3]), float(fields[4]), fields[5]))
+        graph = cls(nodes, edges)
+        logger.info(f"Loaded road graph with {len(nodes)} nodes and {len(edges)} edges from {path}")
+        return graph
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest_node(self, lat: float, lon: float) -> Tuple[int, float]:
+        """Closest graph node and its straight-line distance in miles"""
+        best, best_miles = -1, float('inf')
+        for i in range(len(self.names)):
+            miles = haversine_miles(lat, lon, self.latitudes[i], self.longitudes[i])
+            if miles < best_miles:
+                best, best_miles = i, miles
+        return best, best_miles
+
+    def shortest_path(self, source: int, target: int) -> Optional[List[int]]:
+        """Fastest node path from source to target, or None if unreachable"""
+        best = {source: 0.0}
+        previous = {}
+        heap = [(self._heuristic(source, target), 0.0, source)]
+        closed = set()
+
+        while heap:
+            _, hours, node = heapq.heappop(heap)
+            if node == target:
+                path = [node]
+                while node in previous:
+                    node = previous[node]
+                    path.append(node)
+                return path[::-1]
+            if node in closed:
+                continue
+            closed.add(node)
+
+            for i in range(self.offsets[node], self.offsets[node + 1]):
+                neighbour = self.targets[i]
+                candidate = hours + self.hours[i]
+                if candidate < best.get(neighbour, float('inf')):
+                    best[neighbour] = candidate
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (candidate + self._heuristic(neighbour, target), candidate, neighbour))
+
+        return None
+
+    def route(self, start_coords: Tuple[float, float], end_coords: Tuple[float, float]) -> Optional[Dict]:
+        """
+        Route between two coordinates over the graph. Returns a result shaped
+        like RouteService.calculate_route, or None when either end is too far
+        from the network or both ends snap to the same node.
+        """
+        source, source_miles = self.nearest_node(*start_coords)
+        target, target_miles = self.nearest_node(*end_coords)
+        if source_miles > self.MAX_SNAP_MILES or target_miles > self.MAX_SNAP_MILES or source == target:
+            return None
+
+        path = self.shortest_path(source, target)
+        if path is None:
+            return None
+
+        access_in = source_miles * self.ACCESS_DETOUR
+        access_out = target_miles * self.ACCESS_DETOUR
+        coordinates = [[start_coords[1], start_coords[0]]]  # lon, lat
+        instructions = [self._instruction(f"Drive to {self.names[source]}", access_in, access_in / self.ACCESS_MPH)]
+        distance = access_in
+        duration = access_in / self.ACCESS_MPH
+
+        for a, b in zip(path, path[1:]):
+            edge = self._edge(a, b)
+            miles, hours = self.miles[edge], self.hours[edge]
+            highway = self.highway_names[self.highways[edge]]
+            coordinates.append([self.longitudes[a], self.latitudes[a]])
+            distance += miles
+            duration += hours
+
+            previous = instructions[-1]
+            if previous['highway'] == highway:
+                previous['distance'] += miles
+                previous['duration'] += hours * 3600
+                previous['instruction'] = f"Take {highway} toward {self.names[b]}"
+            else:
+                instructions.append(self._instruction(f"Take {highway} toward {self.names[b]}", miles, hours, highway))
+
+        coordinates.append([self.longitudes[target], self.latitudes[target]])
+        coordinates.append([end_coords[1], end_coords[0]])
+        instructions.append(self._instruction("Drive to destination", access_out, access_out / self.ACCESS_MPH))
+        distance += access_out
+        duration += access_out / self.ACCESS_MPH
+
+        for instruction in instructions:
+            del instruction['highway']
+
+        return {
+            'distance': distance,
+            'duration': duration,
+            'geometry': {'type': 'LineString', 'coordinates': coordinates},
+            'instructions': instructions
+        }
+
+    @staticmethod
+    def _instruction(text: str, miles: float, hours: float, highway: Optional[str] = None) -> Dict:
+        return {'instruction': text, 'distance': miles, 'duration': hours * 3600, 'highway': highway}
+
+    def _edge(self, a: int, b: int) -> int:
+        """Index of the fastest a->b edge"""
+        edges = [i for i in range(self.offsets[a], self.offsets[a + 1]) if self.targets[i] == b]
+        return min(edges, key=lambda i: self.hours[i])
+
+    def _heuristic(self, node: int, target: int) -> float:
+        straight_line = haversine_miles(
+            self.latitudes[node], self.longitudes[node], self.latitudes[target], self.longitudes[target]
+        ) / self.max_mph
+        landmark = max(
+            (abs(times[target] - times[node]) for times in self.landmarks
+             if times[target] != float('inf') and times[node] != float('inf')),
+            default=0.0
+        )
+        return max(straight_line, landmark)
+
+    def _travel_times(self, source: int) -> array:
+        """Dijkstra travel times (hours) from source to every node"""
+        times = array('d', [float('inf')] * len(self.names))
+        times[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            hours, node = heapq.heappop(heap)
+            if hours > times[node]:
+                continue
+            for i in range(self.offsets[node], self.offsets[node + 1]):
+                candidate = hours + self.hours[i]
+                if candidate < times[self.targets[i]]:
+                    times[self.targets[i]] = candidate
+                    heapq.heappush(heap, (candidate, self.targets[i]))
+        return times
+
+    def _select_landmarks(self, count: int) -> List[array]:
+        """Pick spread-out landmarks greedily (each farthest from those chosen so far)"""
+        if not self.names:
+            return []
+        landmarks = [self._travel_times(0)]
+        nearest = array('d', landmarks[0])
+        while len(landmarks) < count:
+            candidate = max(
+                (i for i in range(len(self.names)) if nearest[i] != float('inf')),
+                key=lambda i: nearest[i]
+            )
+            times = self._travel_times(candidate)
+            landmarks.append(times)
+            for i in range(len(self.names)):
+                nearest[i] = min(nearest[i], times[i])
+        # The first pass only seeded the search from node 0; drop it unless it is all we have
+        return landmarks[1:] if len(landmarks) > 1 else landmarks
+
+
+def _load_road_graph() -> Optional[RoadGraph]:
+    path = getattr(settings, 'ROAD_GRAPH_PATH', DEFAULT_ROAD_GRAPH_PATH)
+    if not path or not os.path.exists(path):
+        logger.warning(f"Road graph not found at {path}; offline routing falls back to straight lines")
+        return None
+    return RoadGraph.load(path)
+
+
+road_graph = _load_road_graph()
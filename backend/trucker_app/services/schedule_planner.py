@@ -0,0 +1,139 @@
+"""
+Scheduling entry points shared by HOSComplianceService and the batch
+planner's worker processes.
+
+Pure Python (no Django imports): worker processes import only this module
+and the simulator, and everything crossing the process boundary pickles.
+"""
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from .duty_ledger import DutyLedger, LedgerCycle
+from .duty_schedule import OFF_DUTY_CODE, DRIVING_CODE, DutySchedule, DutyTimeline, Stop
+from .hos_simulator import HOSSimulator, Leg, DriverClocks, Rules, PROPERTY_70_8, ShiftReplay, build_schedule, validate
+from .split_sleeper import best_rests
+
+
+class ScheduleRequest(NamedTuple):
+    legs: Tuple[Leg, ...]
+    origin: str
+    start: datetime
+    cycle_used_hours: float
+    total_distance: float
+    total_drive_time: float
+    sleeper_split: bool = False  # consider split sleeper-berth rests (see split_sleeper)
+    clocks: DriverClocks = DriverClocks()  # driving / window / break clocks at start; cycle hours come from the ledger
+
+
+class PlannedSchedule(NamedTuple):
+    schedule: Optional[DutySchedule]  # None when planning failed
+    violations: List[str]
+    error: Optional[str] = None
+
+
+class Replanned(NamedTuple):
+    remaining: DutySchedule  # from the update on
+    history: DutySchedule  # driven + remaining, from the start of the original plan
+    clocks: DriverClocks  # at the update
+
+
+def plan_schedule(request: ScheduleRequest, rules: Rules = PROPERTY_70_8,
+                  ledger: Optional[DutyLedger] = None) -> DutySchedule:
+    """
+    Simulate a trip against the driver's duty ledger; without one,
+    cycle_used_hours is spread over the previous 7 days.
+    With request.sleeper_split the split sleeper-berth rests found by
+    best_rests are used when, replayed against the ledger (which can add
+    cycle-recovery waits the search does not model), they still arrive
+    before the plain schedule and validate cleanly.
+    """
+    start = request.start.replace(second=0, microsecond=0)
+    if ledger is None:
+        ledger = DutyLedger.seeded(start, request.cycle_used_hours)
+    offset = ledger.minute(start)
+    cycle = LedgerCycle(ledger, offset, rules.cycle_limit)
+    clocks = request.clocks._replace(cycle_used=rules.cycle_limit - cycle.available(0))
+    simulator = HOSSimulator(rules)
+
+    rests = ()
+    if request.sleeper_split:
+        rests = best_rests(request.legs, clocks, rules)
+        if rests:
+            # Trial runs on copies: only the chosen plan is recorded in the ledger
+            def trial_cycle() -> LedgerCycle:
+                return LedgerCycle(ledger.copy(), offset, rules.cycle_limit)
+            plain = simulator.run(request.legs, request.origin, clocks, trial_cycle())
+            split = simulator.run(request.legs, request.origin, clocks, trial_cycle(), rests)
+            if split.end >= plain.end or validate(split.timeline, clocks, rules, trial_cycle()):
+                rests = ()
+    result = simulator.run(request.legs, request.origin, clocks, cycle, rests)
+    return build_schedule(result, start, request.origin, request.total_distance, request.total_drive_time, rules)
+
+
+def replan_schedule(history: DutyTimeline, history_start: datetime, request: ScheduleRequest,
+                    rules: Rules = PROPERTY_70_8) -> Replanned:
+    """
+    Re-plan the rest of a trip from request.start. `history` (minute 0 is
+    history_start) stands as driven up to then, off duty after its last
+    interval, and request.legs are simulated from the clocks it leaves the
+    driver with. Cycle hours use the ledger validate_timeline would seed at
+    history_start, with the driven time recorded in it.
+    """
+    start = request.start.replace(second=0, microsecond=0)
+    cut = int((start - history_start).total_seconds() // 60)
+    if cut <= 0:
+        raise ValueError("A re-plan must start after its history")
+    driven = history.until(cut)
+    if driven.end < cut:
+        where = driven.strings[driven.locations[-1]] if len(driven) else request.origin
+        driven.append(driven.end, cut, OFF_DUTY_CODE, where, 'Off duty')
+
+    ledger = DutyLedger.seeded(history_start, request.cycle_used_hours)
+    cycle = LedgerCycle(ledger, ledger.minute(history_start), rules.cycle_limit)
+    replay = ShiftReplay(DriverClocks(cycle_used=rules.cycle_limit - cycle.available(0)), rules, cycle)
+    clocks = replay.replay(driven).clocks()
+    remaining = plan_schedule(request._replace(start=start, clocks=clocks), rules, ledger)
+
+    driven_miles = sum(driven.miles)
+    driven_minutes = sum(end - begin for begin, end, status in zip(driven.starts, driven.ends, driven.statuses)
+                         if status == DRIVING_CODE)
+    driven.extend(remaining.timeline, cut)
+    stops = [
+        Stop(stop.kind, stop.start + cut, stop.minutes, stop.distance + driven_miles, stop.location, stop.description)
+        for stop in remaining.stops
+    ]
+    whole = DutySchedule(
+        driven, stops, history_start, driven.strings[driven.locations[0]],
+        driven_miles + request.total_distance, driven_minutes / 60 + request.total_drive_time, remaining.warnings
+    )
+    return Replanned(remaining, whole, clocks)
+
+
+def validate_timeline(timeline: DutyTimeline, start: datetime, cycle_used_hours: float,
+                      rules: Rules = PROPERTY_70_8) -> List[str]:
+    """
+    HOS violations in a timeline whose minute 0 is `start`, with cycle hours
+    checked against the same seeded ledger plan_schedule uses
+    """
+    ledger = DutyLedger.seeded(start, cycle_used_hours)
+    cycle = LedgerCycle(ledger, ledger.minute(start), rules.cycle_limit)
+    clocks = DriverClocks(cycle_used=rules.cycle_limit - cycle.available(0))
+    return validate(timeline, clocks, rules, cycle)
+
+
+def plan_and_validate(request: ScheduleRequest, rules: Rules = PROPERTY_70_8) -> PlannedSchedule:
+    schedule = plan_schedule(request, rules)
+    return PlannedSchedule(schedule, validate_timeline(schedule.timeline, schedule.start, request.cycle_used_hours, rules))
+
+
+def plan_many(requests: Sequence[ScheduleRequest]) -> List[PlannedSchedule]:
+    """
+    Worker-process task: plan and validate a chunk of trips. A trip that
+    raises gets an error outcome instead of failing the rest of the chunk.
+    """
+    outcomes = []
+    for request in requests:
+        try:
+            outcomes.append(plan_and_validate(request))
+        except Exception as e:
+            outcomes.append(PlannedSchedule(None, [], f'{type(e).__name__}: {e}'))
+    return outcomes
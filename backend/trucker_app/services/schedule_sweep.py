@@ -0,0 +1,205 @@
+"""
+Batched what-if schedules: one trip simulated for many (departure time,
+cycle hours used) candidates at once.
+
+Every candidate is a lane in a set of NumPy arrays and all lanes advance in
+lockstep, one HOS event per step (drive chunk, fuel, break, daily rest,
+restart, stop or dock wait), so the cost is one vectorized pass per event
+instead of one HOSSimulator run per candidate. The event rules are the
+simulator's with SimpleCycle: cycle hours are a running total recovered only
+by a 34-hour restart. With no dock hours and the same inputs, each lane ends
+on the same minute as HOSSimulator.run.
+
+Pure NumPy (no Django imports) like hos_simulator.
+"""
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .hos_simulator import Leg, Rules, PROPERTY_70_8, MINUTES_PER_DAY
+
+
+class SweepResult(NamedTuple):
+    """Per-candidate outcomes; times are minutes from the sweep's reference midnight"""
+    departure: np.ndarray
+    cycle_used: np.ndarray  # minutes on duty in the cycle at departure
+    arrival: np.ndarray  # end of the dropoff
+    days: np.ndarray  # calendar days from departure to arrival
+    daily_rests: np.ndarray
+    restarts: np.ndarray
+    breaks: np.ndarray
+    fuel_stops: np.ndarray
+    dock_wait: np.ndarray  # minutes spent waiting for pickup / dropoff hours
+
+    @property
+    def elapsed(self) -> np.ndarray:
+        return self.arrival - self.departure
+
+
+def _leg_minutes(leg: Leg) -> int:
+    # Same rounding as HOSSimulator.run
+    return max(1, round(leg.hours * 60)) if leg.hours > 0 or leg.miles > 0 else 0
+
+
+def sweep(legs: Sequence[Leg], departures: Sequence[int], cycle_used: Sequence[int],
+          rules: Rules = PROPERTY_70_8, dock_hours: Optional[Tuple[int, int]] = None) -> SweepResult:
+    """
+    Simulate every (departures[i], cycle_used[i]) candidate, both in minutes.
+    `dock_hours` is an (open, close) minute-of-day pair: pickups and dropoffs
+    only start inside it, and the driver waits off duty until it opens.
+    """
+    departures = np.asarray(departures, dtype=np.int64)
+    size = len(departures)
+    cycle = np.broadcast_to(np.asarray(cycle_used, dtype=np.int64), (size,)).copy()
+    start_cycle = cycle.copy()
+
+    leg_count = len(legs)
+    leg_minutes = np.array([_leg_minutes(leg) for leg in legs], dtype=np.int64)
+    leg_miles = np.array([leg.miles for leg in legs], dtype=np.float64)
+    leg_rate = np.divide(leg_miles, leg_minutes, out=np.zeros(leg_count), where=leg_minutes > 0)
+    leg_stop = np.array([bool(leg.stop) for leg in legs])
+
+    t = departures.copy()
+    leg = np.zeros(size, dtype=np.int64)
+    remaining = np.full(size, leg_minutes[0] if leg_count else 0, dtype=np.int64)
+    miles_left = np.full(size, leg_miles[0] if leg_count else 0.0)
+    driving = np.zeros(size, dtype=np.int64)
+    window_start = np.zeros(size, dtype=np.int64)
+    in_window = np.zeros(size, dtype=bool)
+    since_break = np.zeros(size, dtype=np.int64)
+    since_fuel = np.zeros(size)
+    done = np.full(size, leg_count == 0)
+
+    daily_rests = np.zeros(size, dtype=np.int64)
+    restarts = np.zeros(size, dtype=np.int64)
+    breaks = np.zeros(size, dtype=np.int64)
+    fuel_stops = np.zeros(size, dtype=np.int64)
+    dock_wait = np.zeros(size, dtype=np.int64)
+
+    def on_duty(mask, minutes):
+        opens = mask & ~in_window
+        window_start[opens] = t[opens]
+        in_window[mask] = True
+        cycle[mask] += minutes if np.isscalar(minutes) else minutes[mask]
+        t[mask] += minutes if np.isscalar(minutes) else minutes[mask]
+
+    def off_duty(mask, minutes):
+        minutes = np.where(mask, minutes, 0)
+        t[:] += minutes
+        since_break[minutes >= rules.break_length] = 0
+        rested = minutes >= rules.daily_rest
+        driving[rested] = 0
+        in_window[rested] = False
+
+    while not done.all():
+        active = ~done
+        leg_index = np.minimum(leg, leg_count - 1)
+
+        # Arrival at the end of a leg: wait for dock hours, then the on-duty stop
+        arrived = active & (remaining == 0)
+        stopping = arrived & leg_stop[leg_index]
+        if dock_hours is not None:
+            opens, closes = dock_hours
+            minute_of_day = t % MINUTES_PER_DAY
+            if opens < closes:
+                open_now = (minute_of_day >= opens) & (minute_of_day < closes)
+            else:  # overnight hours, e.g. 22:00-06:00
+                open_now = (minute_of_day >= opens) | (minute_of_day < closes)
+            waiting = stopping & ~open_now
+            wait = (opens - minute_of_day) % MINUTES_PER_DAY
+            off_duty(waiting, wait)
+            dock_wait[waiting] += wait[waiting]
+            stopping &= ~waiting
+            arrived &= ~waiting
+        on_duty(stopping, rules.stop_time)
+        since_break[stopping & (rules.stop_time >= rules.break_length)] = 0
+
+        leg[arrived] += 1
+        done |= arrived & (leg >= leg_count)
+        advanced = arrived & ~done
+        next_leg = np.minimum(leg, leg_count - 1)
+        remaining[advanced] = leg_minutes[next_leg[advanced]]
+        miles_left[advanced] = leg_miles[next_leg[advanced]]
+
+        # Driving lanes take the first applicable event, in HOSSimulator's order
+        en_route = active & ~(remaining == 0) & ~arrived & ~done
+        window_left = np.where(in_window, rules.duty_window - (t - window_start), rules.duty_window)
+        cycle_left = rules.cycle_limit - cycle
+
+        fuel = en_route & (since_fuel >= rules.fuel_interval - 1e-6)
+        pending = en_route & ~fuel
+        restart = pending & (cycle_left <= 0)
+        pending &= ~restart
+        rest = pending & ((driving >= rules.max_driving) | (window_left <= 0))
+        pending &= ~rest
+        pause = pending & (since_break >= rules.break_after)
+        drive = pending & ~pause
+
+        on_duty(fuel, rules.fuel_time)
+        since_fuel[fuel] = 0.0
+        since_break[fuel & (rules.fuel_time >= rules.break_length)] = 0
+        fuel_stops[fuel] += 1
+
+        off_duty(restart, rules.restart)
+        cycle[restart] = 0
+        restarts[restart] += 1
+
+        off_duty(rest, rules.daily_rest)
+        daily_rests[rest] += 1
+
+        off_duty(pause, rules.break_length)
+        breaks[pause] += 1
+
+        # Drive until the leg ends or the next limit or fuel stop is reached
+        rate = leg_rate[leg_index]
+        chunk = np.minimum.reduce([
+            remaining,
+            rules.max_driving - driving,
+            window_left,
+            rules.break_after - since_break,
+            cycle_left,
+        ])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            to_fuel = np.ceil((rules.fuel_interval - since_fuel) / rate - 1e-9)
+        to_fuel = np.where(rate > 0, np.maximum(1, np.nan_to_num(to_fuel, posinf=0)), chunk)
+        chunk = np.where(drive, np.minimum(chunk, to_fuel.astype(np.int64)), 0)
+        miles = np.where(chunk == remaining, miles_left, np.minimum(miles_left, chunk * rate))
+        miles = np.where(drive, miles, 0.0)
+        on_duty(drive, chunk)
+        remaining -= chunk
+        miles_left -= miles
+        driving += chunk
+        since_break += chunk
+        since_fuel += miles
+
+    days = (t - 1) // MINUTES_PER_DAY - departures // MINUTES_PER_DAY + 1
+    return SweepResult(departures, start_cycle, t, days, daily_rests, restarts, breaks, fuel_stops, dock_wait)
+
+
+def pareto_front(objectives: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of the non-dominated rows of an (n, k) array where lower is
+    better in every column; duplicates of a front row are all kept
+    """
+    objectives = np.asarray(objectives)
+    if len(objectives) == 0:
+        return np.zeros(0, dtype=bool)
+    # better_or_equal[i, j]: row j is at least as good as row i in every column
+    better_or_equal = (objectives[None, :, :] <= objectives[:, None, :]).all(axis=2)
+    strictly_better = (objectives[None, :, :] < objectives[:, None, :]).any(axis=2)
+    return ~(better_or_equal & strictly_better).any(axis=1)
+
+
+def best_options(result: SweepResult) -> Dict[int, np.ndarray]:
+    """
+    Pareto-best candidate indices for each starting cycle-hours value: earliest
+    arrival vs fewest calendar days vs fewest rests vs least time on the road
+    (so of two departures arriving together the later one wins), sorted by arrival
+    """
+    objectives = np.column_stack([
+        result.arrival, result.days, result.daily_rests + result.restarts, result.elapsed
+    ])
+    fronts = {}
+    for used in np.unique(result.cycle_used):
+        indices = np.flatnonzero(result.cycle_used == used)
+        front = indices[pareto_front(objectives[indices])]
+        fronts[int(used)] = front[np.lexsort((result.departure[front], result.arrival[front]))]
+    return fronts
@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Optional
+from django.conf import settings
+from django.core.cache import caches
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls so only one of them does the work.
+
+    Within a process, the first caller for a key runs the function and every
+    caller that arrives while it is in flight waits for the same result or
+    exception. With a cache alias configured, the leader also takes a lock in
+    that cache (cache.add) and publishes its result there briefly, so leaders
+    in other worker processes wait for it instead of calling upstream again.
+    """
+
+    def __init__(self, name: str, cache_alias: Optional[str] = None, lock_timeout: float = 30,
+                 poll_interval: float = 0.05):
+        self.name = name
+        self.cache_alias = cache_alias
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls = weakref.WeakKeyDictionary()  # event loop -> {key: future}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn for key, or wait for the identical call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_shared(key, fn) if self.cache_alias else fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.followers:
+                logger.debug(f"Single-flight '{self.name}' shared one call with {call.followers} waiters")
+        return call.result
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant: coroutines on the same event loop share one awaited call (in-process only)"""
+        loop = asyncio.get_running_loop()
+        flights = self._async_calls.setdefault(loop, {})
+        task = flights.get(key)
+        if task is not None:
+            with self._lock:
+                self.coalesced += 1
+        else:
+            # The call runs in its own task, not in the caller that started it, so
+            # cancelling that caller neither cancels the call nor fails its followers
+            task = flights[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._finish_async(flights, key, done))
+        # Shielded so a cancelled caller only stops waiting
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _finish_async(flights: Dict[str, asyncio.Future], key: str, task: asyncio.Future):
+        if flights.get(key) is task:
+            del flights[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved in case every caller was cancelled
+
+    def _shared_result(self, published: tuple) -> Any:
+        with self._lock:
+            self.coalesced += 1
+        return published[0]
+
+    def _cache_key(self, key: str, suffix: str) -> str:
+        # Hash so arbitrary keys fit backend key limits (e.g. memcached's 250 bytes)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return f"singleflight:{self.name}:{digest}:{suffix}"
+
+    def _run_shared(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Cross-process leader election through the shared cache"""
+        cache = caches[self.cache_alias]
+        lock_key, result_key = self._cache_key(key, 'lock'), self._cache_key(key, 'result')
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout
+
+        waited = False
+        while not cache.add(lock_key, token, timeout=self.lock_timeout):
+            # Another process is computing this key: wait for its published result
+            waited = True
+            published = cache.get(result_key)
+            if published is not None:
+                return self._shared_result(published)
+            if time.monotonic() >= deadline:
+                logger.warning(f"Single-flight '{self.name}' gave up waiting for another worker")
+                return fn()
+            time.sleep(self.poll_interval)
+
+        try:
+            # The other leader may have published and released between our polls
+            published = cache.get(result_key) if waited else None
+            if published is not None:
+                return self._shared_result(published)
+            result = fn()
+            # Wrapped so a None result still counts as published
+            cache.set(result_key, (result,), timeout=self.lock_timeout)
+            return result
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+
+def _single_flight(name: str) -> SingleFlight:
+    return SingleFlight(
+        name,
+        cache_alias=getattr(settings, 'SINGLE_FLIGHT_CACHE', None) or None,
+        lock_timeout=getattr(settings, 'SINGLE_FLIGHT_LOCK_TIMEOUT', 30),
+        poll_interval=getattr(settings, 'SINGLE_FLIGHT_POLL_INTERVAL', 0.05),
+    )
+
+
+geocode_flight = _single_flight('geocode')
+route_flight = _single_flight('route')
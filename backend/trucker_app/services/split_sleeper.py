@@ -0,0 +1,223 @@
+"""
+Split sleeper-berth planning: which rests get a trip to its destination first.
+
+Wherever HOSSimulator stops for a 30-minute break or a 10-hour rest it could
+instead start or complete a split sleeper-berth pair (7/3 or 8/2, see
+hos_simulator.rest_options). best_rests searches those choices depth first,
+stepping the same driver clocks as the simulator between decision points,
+and prunes with
+
+- a memo of the earliest time each clock state (leg, distance left, driving,
+  window, break, cycle, pending split) has been reached: reaching it again
+  later cannot end sooner, and
+- a bound of the current time plus the driving and stop time still ahead
+  against the best arrival found so far.
+
+A branch that drives past the 14-hour window counting its pending split
+rest, and then never completes the pair, is dropped (validate would flag
+it). The plain schedule is explored first, so a split plan is only returned
+when it arrives strictly earlier. Cycle hours are modelled as a running total
+(SimpleCycle) seeded from the driver's clocks; schedule_planner replays the
+chosen rests through the simulator with the real cycle model.
+
+Pure Python (no Django imports) like hos_simulator.
+"""
+from math import ceil
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from .hos_simulator import (
+    Leg, DriverClocks, Rules, PROPERTY_70_8, OFF_DUTY_CODE, SLEEPER_BERTH_CODE, ON_DUTY_CODE, pairs, rest_options
+)
+
+
+class _LegPlan(NamedTuple):
+    minutes: int
+    miles: float
+    miles_per_minute: float
+    stop_time: int
+
+
+class _Clocks:
+    """Simulator state between events, without the timeline"""
+    __slots__ = ('t', 'leg', 'remaining', 'leg_miles', 'since_fuel', 'driving', 'window', 'since_break',
+                 'cycle_used', 'pending', 'drive_after', 'window_after', 'excluded', 'overrun', 'legal', 'resting')
+
+    def copy(self) -> '_Clocks':
+        clocks = _Clocks()
+        for name in self.__slots__:
+            setattr(clocks, name, getattr(self, name))
+        return clocks
+
+    def key(self) -> Tuple:
+        return (self.leg, self.remaining, self.since_fuel, self.driving, self.window, self.since_break,
+                self.cycle_used, self.pending, self.drive_after, self.window_after, self.excluded, self.overrun,
+                self.resting)
+
+    def add(self, on_duty: bool, minutes: int, split: bool = False):
+        if on_duty:
+            self.resting = 0
+            self.cycle_used += minutes
+            if self.window is None:
+                self.window = 0
+        if self.window is not None:
+            if split:
+                self.excluded += minutes  # split rests left out of the window until they pair
+            else:
+                self.window += minutes
+                self.window_after += minutes
+        self.t += minutes
+
+    def drive(self, minutes: int, rules: Rules):
+        self.add(True, minutes)
+        self.driving += minutes
+        self.drive_after += minutes
+        self.since_break += minutes
+        if self.window + self.excluded > rules.duty_window:
+            self.overrun = True
+
+    def stop(self, status: int, minutes: int, rules: Rules, split: bool = False):
+        """Mirror of HOSSimulator.run's stop()"""
+        rested = minutes
+        if status in (OFF_DUTY_CODE, SLEEPER_BERTH_CODE) and not split and minutes >= rules.daily_rest and self.resting:
+            minutes = max(1, minutes - self.resting)
+            rested, self.resting = minutes + self.resting, 0
+        self.add(status not in (OFF_DUTY_CODE, SLEEPER_BERTH_CODE), minutes, split)
+        if minutes >= rules.break_length:
+            self.since_break = 0
+        if status in (OFF_DUTY_CODE, SLEEPER_BERTH_CODE) and rested >= rules.daily_rest:
+            self.legal &= not self.overrun
+            self.driving = 0
+            self.window = None
+            self.pending = None
+            self.excluded = 0
+            self.overrun = False
+        elif split:
+            if self.pending is not None and pairs(self.pending, (status, minutes), rules):
+                self.driving, self.window = self.drive_after, self.window_after
+                self.excluded = 0
+                self.overrun = False
+            else:
+                self.legal &= not self.overrun
+            self.pending = (status, minutes)
+            self.drive_after = self.window_after = 0
+
+
+def _leg_plans(legs: Sequence[Leg], rules: Rules) -> List[_LegPlan]:
+    plans = []
+    for leg in legs:
+        # Same rounding as HOSSimulator.run
+        minutes = max(1, round(leg.hours * 60)) if leg.hours > 0 or leg.miles > 0 else 0
+        plans.append(_LegPlan(
+            minutes, leg.miles, leg.miles / minutes if minutes else 0.0, rules.stop_time if leg.stop else 0
+        ))
+    return plans
+
+
+def _next_decision(clocks: _Clocks, legs: List[_LegPlan], rules: Rules) -> Optional[bool]:
+    """
+    Advance to the next rest decision and return whether it is at a driving
+    or window limit; None once the trip is done or the branch is illegal
+    """
+    while clocks.leg < len(legs) and clocks.legal:
+        leg = legs[clocks.leg]
+        while clocks.remaining > 0:
+            if clocks.since_fuel >= rules.fuel_interval - 1e-6:
+                clocks.stop(ON_DUTY_CODE, rules.fuel_time, rules)
+                clocks.since_fuel = 0.0
+                continue
+
+            window_left = rules.duty_window - clocks.window if clocks.window is not None else rules.duty_window
+            cycle_left = rules.cycle_limit - clocks.cycle_used
+            if cycle_left <= 0:
+                clocks.stop(OFF_DUTY_CODE, rules.restart, rules)
+                clocks.cycle_used = 0
+                continue
+            if clocks.driving >= rules.max_driving or window_left <= 0:
+                return True
+            if clocks.since_break >= rules.break_after:
+                return False
+
+            chunk = min(clocks.remaining, rules.max_driving - clocks.driving, window_left,
+                        rules.break_after - clocks.since_break, cycle_left)
+            if leg.miles_per_minute > 0:
+                chunk = min(chunk, max(1, ceil((rules.fuel_interval - clocks.since_fuel) / leg.miles_per_minute - 1e-9)))
+            miles = clocks.leg_miles if chunk == clocks.remaining else min(clocks.leg_miles, chunk * leg.miles_per_minute)
+            clocks.drive(chunk, rules)
+            clocks.remaining -= chunk
+            clocks.leg_miles -= miles
+            clocks.since_fuel += miles
+
+        if leg.stop_time:
+            clocks.stop(ON_DUTY_CODE, leg.stop_time, rules)
+        clocks.leg += 1
+        if clocks.leg < len(legs):
+            clocks.remaining = legs[clocks.leg].minutes
+            clocks.leg_miles = legs[clocks.leg].miles
+    return None
+
+
+def best_rests(legs: Sequence[Leg], clocks: DriverClocks = DriverClocks(), rules: Rules = PROPERTY_70_8,
+               max_nodes: int = 20000) -> Tuple[int, ...]:
+    """
+    Rest choices for HOSSimulator.run(rests=...) that arrive earliest; empty
+    when no split schedule beats the plain one. The search stops expanding
+    after `max_nodes` decision points and returns the best plan found.
+    """
+    plans = _leg_plans(legs, rules)
+    if not plans:
+        return ()
+    # Driving and stop time from the start of each leg to the end of the trip
+    ahead = [0] * (len(plans) + 1)
+    for i in range(len(plans) - 1, -1, -1):
+        ahead[i] = ahead[i + 1] + plans[i].minutes + plans[i].stop_time
+
+    start = _Clocks()
+    start.t = 0
+    start.leg = 0
+    start.remaining = plans[0].minutes
+    start.leg_miles = plans[0].miles
+    start.since_fuel = 0.0
+    start.driving = clocks.driving
+    start.window = clocks.window
+    start.since_break = clocks.since_break
+    start.cycle_used = clocks.cycle_used
+    start.pending = None
+    start.drive_after = start.window_after = start.excluded = 0
+    start.overrun = False
+    start.legal = True
+    start.resting = clocks.resting
+
+    memo: Dict[Tuple, int] = {}
+    best_end = float('inf')
+    best_path: Tuple[int, ...] = ()
+    path: List[int] = []
+    nodes = 0
+
+    def search(state: _Clocks):
+        nonlocal best_end, best_path, nodes
+        at_limit = _next_decision(state, plans, rules)
+        if at_limit is None:
+            if state.legal and not state.overrun and state.t < best_end:
+                best_end, best_path = state.t, tuple(path)
+            return
+        leg = plans[state.leg]
+        if state.t + state.remaining + leg.stop_time + ahead[state.leg + 1] >= best_end:
+            return
+        key = state.key()
+        if memo.get(key, float('inf')) <= state.t:
+            return
+        memo[key] = state.t
+        nodes += 1
+        if nodes > max_nodes:
+            return
+        for index, choice in enumerate(rest_options(rules, at_limit, state.pending)):
+            branch = state.copy()
+            branch.stop(choice.status, choice.minutes, rules, choice.split)
+            path.append(index)
+            search(branch)
+            path.pop()
+
+    search(start)
+    # Trailing plain rests are the default
+    while best_path and best_path[-1] == 0:
+        best_path = best_path[:-1]
+    return best_path
@@ -1,3 +1,1436 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta, timezone
+from unittest import mock
+import asyncio
+import json
+import tempfile
+import threading
+import time as clock
+import numpy as np
+import httpx
+import requests
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from .models import Trip, DailyLog, LogEntry, GeocodeCacheEntry, TripPlan
+from .services.cache import LRUCache, GeocodeCache, RouteCache, geocode_cache, route_cache
+from .services.circuit_breaker import CircuitBreaker, geocode_breaker, directions_breaker
+from .services.route_service import RouteService
+from .services.async_route_service import AsyncRouteService
+from .services import schedule_planner
+from .services.duty_schedule import DutyTimeline, split_days, OFF_DUTY_CODE, SLEEPER_BERTH_CODE, DRIVING_CODE, ON_DUTY_CODE
+from .services.hos_simulator import HOSSimulator, Leg, DriverClocks, validate
+from .services.duty_ledger import FenwickTree, DutyLedger
+from .services.split_sleeper import best_rests
+from .services.schedule_sweep import sweep, pareto_front
+from .services.plan_codec import encode_geometry, decode_geometry
+from .services.road_graph import RoadGraph, road_graph
+from .services.gazetteer import gazetteer, parse_location
+from .services.geometry import encode_polyline, decode_polyline, simplify, driven_part
+from .services.distance import haversine_miles, haversine_matrix, nearest_k
+from .services.single_flight import SingleFlight
+from .services.hos_service import HOSComplianceService
+from .services.concurrency import Deadline, DeadlineExceeded, iter_completed, run_concurrently
+from . import views
+from .services.ors_transport import FaultInjector, FixtureStore, RecordingAdapter, ReplayAdapter, fixture_key
+from .services.http_client import CappedRetry, RETRY_STATUS_CODES, build_session
 
-# Create your tests here.
+
+class TripDetailQueryTests(TestCase):
+    """A trip's detail view loads its daily logs and entries in a fixed number of queries"""
+
+    def setUp(self):
+        self.trip = Trip.objects.create(
+            current_location='Chicago, IL', pickup_location='Denver, CO', dropoff_location='Seattle, WA'
+        )
+        for day in range(10):
+            log = DailyLog.objects.create(trip=self.trip, date=date(2026, 10, 1) + timedelta(days=day), log_order=day + 1)
+            # Created out of order to check the prefetch ordering; the last entry runs to midnight
+            LogEntry.objects.create(daily_log=log, duty_status='off_duty', start_time=time(17), end_time=time(0), location='Rest area')
+            LogEntry.objects.create(daily_log=log, duty_status='off_duty', start_time=time(0), end_time=time(6), location='Rest area')
+            LogEntry.objects.create(daily_log=log, duty_status='driving', start_time=time(6), end_time=time(17), location='En route')
+
+    def test_get_trip_query_budget(self):
+        # Trip, daily logs, log entries
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('get_trip', args=[self.trip.id]))
+        self.assertEqual(response.status_code, 200)
+
+        logs = response.json()['daily_logs']
+        self.assertEqual([log['log_order'] for log in logs], list(range(1, 11)))
+        entries = logs[0]['log_entries']
+        self.assertEqual([entry['start_time'] for entry in entries], ['00:00:00', '06:00:00', '17:00:00'])
+        self.assertEqual([entry['duration_hours'] for entry in entries], [6.0, 11.0, 7.0])
+
+
+@override_settings(TRIP_LIST_DEFAULT_LIMIT=2)
+class TripListPaginationTests(TestCase):
+    """The trip list walks pages by cursor without repeating or skipping trips"""
+
+    def setUp(self):
+        created_at = datetime(2026, 10, 1, 12, tzinfo=timezone.utc)
+        self.trips = [
+            Trip.objects.create(
+                current_location='Chicago, IL', pickup_location=pickup, dropoff_location='Seattle, WA',
+                created_at=created_at + timedelta(days=day // 2)  # pairs share a created_at
+            )
+            for day, pickup in enumerate(['Denver, CO', 'Omaha, NE', 'Denver, CO', 'Boise, ID', 'Reno, NV'])
+        ]
+
+    def page(self, **params):
+        response = self.client.get(reverse('list_trips'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_cursor_walks_all_trips_newest_first(self):
+        ids, cursor = [], None
+        with self.assertNumQueries(1):
+            page = self.page()
+        while True:
+            ids += [row['id'] for row in page['results']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+            page = self.page(cursor=cursor)
+        expected = sorted(self.trips, key=lambda trip: (trip.created_at, trip.id), reverse=True)
+        self.assertEqual(ids, [str(trip.id) for trip in expected])
+
+    def test_filters(self):
+        page = self.page(location='denver', limit=10)
+        self.assertEqual(len(page['results']), 2)
+        page = self.page(created_after='2026-10-02T00:00:00Z', created_before='2026-10-03T00:00:00Z')
+        self.assertEqual({row['id'] for row in page['results']}, {str(self.trips[2].id), str(self.trips[3].id)})
+        self.assertIsNone(page['next_cursor'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list_trips'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PlanCodecTests(TestCase):
+    """Stored route geometry round-trips at 1e-5 degrees"""
+
+    def test_geometry_round_trip(self):
+        coordinates = [[-87.62980, 41.87811, 180.0], [-87.63001, 41.87999], [-104.99025, 39.73915], [-122.33207, 47.60621]]
+        self.assertEqual(decode_geometry(encode_geometry(coordinates)), [point[:2] for point in coordinates])
+        self.assertEqual(decode_geometry(encode_geometry([])), [])
+
+
+class GeocodeNegativeCacheTests(TestCase):
+    """Only an ORS "no match" is cached as a negative result, never a failed call"""
+
+    location = 'Nowhere Junction, ZZ'  # unknown to the gazetteer
+
+    def setUp(self):
+        geocode_cache.clear()
+        geocode_breaker.reset()
+        self.addCleanup(geocode_cache.clear)
+        self.addCleanup(geocode_breaker.reset)
+
+    def service(self, **get):
+        service = RouteService()
+        service.session = mock.Mock(get=mock.Mock(**get))
+        return service
+
+    def test_failed_call_is_not_cached(self):
+        service = self.service(side_effect=requests.exceptions.Timeout())
+        self.assertIsNone(service.geocode_location(self.location))
+        self.assertEqual(geocode_cache.get(self.location), (False, None, False))
+
+    def test_server_error_is_not_cached(self):
+        service = self.service(return_value=mock.Mock(status_code=503, text='unavailable'))
+        self.assertIsNone(service.geocode_location(self.location))
+        self.assertEqual(geocode_cache.get(self.location), (False, None, False))
+
+    def test_no_match_is_cached_negative(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'features': []}
+        service = self.service(return_value=response)
+        self.assertIsNone(service.geocode_location(self.location))
+        self.assertEqual(geocode_cache.get(self.location), (True, None, False))
+        # Answered from the cache, without another upstream call
+        self.assertIsNone(service.geocode_location(self.location))
+        self.assertEqual(service.session.get.call_count, 1)
+
+    def test_cached_gazetteer_answer_stays_degraded(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'features': []}
+        service = self.service(return_value=response)
+        coords = service.geocode_location('Denver, CO')  # ORS has no match, the gazetteer does
+        self.assertIsNotNone(coords)
+        self.assertTrue(service.degraded)
+
+        later = self.service()
+        self.assertEqual(later.geocode_with_source('Denver, CO'), (coords, 'cache'))
+        self.assertTrue(later.degraded)
+        later.session.get.assert_not_called()
+
+        geocode_cache.memory.clear()  # from the table
+        self.assertEqual(geocode_cache.get('Denver, CO'), (True, coords, True))
+
+
+class BatchGeocodeTests(TestCase):
+    """Cached keys are read in one query; gazetteer answers mark the batch degraded"""
+
+    def setUp(self):
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+
+    def test_cache_read_in_one_query(self):
+        cached = [f'Depot {number}, TX' for number in range(20)]
+        for number, location in enumerate(cached):
+            geocode_cache.set(location, (30.0 + number / 100, -97.0))
+        geocode_cache.memory.clear()
+
+        response = self.client.post(
+            reverse('batch_geocode'), {'locations': cached + [cached[0].upper(), 'Denver, CO']}, content_type='application/json'
+        )
+        with self.assertNumQueries(1):
+            lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        results, summary = lines[:-1], lines[-1]['summary']
+        self.assertEqual(len(results), 22)
+        self.assertEqual(summary['sources'], {'cache': 21, 'gazetteer': 1})
+        self.assertTrue(summary['degraded'])
+        self.assertEqual([result['location'] for result in results if result['degraded']], ['Denver, CO'])
+
+    def test_openroute_cache_hits_are_not_degraded(self):
+        geocode_cache.set('Depot 1, TX', (30.0, -97.0))
+        response = self.client.post(reverse('batch_geocode'), {'locations': ['Depot 1, TX']}, content_type='application/json')
+        summary = json.loads(b''.join(response.streaming_content).splitlines()[-1])['summary']
+        self.assertFalse(summary['degraded'])
+
+
+@override_settings(PLAN_BATCH_PROCESSES=1, ROUTE_BACKEND='road_graph')
+class BatchPlanErrorTests(TestCase):
+    """A trip whose scheduling raises is reported on its own, the rest of the batch is planned"""
+
+    trips = [
+        {'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA'},
+        {'current_location': 'Omaha, NE', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Boise, ID'},
+    ]
+
+    def test_failing_trip_does_not_fail_the_batch(self):
+        plan_and_validate = schedule_planner.plan_and_validate
+
+        def failing(request, *args):
+            if request.origin == 'Omaha, NE':
+                raise ValueError('no schedule')
+            return plan_and_validate(request, *args)
+
+        with mock.patch.object(schedule_planner, 'plan_and_validate', side_effect=failing):
+            response = self.client.post(reverse('plan_trip_batch'), {'trips': self.trips}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        planned, failed = response.json()['results']
+        self.assertEqual(planned['status'], 'planned')
+        self.assertEqual(failed, {'index': 1, 'status': 'error', 'error': 'Error planning trip: ValueError: no schedule'})
+        self.assertEqual(Trip.objects.count(), 1)
+        self.assertEqual(response.json()['summary']['failed'], 1)
+
+
+@override_settings(PLAN_BATCH_PROCESSES=1, ROUTE_BACKEND='road_graph')
+class BatchPlanDegradedTests(TestCase):
+    """A batch trip is degraded when any of its locations is a gazetteer estimate, cached or not"""
+
+    trip = {'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA'}
+    coords = {'Chicago, IL': (41.8781, -87.6298), 'Denver, CO': (39.7392, -104.9903), 'Seattle, WA': (47.6062, -122.3321)}
+
+    def setUp(self):
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+
+    def plan(self, degraded):
+        for location, coords in self.coords.items():
+            geocode_cache.set(location, coords, degraded=degraded)
+        response = self.client.post(reverse('plan_trip_batch'), {'trips': [self.trip]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['summary']['geocode_sources'], {'cache': 3})
+        return body['results'][0]
+
+    def test_degraded_cache_hit(self):
+        self.assertTrue(self.plan(degraded=True)['degraded'])
+
+    def test_openroute_cache_hit(self):
+        self.assertFalse(self.plan(degraded=False)['degraded'])
+
+
+class CircuitBreakerTests(TestCase):
+    """Only the caller granted the half-open probe can close an open breaker"""
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('test-breaker', failure_rate=0.5, min_calls=2, reset_timeout=0.05)
+        self.breaker.reset()
+        self.addCleanup(self.breaker.reset)
+
+    def open_breaker(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_late_success_does_not_close_open_breaker(self):
+        self.open_breaker()
+        self.breaker.record_success()  # a call that started before the breaker opened
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_probe_holder_closes_breaker(self):
+        self.open_breaker()
+        clock.sleep(0.06)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+        probe_granted, probe_done = threading.Event(), threading.Event()
+
+        def probe():
+            self.assertTrue(self.breaker.allow_request())
+            probe_granted.set()
+            probe_done.wait(1)
+            self.breaker.record_success()
+
+        thread = threading.Thread(target=probe)
+        thread.start()
+        probe_granted.wait(1)
+        self.assertFalse(self.breaker.allow_request())  # one probe at a time
+        self.breaker.record_success()  # not the probe: counted, but the breaker stays half-open
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        probe_done.set()
+        thread.join()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens_breaker(self):
+        self.open_breaker()
+        clock.sleep(0.06)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+
+class LRUCacheTests(TestCase):
+    """Eviction order and per-entry expiry of the in-process tier"""
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b', None), cache.get('c')), (1, None, 3))
+
+    def test_entries_expire(self):
+        cache = LRUCache(maxsize=4, ttl=60)
+        cache.set('short', 1, ttl=0.01)
+        cache.set('long', 2)
+        clock.sleep(0.02)
+        self.assertIsNone(cache.get('short', None))
+        self.assertEqual(cache.get('long'), 2)
+        self.assertEqual(len(cache), 1)
+
+
+class GeocodeCacheTests(TestCase):
+    """Two-tier geocode cache: normalized keys, negative entries, table fallthrough, counters"""
+
+    def setUp(self):
+        self.cache = GeocodeCache(maxsize=16, ttl=3600, negative_ttl=60)
+
+    def test_normalize(self):
+        self.assertEqual(self.cache.normalize('  Denver ,CO  '), 'denver, co')
+        self.assertEqual(self.cache.normalize('NEW   York,, ny'), 'new york, ny')
+        self.assertEqual(self.cache.normalize(' , '), '')
+
+    def test_spellings_share_an_entry(self):
+        self.cache.set('Denver, CO', (39.74, -104.99))
+        self.assertEqual(self.cache.get('  denver,co'), (True, (39.74, -104.99), False))
+
+    def test_negative_entry(self):
+        self.cache.set('Nowhere, ZZ', None)
+        self.assertEqual(self.cache.get('nowhere, zz'), (True, None, False))
+        entry = GeocodeCacheEntry.objects.get(query='nowhere, zz')
+        self.assertIsNone(entry.latitude)
+        # Negative entries default to the shorter TTL
+        self.assertLess(entry.expires_at, datetime.now(timezone.utc) + timedelta(seconds=61))
+
+    def test_table_fallthrough_when_memory_is_empty(self):
+        self.cache.set('Denver, CO', (39.74, -104.99))
+        self.cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get('Denver, CO'), (True, (39.74, -104.99), False))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get('Denver, CO'), (True, (39.74, -104.99), False))
+
+    def test_expired_table_entry_is_a_miss(self):
+        self.cache.set('Denver, CO', (39.74, -104.99))
+        self.cache.clear()
+        GeocodeCacheEntry.objects.update(expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+        self.assertEqual(self.cache.get('Denver, CO'), (False, None, False))
+
+    def test_memory_entry_expires(self):
+        self.cache.set('Denver, CO', (39.74, -104.99), ttl=0.01)
+        GeocodeCacheEntry.objects.all().delete()
+        clock.sleep(0.02)
+        self.assertEqual(self.cache.get('Denver, CO'), (False, None, False))
+
+    def test_get_many(self):
+        self.cache.set('Denver, CO', (39.74, -104.99))
+        self.cache.set('Boise, ID', (43.62, -116.2))
+        self.cache.set('Nowhere, ZZ', None)
+        self.cache.memory.delete('boise, id')
+        with self.assertNumQueries(1):
+            found = self.cache.get_many(['Denver, CO', 'BOISE, ID', 'Nowhere, ZZ', 'Reno, NV'])
+        self.assertEqual(found, {
+            'denver, co': ((39.74, -104.99), False),
+            'boise, id': ((43.62, -116.2), False),
+            'nowhere, zz': (None, False),
+        })
+
+    def test_counters(self):
+        self.cache.set('Denver, CO', (39.74, -104.99))
+        self.cache.set('Nowhere, ZZ', None)
+        self.cache.get('Denver, CO')
+        self.cache.get('Nowhere, ZZ')
+        self.cache.get('Reno, NV')
+        self.cache.memory.clear()
+        self.cache.get('Denver, CO')
+        stats = self.cache.stats()
+        self.assertEqual(
+            {name: stats[name] for name in ('memory_hits', 'db_hits', 'negative_hits', 'misses')},
+            {'memory_hits': 1, 'db_hits': 1, 'negative_hits': 1, 'misses': 1}
+        )
+        self.assertEqual(stats['memory_entries'], 1)
+
+
+class RouteCacheTests(TestCase):
+    """Snapped route keys, counters and independent copies"""
+
+    route = {'distance': 12.5, 'legs': [{'distance': 12.5, 'instructions': [{'instruction': 'Head north'}]}]}
+
+    def setUp(self):
+        self.cache = RouteCache(maxsize=8, ttl=3600, grid_degrees=0.01)
+
+    def test_nearby_waypoints_share_a_key(self):
+        key = self.cache.key([(39.7401, -104.9902), (47.6062, -122.3321)], 'driving-hgv', 'mi')
+        self.assertEqual(key, self.cache.key([(39.7399, -104.9899), (47.6058, -122.3318)], 'driving-hgv', 'mi'))
+        self.assertNotEqual(key, self.cache.key([(39.7401, -104.9902), (47.6062, -122.3321)], 'driving-car', 'mi'))
+
+    def test_callers_get_independent_copies(self):
+        key = self.cache.key([(39.74, -104.99), (47.61, -122.33)], 'driving-hgv', 'mi')
+        self.cache.set(key, self.route)
+        first = self.cache.get(key)
+        first['legs'][0]['instructions'].clear()
+        first['distance'] = 0
+        self.assertEqual(self.cache.get(key), self.route)
+
+    def test_counters(self):
+        key = self.cache.key([(39.74, -104.99), (47.61, -122.33)], 'driving-hgv', 'mi')
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, self.route)
+        self.cache.get(key)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 1, 'entries': 1})
+
+
+def shifts(timeline):
+    """Independent check of a simulated timeline: (driving, window) minutes per shift and the longest drive without a break"""
+    result, driving, window_start, since_break, longest, rest_start = [], 0, None, 0, 0, None
+    for start, end, status in zip(timeline.starts, timeline.ends, timeline.statuses):
+        if status in (OFF_DUTY_CODE, SLEEPER_BERTH_CODE):
+            rest_start = start if rest_start is None else rest_start
+            if end - rest_start >= 30:
+                since_break = 0
+            if end - rest_start >= 10 * 60 and window_start is not None:
+                result.append((driving, last_duty_end - window_start))
+                driving, window_start = 0, None
+            continue
+        rest_start = None
+        window_start = start if window_start is None else window_start
+        last_duty_end = end
+        if status == DRIVING_CODE:
+            driving += end - start
+            since_break += end - start
+            longest = max(longest, since_break)
+        elif end - start >= 30:
+            since_break = 0
+    if window_start is not None:
+        result.append((driving, last_duty_end - window_start))
+    return result, longest
+
+
+class HOSSimulatorTests(TestCase):
+    """The simulator keeps to the 11/14-hour, 30-minute break and 70/8 limits, and validate() catches breaches"""
+
+    legs = (Leg(300, 5.5, 'Denver, CO', 'pickup'), Leg(2200, 40, 'Seattle, WA', 'dropoff'))
+
+    def test_shift_limits(self):
+        result = HOSSimulator().run(self.legs, 'Chicago, IL')
+        per_shift, longest_without_break = shifts(result.timeline)
+        self.assertGreater(len(per_shift), 3)
+        for driving, window in per_shift:
+            self.assertLessEqual(driving, 11 * 60)
+            self.assertLessEqual(window, 14 * 60)
+        self.assertLessEqual(longest_without_break, 8 * 60)
+        self.assertEqual(round(result.miles, 6), 2500)
+        self.assertEqual(validate(result.timeline), [])
+
+    def test_fuel_every_1000_miles(self):
+        result = HOSSimulator().run(self.legs, 'Chicago, IL')
+        fuel = [stop for stop in result.stops if stop.kind == 'fuel']
+        self.assertEqual(len(fuel), 2)
+        for stop, mile in zip(fuel, (1000, 2000)):
+            self.assertGreaterEqual(stop.distance, mile)
+            self.assertLess(stop.distance, mile + 1)
+            self.assertEqual(stop.minutes, 60)
+
+    def test_restart_when_cycle_runs_out(self):
+        clocks = DriverClocks(cycle_used=65 * 60)
+        result = HOSSimulator().run((Leg(550, 10, 'Omaha, NE', 'dropoff'),), 'Chicago, IL', clocks)
+        restarts = [stop for stop in result.stops if stop.kind == 'cycle_restart']
+        self.assertEqual(len(restarts), 1)
+        self.assertEqual(restarts[0].minutes, 34 * 60)
+        # Exactly the 5 hours left in the cycle are worked before the restart
+        timeline = result.timeline
+        on_duty = sum(
+            end - start for start, end, status in zip(timeline.starts, timeline.ends, timeline.statuses)
+            if status in (DRIVING_CODE, ON_DUTY_CODE) and end <= restarts[0].start
+        )
+        self.assertEqual(on_duty, 5 * 60)
+        self.assertEqual(validate(timeline, clocks), [])
+
+    def timeline(self, *intervals):
+        timeline = DutyTimeline()
+        start = 0
+        for status, minutes in intervals:
+            timeline.append(start, start + minutes, status, 'Somewhere', '')
+            start += minutes
+        return timeline
+
+    def test_validate_flags_driving_limit(self):
+        timeline = self.timeline((DRIVING_CODE, 8 * 60), (OFF_DUTY_CODE, 30), (DRIVING_CODE, 4 * 60))
+        self.assertEqual(validate(timeline), ['Shift 1: Exceeds 11-hour driving limit (12.0 hours)'])
+
+    def test_validate_flags_duty_window(self):
+        timeline = self.timeline(
+            (DRIVING_CODE, 5 * 60), (ON_DUTY_CODE, 6 * 60), (OFF_DUTY_CODE, 30), (DRIVING_CODE, 4 * 60)
+        )
+        self.assertEqual(validate(timeline), ['Shift 1: Drives after the 14-hour duty window'])
+
+    def test_validate_flags_missing_break(self):
+        timeline = self.timeline((DRIVING_CODE, 9 * 60))
+        self.assertEqual(validate(timeline), ['Shift 1: Drives more than 8 hours without a 30-minute break'])
+
+    def test_validate_flags_cycle(self):
+        timeline = self.timeline((DRIVING_CODE, 2 * 60))
+        self.assertEqual(
+            validate(timeline, DriverClocks(cycle_used=69 * 60)), ['Shift 1: Exceeds 70-hour cycle limit (71.0 hours)']
+        )
+
+    def test_validate_accepts_legal_shifts(self):
+        timeline = self.timeline(
+            (DRIVING_CODE, 8 * 60), (OFF_DUTY_CODE, 30), (DRIVING_CODE, 3 * 60),
+            (OFF_DUTY_CODE, 10 * 60), (DRIVING_CODE, 8 * 60)
+        )
+        self.assertEqual(validate(timeline), [])
+
+
+class DutyLedgerTests(TestCase):
+    """Fenwick tree sums and rolling 8-day cycle hours against brute force"""
+
+    def test_fenwick_tree_matches_brute_force(self):
+        tree, values = FenwickTree(size=4), [0] * 40
+        for step in range(120):
+            index, delta = (step * 7) % 40, step % 13 - 4
+            tree.add(index, delta)  # grows past the initial size
+            values[index] += delta
+        self.assertGreaterEqual(len(tree), 40)
+        for start in range(0, 41, 3):
+            for end in range(start, 41, 5):
+                self.assertEqual(tree.range(start, end), sum(values[start:end]))
+        self.assertEqual(tree.prefix(100), sum(values))
+        self.assertEqual(tree.range(10, 5), 0)
+
+    def test_cycle_used_matches_brute_force(self):
+        ledger = DutyLedger(datetime(2026, 10, 1))
+        day = 24 * 60
+        # Out of order, across midnight, with gaps
+        intervals = [(d * day + 6 * 60, d * day + 6 * 60 + 600 + 37 * d) for d in (3, 0, 1, 5, 2, 4, 7, 6, 9)]
+        intervals.append((10 * day - 120, 10 * day + 180))
+        for start, end in intervals:
+            ledger.add(start, end)
+
+        def brute(t):
+            window = (t - 8 * day, t)
+            return sum(max(0, min(end, window[1]) - max(start, window[0])) for start, end in intervals)
+
+        for t in range(0, 12 * day, 97):
+            self.assertEqual(ledger.cycle_used(t), brute(t))
+            self.assertEqual(ledger.on_duty_between(t - 1000, t), sum(
+                max(0, min(end, t) - max(start, t - 1000)) for start, end in intervals
+            ))
+
+    def test_restart_cuts_the_window(self):
+        ledger = DutyLedger(datetime(2026, 10, 1))
+        ledger.add(0, 600)
+        ledger.add(600 + 34 * 60, 600 + 34 * 60 + 120)  # after a 34-hour gap
+        self.assertEqual(ledger.cycle_used(600 + 34 * 60 + 120), 120)
+        self.assertEqual(ledger.cycle_used(600 + 34 * 60 - 1), 600)
+
+    def test_seeded_spreads_cycle_hours(self):
+        start = datetime(2026, 10, 8, 6, 0)
+        ledger = DutyLedger.seeded(start, 35)
+        self.assertEqual(ledger.cycle_used(ledger.minute(start)), 35 * 60)
+        # The oldest day drops out of the 8-day window first
+        self.assertEqual(ledger.recovery_time(ledger.minute(start), 40 * 60, 70 * 60), ledger.minute(start + timedelta(days=1, hours=7)))
+
+
+class SplitDaysTests(TestCase):
+    """Day logs cut a timeline at midnight, fill gaps with off duty and pro-rate miles"""
+
+    def setUp(self):
+        self.timeline = DutyTimeline()
+        self.timeline.append(0, 240, DRIVING_CODE, 'En route to Omaha, NE', 'Driving', 200.0)  # 22:00 - 02:00
+        self.timeline.append(240, 300, ON_DUTY_CODE, 'Omaha, NE', 'Dropoff')
+        self.days = split_days(self.timeline, datetime(2026, 10, 1, 22, 0), 'Chicago, IL')
+
+    def test_interval_split_at_midnight(self):
+        first, second = self.days
+        self.assertEqual((first.date, first.number, second.date, second.number), (date(2026, 10, 1), 1, date(2026, 10, 2), 2))
+        self.assertEqual(list(zip(first.starts, first.ends, first.statuses)), [
+            (0, 22 * 60, OFF_DUTY_CODE), (22 * 60, 24 * 60, DRIVING_CODE)
+        ])
+        self.assertEqual(list(zip(second.starts, second.ends, second.statuses)), [
+            (0, 120, DRIVING_CODE), (120, 180, ON_DUTY_CODE), (180, 24 * 60, OFF_DUTY_CODE)
+        ])
+        self.assertEqual(first.entry_times(1), (time(22), time(0)))
+        # The off-duty gap before the trip is at the origin; after it, at the last location
+        self.assertEqual(first.to_dict(self.timeline.strings)['entries'][0]['location'], 'Chicago, IL')
+        self.assertEqual(second.to_dict(self.timeline.strings)['entries'][-1]['location'], 'Omaha, NE')
+
+    def test_totals_and_miles(self):
+        first, second = self.days
+        self.assertEqual((first.miles, second.miles), (100.0, 100.0))
+        self.assertEqual((first.hours(DRIVING_CODE), first.hours(OFF_DUTY_CODE)), (2.0, 22.0))
+        self.assertEqual((second.hours(DRIVING_CODE), second.hours(ON_DUTY_CODE), second.hours(OFF_DUTY_CODE)), (2.0, 1.0, 21.0))
+        for day in self.days:
+            self.assertEqual(sum(day.totals), 24 * 60)
+
+    def test_trip_ending_at_midnight_has_no_empty_day(self):
+        timeline = DutyTimeline()
+        timeline.append(0, 120, DRIVING_CODE, 'En route', 'Driving', 100.0)
+        days = split_days(timeline, datetime(2026, 10, 1, 22, 0), 'Chicago, IL')
+        self.assertEqual(len(days), 1)
+        self.assertEqual(days[0].entry_times(1), (time(22), time(0)))
+
+
+class SplitSleeperTests(TestCase):
+    """best_rests finds a legal split sleeper-berth plan only when it arrives sooner"""
+
+    legs = (Leg(650, 650 / 55, 'Omaha, NE', 'dropoff'),)
+
+    def test_split_plan_is_shorter_and_legal(self):
+        rests = best_rests(self.legs)
+        self.assertTrue(rests)
+        simulator = HOSSimulator()
+        plain = simulator.run(self.legs, 'Chicago, IL')
+        split = simulator.run(self.legs, 'Chicago, IL', rests=rests)
+        self.assertLess(split.end, plain.end)
+        self.assertEqual(validate(split.timeline), [])
+        # A 3-hour off-duty rest paired with 7 hours in the sleeper berth
+        halves = sorted((stop.kind, stop.minutes) for stop in split.stops if stop.kind in ('split_rest', 'sleeper_berth'))
+        self.assertEqual(halves, [('sleeper_berth', 7 * 60), ('split_rest', 3 * 60)])
+
+    def test_planner_keeps_the_split_plan(self):
+        request = schedule_planner.ScheduleRequest(self.legs, 'Chicago, IL', datetime(2026, 10, 1, 6, 0), 0, 650, 650 / 55)
+        plain = schedule_planner.plan_and_validate(request)
+        split = schedule_planner.plan_and_validate(request._replace(sleeper_split=True))
+        self.assertLess(split.schedule.end, plain.schedule.end)
+        self.assertEqual(split.violations, [])
+
+    def test_no_split_when_it_does_not_help(self):
+        self.assertEqual(best_rests((Leg(300, 300 / 55, 'Peoria, IL', 'dropoff'),)), ())
+
+
+class ScheduleSweepTests(TestCase):
+    """Every sweep lane ends on the same minute as HOSSimulator.run; Pareto fronts keep ties"""
+
+    def test_lanes_match_the_simulator(self):
+        trips = [
+            (Leg(300, 5.5, 'Denver, CO', 'pickup'), Leg(1300, 24, 'Seattle, WA', 'dropoff')),
+            (Leg(0, 0, 'Chicago, IL', 'pickup'), Leg(2600, 47, 'Los Angeles, CA', 'dropoff')),
+            (Leg(40, 0.8, 'Gary, IN', 'pickup'), Leg(170, 3, 'Detroit, MI', 'dropoff')),
+        ]
+        departures = [0, 6 * 60 + 15, 23 * 60 + 59, 3 * 24 * 60 + 600]
+        cycle_hours = [0, 30, 61.5, 69, 70]
+        candidates = [(departure, round(hours * 60)) for departure in departures for hours in cycle_hours]
+        simulator = HOSSimulator()
+        for legs in trips:
+            result = sweep(legs, [d for d, _ in candidates], [c for _, c in candidates])
+            for (departure, cycle_used), arrival in zip(candidates, result.arrival):
+                expected = departure + simulator.run(legs, 'Origin', DriverClocks(cycle_used=cycle_used)).end
+                self.assertEqual(int(arrival), expected, (legs[-1].destination, departure, cycle_used))
+
+    def test_pareto_front(self):
+        rows = [
+            [1, 2],  # on the front,
+            [1, 2],  # and so is its duplicate
+            [2, 1],  # trades off against them
+            [2, 2],  # dominated by [1, 2]
+            [3, 3],  # dominated by everything above
+            [0, 5],  # best in one column
+        ]
+        self.assertEqual(pareto_front(rows).tolist(), [True, True, True, False, False, True])
+        self.assertEqual(pareto_front([]).tolist(), [])
+
+
+def no_features():
+    """ORS geocode response with no match, so plans fall back to the gazetteer without network calls"""
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {'features': []}
+    return response
+
+
+def plan_offline(test):
+    """Plan Chicago -> Denver -> Seattle on gazetteer coordinates and the road graph"""
+    geocode_cache.clear()
+    test.addCleanup(geocode_cache.clear)
+    with mock.patch('trucker_app.services.route_service.get_session', return_value=mock.Mock(get=mock.Mock(return_value=no_features()))):
+        response = test.client.post(reverse('plan_trip'), {
+            'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA'
+        }, content_type='application/json')
+    test.assertEqual(response.status_code, 201)
+    return Trip.objects.get(id=response.json()['trip']['id'])
+
+
+@override_settings(ROUTE_BACKEND='road_graph')
+class ScheduleSweepViewTests(TestCase):
+    """A sweep reuses the stored route and coordinates instead of geocoding and routing again"""
+
+    body = {'departure_start': '2026-10-01T04:00:00Z', 'departure_end': '2026-10-01T10:00:00Z', 'step_minutes': 120}
+
+    def setUp(self):
+        self.trip = plan_offline(self)
+
+    def sweep(self):
+        with mock.patch.object(RouteService, 'geocode_location', side_effect=AssertionError('geocoded')):
+            response = self.client.post(reverse('sweep_trip_schedule', args=[self.trip.id]), self.body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_stored_route_skips_geocoding_and_routing(self):
+        with mock.patch.object(RouteService, 'calculate_multi_leg_route', side_effect=AssertionError('routed')):
+            stored = self.sweep()
+        self.assertTrue(stored['degraded'])  # the plan was built on gazetteer coordinates
+
+        # Without the stored plan, the stored coordinates are routed again to the same options
+        TripPlan.objects.filter(trip=self.trip).delete()
+        routed = self.sweep()
+        stored.pop('degraded'), routed.pop('degraded')
+        self.assertEqual(stored, routed)
+
+
+class RoadGraphTests(TestCase):
+    """ALT-guided A* finds the same fastest routes as plain Dijkstra over the bundled graph"""
+
+    pairs = [
+        ('Seattle, WA', 'Miami, FL'), ('Chicago, IL', 'Denver, CO'), ('Los Angeles, CA', 'Boston, MA'),
+        ('El Paso, TX', 'Duluth, MN'), ('Bangor, ME', 'San Diego, CA'), ('Memphis, TN', 'Memphis, TN'),
+    ]
+
+    def node(self, name):
+        return road_graph.names.index(name)
+
+    def coords(self, name):
+        node = self.node(name)
+        return road_graph.latitudes[node], road_graph.longitudes[node]
+
+    def hours(self, path):
+        return sum(road_graph.hours[road_graph._edge(a, b)] for a, b in zip(path, path[1:]))
+
+    def test_alt_matches_dijkstra(self):
+        for start, end in self.pairs:
+            with self.subTest(start=start, end=end):
+                source, target = self.node(start), self.node(end)
+                path = road_graph.shortest_path(source, target)
+                self.assertEqual((path[0], path[-1]), (source, target))
+                self.assertAlmostEqual(self.hours(path), road_graph._travel_times(source)[target], places=9)
+
+                with mock.patch.object(road_graph, '_heuristic', return_value=0.0):
+                    plain = road_graph.shortest_path(source, target)
+                self.assertAlmostEqual(self.hours(path), self.hours(plain), places=9)
+                if start != end:
+                    alt_route = road_graph.route(self.coords(start), self.coords(end))
+                    with mock.patch.object(road_graph, '_heuristic', return_value=0.0):
+                        plain_route = road_graph.route(self.coords(start), self.coords(end))
+                    self.assertAlmostEqual(alt_route['distance'], plain_route['distance'], places=6)
+                    self.assertAlmostEqual(alt_route['duration'], plain_route['duration'], places=6)
+
+    def test_rejects_ends_far_from_the_network(self):
+        honolulu = (21.3069, -157.8583)
+        _, miles = road_graph.nearest_node(*honolulu)
+        self.assertGreater(miles, RoadGraph.MAX_SNAP_MILES)
+        self.assertIsNone(road_graph.route(honolulu, self.coords('Seattle, WA')))
+        self.assertIsNone(road_graph.route(self.coords('Seattle, WA'), honolulu))
+
+        # Just inside the snap radius still routes, with the access leg counted
+        near_seattle = (47.6062 + 1.0, -122.3321)
+        _, miles = road_graph.nearest_node(*near_seattle)
+        self.assertLess(miles, RoadGraph.MAX_SNAP_MILES)
+        route = road_graph.route(near_seattle, self.coords('Miami, FL'))
+        self.assertIsNotNone(route)
+        self.assertAlmostEqual(route['instructions'][0]['distance'], miles * RoadGraph.ACCESS_DETOUR)
+
+
+class GeometryTests(TestCase):
+    """Polyline encoding round-trips to its precision and simplification keeps both endpoints"""
+
+    def route_coordinates(self):
+        path = road_graph.shortest_path(road_graph.names.index('Seattle, WA'), road_graph.names.index('Miami, FL'))
+        return [[road_graph.longitudes[node], road_graph.latitudes[node]] for node in path]
+
+    def test_polyline_round_trip(self):
+        # Google's documented example, as GeoJSON [lon, lat]
+        example = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+        self.assertEqual(encode_polyline(example), '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@'), example)
+
+        coordinates = self.route_coordinates() + [[0.0, 0.0], [-0.00001, -0.00001], [179.99999, -89.99999]]
+        for precision in (5, 6):
+            with self.subTest(precision=precision):
+                decoded = decode_polyline(encode_polyline(coordinates, precision), precision)
+                self.assertEqual(len(decoded), len(coordinates))
+                for (lon, lat), (decoded_lon, decoded_lat) in zip(coordinates, decoded):
+                    self.assertAlmostEqual(decoded_lon, lon, delta=0.5 / 10 ** precision + 1e-12)
+                    self.assertAlmostEqual(decoded_lat, lat, delta=0.5 / 10 ** precision + 1e-12)
+        self.assertEqual(decode_polyline(encode_polyline([])), [])
+
+    def test_simplify_keeps_endpoints(self):
+        coordinates = self.route_coordinates()
+        for tolerance in (0.0, 0.01, 0.5, 2.0, 100.0):
+            with self.subTest(tolerance=tolerance):
+                simplified = simplify(coordinates, tolerance)
+                self.assertEqual(simplified[0], coordinates[0])
+                self.assertEqual(simplified[-1], coordinates[-1])
+                self.assertTrue(all(point in coordinates for point in simplified))
+        self.assertEqual(simplify(coordinates, 100.0), [coordinates[0], coordinates[-1]])
+        self.assertEqual(simplify(coordinates, 0.0), coordinates)
+
+        # A closed loop is measured from its shared endpoint; the near-straight [1, 0.1] goes
+        loop = [[0, 0], [1, 0.1], [2, 0], [1, -3], [0, 0]]
+        self.assertEqual(simplify(loop, 0.5), [[0, 0], [2, 0], [1, -3], [0, 0]])
+
+
+class DistanceMatrixTests(TestCase):
+    """The vectorised distance matrix agrees with the scalar haversine, and nearest_k orders by it"""
+
+    def points(self):
+        return [(road_graph.latitudes[i], road_graph.longitudes[i]) for i in range(0, len(road_graph), 7)]
+
+    def test_haversine_matrix_matches_scalar(self):
+        origins = self.points() + [(0.0, 0.0), (89.9, 179.9)]
+        destinations = origins[::-1] + [(0.0, 180.0), (-89.9, -179.9)]
+        matrix = haversine_matrix(origins, destinations)
+        self.assertEqual(matrix.shape, (len(origins), len(destinations)))
+        for i, origin in enumerate(origins):
+            for j, destination in enumerate(destinations):
+                self.assertAlmostEqual(matrix[i, j], haversine_miles(*origin, *destination), delta=1e-6)
+
+        # Missing points give NaN rows and columns rather than raising
+        matrix = haversine_matrix([None, origins[0]], [origins[1], None])
+        self.assertTrue(np.isnan(matrix[0]).all() and np.isnan(matrix[:, 1]).all())
+        self.assertFalse(np.isnan(matrix[1, 0]))
+
+    def test_nearest_k_order(self):
+        points = self.points()
+        matrix = haversine_matrix(points, points)
+        for k in (1, 3, len(points), len(points) + 5):
+            with self.subTest(k=k):
+                nearest = nearest_k(matrix, k)
+                self.assertEqual(nearest.shape, (len(points), min(k, len(points))))
+                for i, row in enumerate(nearest):
+                    self.assertEqual(row[0], i)  # each point is its own nearest
+                    distances = matrix[i, row]
+                    self.assertTrue((np.diff(distances) >= 0).all())
+                    self.assertEqual(distances[-1], np.sort(matrix[i])[len(row) - 1])
+
+        matrix = np.array([[3.0, np.nan, 1.0, 2.0]])
+        self.assertEqual(nearest_k(matrix, 4).tolist(), [[2, 3, 0, 1]])
+        self.assertEqual(nearest_k(matrix, 0).shape, (1, 0))
+
+
+class SingleFlightTests(TestCase):
+    """Concurrent identical calls share one run, its result and its error"""
+
+    def run_threads(self, flight, fn, count=5):
+        release, outcomes = threading.Event(), []
+
+        def blocked():
+            release.wait(5)
+            return fn()
+
+        def caller():
+            try:
+                outcomes.append(flight.do('key', blocked))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(count)]
+        threads[0].start()
+        while 'key' not in flight._calls:
+            clock.sleep(0.001)
+        for thread in threads[1:]:
+            thread.start()
+        while flight._calls['key'].followers < count - 1:
+            clock.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_threads_share_one_call(self):
+        flight, calls = SingleFlight('test'), []
+        outcomes = self.run_threads(flight, lambda: calls.append(1) or object())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(outcomes), 5)
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+        self.assertEqual(flight.coalesced, 4)
+        self.assertEqual(flight._calls, {})
+
+    def test_threads_share_the_error(self):
+        flight, error = SingleFlight('test'), ValueError('upstream down')
+
+        def fail():
+            raise error
+
+        outcomes = self.run_threads(flight, fail)
+        self.assertEqual(len(outcomes), 5)
+        self.assertTrue(all(outcome is error for outcome in outcomes))
+        # The next call runs again rather than replaying the failure
+        self.assertEqual(flight.do('key', lambda: 'ok'), 'ok')
+
+    def test_async_callers_share_one_call(self):
+        flight, calls = SingleFlight('test'), []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return object()
+
+        async def main():
+            results = await asyncio.gather(*(flight.ado('key', work) for _ in range(5)))
+            other = await flight.ado('other', work)
+            return results, other
+
+        results, other = asyncio.run(main())
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIsNot(other, results[0])
+        self.assertEqual(flight.coalesced, 4)
+
+    def test_async_callers_share_the_error(self):
+        flight = SingleFlight('test')
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError('upstream down')
+
+        async def main():
+            return await asyncio.gather(*(flight.ado('key', fail) for _ in range(3)), return_exceptions=True)
+
+        outcomes = asyncio.run(main())
+        self.assertTrue(all(isinstance(outcome, ValueError) for outcome in outcomes))
+        self.assertTrue(all(outcome is outcomes[0] for outcome in outcomes))
+
+    def test_cancelled_async_leader_does_not_fail_followers(self):
+        flight, calls = SingleFlight('test'), []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'shared'
+
+        async def main():
+            leader = asyncio.create_task(flight.ado('key', work))
+            await asyncio.sleep(0)
+            followers = [asyncio.create_task(flight.ado('key', work)) for _ in range(3)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*followers)
+
+        self.assertEqual(asyncio.run(main()), ['shared'] * 3)
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(ROUTE_BACKEND='road_graph')
+class PositionUpdateTests(TestCase):
+    """A position update rewrites only the remaining days of the logs, and they stay compliant"""
+
+    def setUp(self):
+        self.trip = plan_offline(self)
+
+    def logs(self):
+        return [
+            {
+                'id': log.id,
+                'date': log.date,
+                'total_miles': log.total_miles,
+                'entries': [
+                    {'duty_status': entry.duty_status, 'start_time': entry.start_time, 'end_time': entry.end_time,
+                     'location': entry.location, 'remarks': entry.remarks}
+                    for entry in log.log_entries.all()
+                ]
+            }
+            for log in self.trip.daily_logs.prefetch_related('log_entries')
+        ]
+
+    def update(self, at):
+        # Cheyenne, WY: past the Denver pickup on the way to Seattle
+        return self.client.post(reverse('update_trip_position', args=[self.trip.id]), {
+            'location': [41.14, -104.8202], 'at': at.isoformat()
+        }, content_type='application/json')
+
+    def update_day(self, logs):
+        """Index of the first log day after the pickup, with the dropoff still ahead"""
+        pickup = next(i for i, log in enumerate(logs) if any(entry['remarks'] == 'Pickup' for entry in log['entries']))
+        self.assertLess(pickup + 1, len(logs) - 1)
+        return pickup + 1
+
+    def test_rewrites_remaining_days(self):
+        before = self.logs()
+        index = self.update_day(before)
+        day = before[index]['date']
+        response = self.update(datetime.combine(day, time(10)))
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertTrue(body['position']['picked_up'])
+
+        after = self.logs()
+        self.assertEqual(after[:index], before[:index])  # days before the update stand as logged
+        self.assertTrue(all(log['date'] >= day for log in after[index:]))
+        self.assertEqual(body['updated_logs'], [log['date'].isoformat() for log in after[index:]])
+        self.assertFalse({log['id'] for log in after[index:]} & {log['id'] for log in before[index:]})
+        # The update's day keeps what was logged before 10:00
+        kept = [entry for entry in before[index]['entries'] if entry['end_time'] != time(0) and entry['end_time'] <= time(10)]
+        self.assertEqual(after[index]['entries'][:len(kept)], kept)
+
+        self.assertTrue(body['hos_compliance']['is_compliant'], body['hos_compliance']['violations'])
+        violations = HOSComplianceService().validate_hos_compliance({'daily_logs': after}, self.trip.current_cycle_used)
+        self.assertEqual(violations, [])
+
+    def test_keeps_driven_geometry(self):
+        plan = TripPlan.objects.get(trip=self.trip)
+        to_pickup, to_dropoff = decode_geometry(plan.to_pickup_geometry), decode_geometry(plan.to_dropoff_geometry)
+        logs = self.logs()
+        response = self.update(datetime.combine(logs[self.update_day(logs)]['date'], time(10)))
+        self.assertEqual(response.status_code, 200, response.content)
+
+        plan.refresh_from_db()
+        self.assertEqual(decode_geometry(plan.to_pickup_geometry), to_pickup)  # driven in full before the update
+        updated = decode_geometry(plan.to_dropoff_geometry)
+        driven = driven_part(to_dropoff, (41.14, -104.8202))
+        self.assertTrue(1 < len(driven) < len(to_dropoff))
+        self.assertEqual(updated[:len(driven)], driven)
+        self.assertEqual(updated[len(driven)], [-104.8202, 41.14])  # the remaining route starts at the position
+        self.assertEqual(updated[-1], to_dropoff[-1])
+
+    def test_rejects_older_update(self):
+        logs = self.logs()
+        day = logs[self.update_day(logs)]['date']
+        self.assertEqual(self.update(datetime.combine(day, time(10))).status_code, 200)
+        before = self.logs()
+        response = self.update(datetime.combine(day, time(9)))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('older', response.json()['error'])
+        self.assertEqual(self.logs(), before)
+
+
+class GazetteerTests(TestCase):
+    """Free-form inputs normalize to the same place; bare state names never match a city"""
+
+    def assertResolves(self, inputs, name, state):
+        for location in inputs:
+            with self.subTest(location=location):
+                place = gazetteer.lookup(location)
+                self.assertIsNotNone(place)
+                self.assertEqual((place.name, place.state), (name, state))
+
+    def test_parse_location(self):
+        self.assertEqual(parse_location('Dallas TX'), ('dallas', 'tx'))
+        self.assertEqual(parse_location('Dallas, Texas'), ('dallas', 'tx'))
+        self.assertEqual(parse_location('  dallas ,  TX, USA '), ('dallas', 'tx'))
+        self.assertEqual(parse_location('St. Louis, MO'), ('saint louis', 'mo'))
+        self.assertEqual(parse_location('Ft. Worth Texas'), ('fort worth', 'tx'))
+        self.assertEqual(parse_location('Salt Lake City, Utah, United States'), ('salt lake city', 'ut'))
+        self.assertEqual(parse_location('Winston-Salem North Carolina'), ('winston salem', 'nc'))
+        self.assertEqual(parse_location('Kansas City'), ('kansas city', None))
+        self.assertEqual(parse_location('Indiana'), ('indiana', None))
+        self.assertEqual(parse_location(', USA'), ('', None))
+
+    def test_lookup_forms(self):
+        self.assertResolves(['Dallas TX', 'Dallas, Texas', 'DALLAS, TX, USA', 'Dallas'], 'Dallas', 'TX')
+        self.assertResolves(['St. Louis, MO', 'Saint Louis', 'st louis missouri'], 'Saint Louis', 'MO')
+        self.assertResolves(['Ft. Worth, TX', 'Fort Worth'], 'Fort Worth', 'TX')
+        self.assertResolves(['Kansas City, Missouri', 'Kansas City MO'], 'Kansas City', 'MO')
+        self.assertIsNone(gazetteer.lookup('Kansas City'))  # ambiguous without the state
+
+    def test_lookup_prefix_and_typos(self):
+        self.assertResolves(['Indianap', 'Indianapolis IN', 'Indianapols'], 'Indianapolis', 'IN')
+        self.assertResolves(['Albuq, NM', 'Albuquerqe', 'Albequerque, New Mexico'], 'Albuquerque', 'NM')
+        self.assertResolves(['Dalas, TX', 'Dallsa Texas'], 'Dallas', 'TX')
+
+    def test_state_names_do_not_match_cities(self):
+        for location in ['Indiana', 'indiana, USA', 'IN', 'Texas', 'Missouri', 'New Mexico', 'Kansas', 'Indiana IN']:
+            with self.subTest(location=location):
+                self.assertIsNone(gazetteer.lookup(location))
+        # A city that shares its name with a state still resolves exactly
+        self.assertResolves(['New York', 'New York, NY'], 'New York', 'NY')
+        self.assertResolves(['Washington, DC'], 'Washington', 'DC')
+
+
+class ORSTransportTests(TestCase):
+    """Recorded ORS responses replay offline, with injected faults going through the retry policy"""
+
+    url = 'https://api.openrouteservice.org/geocode/search'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def session(self, adapter):
+        session = requests.Session()
+        session.mount('https://', adapter)
+        return session
+
+    def retry(self, total=2):
+        return CappedRetry(total=total, status=total, status_forcelist=RETRY_STATUS_CODES, backoff_factor=0,
+                           backoff_max=0.01, respect_retry_after_header=True, raise_on_status=False)
+
+    def test_fixture_key(self):
+        key = fixture_key('get', 'https://a.example/geocode/search?text=Denver&size=1&api_key=secret', None)
+        self.assertTrue(key.startswith('geocode_search-'))
+        self.assertNotIn('secret', key)
+        # Host, credentials and parameter order do not matter
+        self.assertEqual(key, fixture_key('GET', 'http://b.example/geocode/search?size=1&text=Denver', None))
+        self.assertNotEqual(key, fixture_key('GET', 'http://b.example/geocode/search?size=1&text=Boise', None))
+
+        body = json.dumps({'coordinates': [[-87.6, 41.9], [-105.0, 39.7]], 'units': 'mi'}).encode()
+        reordered = json.dumps({'units': 'mi', 'coordinates': [[-87.6, 41.9], [-105.0, 39.7]]}, indent=2).encode()
+        path = '/v2/directions/driving-hgv/geojson'
+        self.assertEqual(fixture_key('POST', path, body), fixture_key('POST', path, reordered))
+        self.assertNotEqual(fixture_key('POST', path, body), fixture_key('POST', path, b'{"units": "km"}'))
+
+    def test_recorded_response_replays(self):
+        live = mock.Mock()
+        live.side_effect = lambda request, **kwargs: ReplayAdapter._build_replay_response(
+            request, 200, {'Content-Type': 'application/json'}, b'{"features": [{"id": 1}]}'
+        )
+        with mock.patch.object(requests.adapters.HTTPAdapter, 'send', live):
+            recorded = self.session(RecordingAdapter(FixtureStore(self.directory))).get(
+                self.url, params={'text': 'Denver, CO', 'api_key': 'secret'}
+            )
+        self.assertEqual(live.call_count, 1)
+        fixture = FixtureStore(self.directory).load(fixture_key('GET', recorded.request.url, None))
+        self.assertEqual(fixture['status'], 200)
+        self.assertNotIn('secret', json.dumps(fixture))
+
+        # A fresh store reads the file; a different host and key replay the same response
+        replay = ReplayAdapter(FixtureStore(self.directory), FaultInjector(), max_retries=self.retry())
+        replayed = self.session(replay).get(self.url.replace('api.openrouteservice.org', 'ors.internal'), params={'text': 'Denver, CO'})
+        self.assertEqual(replayed.status_code, 200)
+        self.assertEqual(replayed.json(), recorded.json())
+        self.assertEqual(replayed.headers['Content-Type'], 'application/json')
+
+    def test_injected_throttle_is_retried(self):
+        store, faults = FixtureStore(self.directory), FaultInjector(retry_after=30)
+        key = fixture_key('GET', f'{self.url}?text=Denver', None)
+        store.save(key, 'GET', f'{self.url}?text=Denver', 200, 'application/json', '{"features": []}')
+
+        started = clock.monotonic()
+        with mock.patch.object(faults, 'next', side_effect=[(0.0, 429), (0.0, None)]) as injected:
+            response = self.session(ReplayAdapter(store, faults, max_retries=self.retry())).get(self.url, params={'text': 'Denver'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(injected.call_count, 2)
+        self.assertLess(clock.monotonic() - started, 5)  # Retry-After: 30 is capped at backoff_max
+
+    def test_unknown_fixture_is_404(self):
+        replay = ReplayAdapter(FixtureStore(self.directory), FaultInjector(), max_retries=self.retry())
+        response = self.session(replay).get(self.url, params={'text': 'Nowhere'})
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('No recorded fixture geocode_search-', response.json()['error'])
+
+    def test_injected_rates(self):
+        faults = FaultInjector(error_rate=0.2, throttle_rate=0.3, seed=7)
+        outcomes = [faults.next()[1] for _ in range(2000)]
+        self.assertAlmostEqual(outcomes.count(503) / 2000, 0.2, delta=0.04)
+        self.assertAlmostEqual(outcomes.count(429) / 2000, 0.3, delta=0.04)
+        self.assertEqual(FaultInjector(latency=0.25).next(), (0.25, None))
+
+
+class HTTPSessionTests(TestCase):
+    """The pooled ORS session caps Retry-After at backoff_max and retries a bounded number of times"""
+
+    url = 'https://api.openrouteservice.org/geocode/search'
+
+    def build(self, faults, max_retries=2, backoff_max=0.01):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        store = FixtureStore(directory.name)
+        store.save(fixture_key('GET', f'{self.url}?text=Denver', None), 'GET', f'{self.url}?text=Denver', 200,
+                   'application/json', '{"features": []}')
+        # The replay adapter stands in for the network; build_session configures its pool and retry policy
+        with mock.patch('trucker_app.services.http_client.make_adapter',
+                        side_effect=lambda **kwargs: ReplayAdapter(store, faults, **kwargs)) as make_adapter:
+            session = build_session(pool_size=7, max_retries=max_retries, backoff_factor=0, backoff_max=backoff_max)
+        return session, make_adapter.call_args.kwargs
+
+    def test_session_configuration(self):
+        session, kwargs = self.build(FaultInjector(), max_retries=3)
+        self.assertEqual((kwargs['pool_connections'], kwargs['pool_maxsize'], kwargs['pool_block']), (7, 7, False))
+        adapter = session.get_adapter(self.url)
+        self.assertIs(adapter, session.get_adapter('http://localhost/'))
+        retry = adapter.max_retries
+        self.assertIsInstance(retry, CappedRetry)
+        self.assertEqual((retry.total, retry.status, retry.connect, retry.read), (3, 3, 3, 3))
+        self.assertEqual(set(retry.status_forcelist), set(RETRY_STATUS_CODES))
+        self.assertIn('POST', retry.allowed_methods)
+        self.assertEqual(session.headers['Connection'], 'keep-alive')
+
+    def test_retry_after_is_capped(self):
+        retry = CappedRetry(backoff_max=2)
+        for header, expected in (('1', 1), ('30', 2), ('3600', 2)):
+            with self.subTest(header=header):
+                self.assertEqual(retry.get_retry_after(mock.Mock(headers={'Retry-After': header})), expected)
+        self.assertIsNone(retry.get_retry_after(mock.Mock(headers={})))
+
+        # An injected 429 asking for 30 seconds is retried after backoff_max instead
+        faults = FaultInjector(retry_after=30)
+        session, _ = self.build(faults, backoff_max=0.05)
+        started = clock.monotonic()
+        with mock.patch.object(faults, 'next', side_effect=[(0.0, 429), (0.0, None)]):
+            response = session.get(self.url, params={'text': 'Denver'})
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(clock.monotonic() - started, 5)
+
+    def test_retry_count_is_honoured(self):
+        for max_retries in (0, 1, 3):
+            with self.subTest(max_retries=max_retries):
+                faults = FaultInjector(error_rate=1.0)
+                session, _ = self.build(faults, max_retries=max_retries)
+                with mock.patch.object(faults, 'next', wraps=faults.next) as attempts:
+                    response = session.get(self.url, params={'text': 'Denver'})
+                self.assertEqual(response.status_code, 503)  # the last answer, not an exception
+                self.assertEqual(attempts.call_count, max_retries + 1)
+
+
+@override_settings(ROUTE_BACKEND='road_graph', ORS_MAX_RETRIES=2, ORS_BACKOFF_FACTOR=0)
+class AsyncPlanTests(TestCase):
+    """The async planner retries transient ORS errors on the event loop"""
+
+    coords = {'Chicago, IL': (41.8781, -87.6298), 'Denver, CO': (39.7392, -104.9903), 'Seattle, WA': (47.6062, -122.3321)}
+
+    def setUp(self):
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+        geocode_breaker.reset()
+        self.addCleanup(geocode_breaker.reset)
+        self.requests = []
+
+    def client_for(self, handler):
+        def record(request):
+            self.requests.append(request)
+            return handler(request)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+        return mock.patch('trucker_app.services.async_route_service.get_async_client', return_value=client)
+
+    def geocoded(self, request):
+        for location, (lat, lon) in self.coords.items():
+            if geocode_cache.normalize(location) == request.url.params['text']:
+                return httpx.Response(200, json={'features': [{'geometry': {'coordinates': [lon, lat]}}]})
+        return httpx.Response(200, json={'features': []})
+
+    async def test_plan_retries_server_error(self):
+        failed = []
+
+        def handler(request):
+            if not failed:
+                failed.append(request.url.params['text'])
+                return httpx.Response(502, text='bad gateway')
+            return self.geocoded(request)
+
+        with self.client_for(handler):
+            response = await AsyncClient().post(reverse('plan_trip_async'), {
+                'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA'
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertFalse(body['route']['degraded'])  # the retry got the ORS answer, not the gazetteer's
+
+        # Three geocodes, one of them sent twice
+        texts = [request.url.params['text'] for request in self.requests]
+        self.assertEqual(len(texts), 4)
+        self.assertEqual(texts.count(failed[0]), 2)
+        trip = await Trip.objects.aget(id=body['trip']['id'])
+        self.assertEqual(trip.coordinates('pickup'), self.coords['Denver, CO'])
+
+    @override_settings(ORS_BACKOFF_FACTOR=1, ORS_BACKOFF_MAX=3)
+    async def test_request_backoff(self):
+        responses = [
+            httpx.Response(503), httpx.Response(429, headers={'Retry-After': '60'}), httpx.Response(503), httpx.Response(200)
+        ]
+        with self.client_for(lambda request: responses.pop(0)), \
+                mock.patch('trucker_app.services.async_route_service.asyncio.sleep') as sleep:
+            service = AsyncRouteService()
+            response = await service._request('GET', 'https://ors.test/geocode/search')
+        self.assertEqual(response.status_code, 503)  # out of retries: the last answer is returned
+        self.assertEqual(len(self.requests), 3)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(1 <= delays[0] <= 2)  # backoff_factor * 2 ** 0 plus jitter
+        self.assertEqual(delays[1], 3)  # Retry-After capped at ORS_BACKOFF_MAX
+
+        with self.client_for(lambda request: responses.pop(0)), \
+                mock.patch('trucker_app.services.async_route_service.asyncio.sleep'):
+            response = await AsyncRouteService()._request('GET', 'https://ors.test/geocode/search')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(ROUTE_BACKEND='openroute')
+class MultiLegRouteTests(TestCase):
+    """One directions call is split into legs at its way_points; failures fall back leg by leg"""
+
+    waypoints = [(41.8781, -87.6298), (39.7392, -104.9903), (47.6062, -122.3321)]
+    coordinates = [[-87.63, 41.88], [-93.6, 41.6], [-100.8, 41.1], [-104.99, 39.74],
+                   [-108.2, 41.6], [-116.2, 43.6], [-122.33, 47.61]]
+
+    def setUp(self):
+        route_cache.clear()
+        self.addCleanup(route_cache.clear)
+        directions_breaker.reset()
+        self.addCleanup(directions_breaker.reset)
+
+    def directions(self, segments=2, way_points=(0, 3, 6)):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'features': [{
+            'geometry': {'type': 'LineString', 'coordinates': self.coordinates},
+            'properties': {
+                'summary': {'distance': 2011.0, 'duration': 108000.0},
+                'segments': [{'distance': 1003.5, 'duration': 54000.0, 'steps': []},
+                             {'distance': 1007.5, 'duration': 54000.0, 'steps': []}][:segments],
+                'way_points': list(way_points)
+            }
+        }]}
+        return response
+
+    def route(self, **response):
+        service = RouteService()
+        service.session = mock.Mock(post=mock.Mock(**response))
+        return service, service.calculate_multi_leg_route(self.waypoints)
+
+    def test_legs_split_at_way_points(self):
+        service, route = self.route(return_value=self.directions())
+        self.assertEqual((route['distance'], route['duration']), (2011.0, 30.0))
+        to_pickup, to_dropoff = route['legs']
+        self.assertEqual(to_pickup['geometry']['coordinates'], self.coordinates[0:4])
+        self.assertEqual(to_dropoff['geometry']['coordinates'], self.coordinates[3:7])  # shares the pickup point
+        self.assertEqual([(leg['distance'], leg['duration']) for leg in route['legs']], [(1003.5, 15.0), (1007.5, 15.0)])
+        self.assertEqual(service.session.post.call_args.kwargs['json']['coordinates'],
+                         [[lon, lat] for lat, lon in self.waypoints])
+        self.assertFalse(service.degraded)
+
+        # Cached: a second service gets the same legs without another call
+        _, cached = self.route(side_effect=AssertionError('called ORS'))
+        self.assertEqual(cached, route)
+
+    def test_fallback_routes_leg_by_leg(self):
+        offline = RouteService()
+        expected = [offline._calculate_offline_route(start, end) for start, end in zip(self.waypoints, self.waypoints[1:])]
+        for name, response in (
+            ('server error', {'return_value': mock.Mock(status_code=500, text='error')}),
+            ('timeout', {'side_effect': requests.exceptions.Timeout()}),
+            ('segments do not match the waypoints', {'return_value': self.directions(segments=1)}),
+        ):
+            with self.subTest(name):
+                route_cache.clear()
+                directions_breaker.reset()
+                service, route = self.route(**response)
+                self.assertTrue(service.degraded)
+                self.assertEqual(len(route['legs']), 2)
+                self.assertTrue(all(leg['degraded'] for leg in route['legs']))
+                for leg, offline_leg in zip(route['legs'], expected):
+                    self.assertAlmostEqual(leg['distance'], offline_leg['distance'])
+                    self.assertAlmostEqual(leg['duration'], offline_leg['duration'])
+                self.assertAlmostEqual(route['distance'], sum(leg['distance'] for leg in expected))
+                pickup = route['legs'][0]['geometry']['coordinates'][-1]
+                self.assertEqual(route['legs'][1]['geometry']['coordinates'][0], pickup)
+                self.assertEqual(len(route['geometry']['coordinates']),
+                                 sum(len(leg['geometry']['coordinates']) for leg in route['legs']) - 1)
+                self.assertIsNone(route_cache.get(route_cache.key(self.waypoints, profile='driving-hgv', units='mi')))
+
+
+class DeadlineTests(TestCase):
+    """A slow call past the deadline is reported as timed out without losing the results that finished"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow(self):
+        self.release.wait(5)
+        return 'late'
+
+    def test_run_concurrently_deadline(self):
+        started = clock.monotonic()
+        with self.assertRaises(DeadlineExceeded) as raised:
+            run_concurrently({'pickup': lambda: 1, 'slow': self.slow, 'dropoff': lambda: 2}, Deadline(0.2))
+        self.assertLess(clock.monotonic() - started, 2)
+        self.assertEqual(raised.exception.results, {'pickup': 1, 'dropoff': 2})
+        self.assertEqual(raised.exception.timed_out, ['slow'])
+        self.assertIn('slow', str(raised.exception))
+
+        self.assertEqual(run_concurrently({'pickup': lambda: 1, 'dropoff': lambda: 2}, Deadline(5)), {'pickup': 1, 'dropoff': 2})
+        self.assertEqual(Deadline(-1).remaining(), 0.0)
+
+    def test_run_concurrently_error(self):
+        def fail():
+            raise ValueError('geocoder down')
+
+        with self.assertRaisesMessage(ValueError, 'geocoder down'):
+            run_concurrently({'fail': fail, 'slow': self.slow}, Deadline(5))
+
+    def test_iter_completed_deadline(self):
+        ran = []
+
+        def fast(key):
+            ran.append(key)
+            return key * 2
+
+        calls = [('slow', self.slow), (1, lambda: fast(1)), (2, lambda: fast(2)), (3, lambda: fast(3)), (4, lambda: fast(4))]
+        started = clock.monotonic()
+        results = dict(iter_completed(iter(calls), 2, deadline=Deadline(0.3)))
+        self.assertLess(clock.monotonic() - started, 2)
+        self.assertEqual(results, {1: 2, 2: 4, 3: 6, 4: 8})  # the slow call never blocked the others
+        self.assertNotIn('slow', results)
+
+        # With one call in flight, calls queued behind the slow one never start
+        ran.clear()
+        self.assertEqual(dict(iter_completed(iter(calls), 1, deadline=Deadline(0.2))), {})
+        self.assertEqual(ran, [])
+
+    @override_settings(PLAN_BATCH_PROCESSES=1, ROUTE_BACKEND='road_graph', PLAN_BATCH_DEADLINE_SECONDS=0.5)
+    def test_batch_reports_slow_lane_as_timed_out(self):
+        route_lane = views.route_lane
+        seattle = gazetteer.lookup('Seattle, WA')
+
+        def slow_lane(service, waypoints):
+            if waypoints[-1] == (seattle.latitude, seattle.longitude):
+                self.release.wait(5)
+            return route_lane(service, waypoints)
+
+        trips = [
+            {'current_location': 'Chicago, IL', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Seattle, WA'},
+            {'current_location': 'Omaha, NE', 'pickup_location': 'Denver, CO', 'dropoff_location': 'Boise, ID'},
+        ]
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+        with mock.patch('trucker_app.services.route_service.get_session', return_value=mock.Mock(get=mock.Mock(return_value=no_features()))), \
+                mock.patch.object(views, 'route_lane', side_effect=slow_lane):
+            response = self.client.post(reverse('plan_trip_batch'), {'trips': trips}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        timed_out, planned = response.json()['results']
+        self.assertEqual(timed_out, {'index': 0, 'status': 'error', 'error': 'Trip planning timed out while routing'})
+        self.assertEqual(planned['status'], 'planned')
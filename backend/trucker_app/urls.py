@@ -4,6 +4,13 @@ from . import views
 urlpatterns = [
     path('trips/', views.list_trips, name='list_trips'),
     path('trips/plan/', views.plan_trip, name='plan_trip'),
+    path('trips/plan/batch/', views.plan_trip_batch, name='plan_trip_batch'),
+    path('trips/plan/async/', views.plan_trip_async, name='plan_trip_async'),
+    path('trips/matrix/', views.distance_matrix, name='distance_matrix'),
+    path('geocode/batch/', views.batch_geocode, name='batch_geocode'),
     path('trips/<uuid:trip_id>/', views.get_trip, name='get_trip'),
+    path('trips/<uuid:trip_id>/plan/', views.get_trip_plan, name='get_trip_plan'),
+    path('trips/<uuid:trip_id>/schedule/sweep/', views.sweep_trip_schedule, name='sweep_trip_schedule'),
+    path('trips/<uuid:trip_id>/position/', views.update_trip_position, name='update_trip_position'),
     path('trips/<uuid:trip_id>/logs/<str:log_date>/pdf/', views.get_daily_log_pdf, name='daily_log_pdf'),
 ]
@@ -149,6 +149,10 @@ def get_cell_content_for_hour(daily_log, status_label, hour):
         if entry.duty_status == target_status:
             start_hour = entry.start_time.hour
             end_hour = entry.end_time.hour
+            if entry.end_time == time(0, 0):
+                end_hour = 24  # runs to midnight
+            elif entry.end_time.minute:
+                end_hour += 1  # partial hour still shows on the grid
             
             # Handle overnight periods
             if end_hour < start_hour:
@@ -2,18 +2,50 @@ from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from .models import Trip, DailyLog, LogEntry
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.utils.encoders import JSONEncoder
+from asgiref.sync import sync_to_async
+from .models import Trip, DailyLog, LogEntry, TripPlan, log_prefetches
 from .serializers import (
     TripSerializer, TripCreateSerializer, TripDetailSerializer,
-    DailyLogSerializer
+    RouteOutputSerializer, DistanceMatrixSerializer,
+    BatchGeocodeSerializer, ScheduleSweepSerializer, BatchPlanSerializer,
+    PositionUpdateSerializer, TripListQuerySerializer, encode_trip_cursor, naive_local
 )
 from .services.route_service import RouteService
+from .services.async_route_service import AsyncRouteService
 from .services.hos_service import HOSComplianceService
+from .services.batch_geocoder import BatchGeocoder
+from .services.concurrency import Deadline, DeadlineExceeded, run_concurrently, iter_completed, map_in_processes
+from .services.schedule_planner import plan_many
+from .services.geometry import compact_route, driven_part
+from .services.distance import DISTANCE_METHODS, nearest_k
+from .services.duty_schedule import (
+    DUTY_STATUSES, OFF_DUTY_CODE, SLEEPER_BERTH_CODE, DRIVING_CODE, ON_DUTY_CODE
+)
+from .services.hos_simulator import timeline_from_logs
+from .services.plan_codec import encode_geometry, decode_geometry, encode_document, decode_document
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
 from datetime import datetime
+import asyncio
+import time
+import numpy as np
+import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Columns of a trip list row
+TRIP_LIST_FIELDS = (
+    'id', 'created_at', 'current_location', 'pickup_location', 'dropoff_location',
+    'current_cycle_used', 'total_distance', 'estimated_drive_time'
+)
+
 @api_view(['POST'])
 def plan_trip(request):
     """
@@ -23,38 +55,43 @@ def plan_trip(request):
     if not serializer.is_valid():
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    # Create trip instance
-    trip = serializer.save()
+    output_serializer = RouteOutputSerializer(data=request.query_params)
+    if not output_serializer.is_valid():
+        return Response(output_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    output = output_serializer.validated_data
+    
+    # Unsaved until the plan is persisted in one transaction (create_daily_logs_from_schedule)
+    trip = Trip(**serializer.validated_data)
     
     try:
         # Initialize services
         route_service = RouteService()
-        hos_service = HOSComplianceService()
         
-        # Geocode locations
-        current_coords = route_service.geocode_location(trip.current_location)
-        pickup_coords = route_service.geocode_location(trip.pickup_location)
-        dropoff_coords = route_service.geocode_location(trip.dropoff_location)
+        deadline = Deadline(getattr(settings, 'PLAN_DEADLINE_SECONDS', 30))
+        
+        # Geocode locations concurrently
+        coords = run_concurrently({
+            'current': lambda: route_service.geocode_location(trip.current_location),
+            'pickup': lambda: route_service.geocode_location(trip.pickup_location),
+            'dropoff': lambda: route_service.geocode_location(trip.dropoff_location),
+        }, deadline)
+        current_coords = coords['current']
+        pickup_coords = coords['pickup']
+        dropoff_coords = coords['dropoff']
         
         # Check which locations failed geocoding
-        failed_locations = []
-        if not current_coords:
-            failed_locations.append(f"current location '{trip.current_location}'")
-        if not pickup_coords:
-            failed_locations.append(f"pickup location '{trip.pickup_location}'")
-        if not dropoff_coords:
-            failed_locations.append(f"dropoff location '{trip.dropoff_location}'")
-            
-        if failed_locations:
-            error_msg = f"Could not geocode: {', '.join(failed_locations)}. Please use specific city and state format (e.g., 'Los Angeles, CA')"
+        error_msg = geocode_failure_message(trip, coords)
+        if error_msg:
             return Response(
                 {'error': error_msg}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Calculate routes
-        route_to_pickup = route_service.calculate_route(current_coords, pickup_coords)
-        route_to_dropoff = route_service.calculate_route(pickup_coords, dropoff_coords)
+        # Calculate both legs with a single directions request
+        route = run_concurrently({
+            'route': lambda: route_service.calculate_multi_leg_route([current_coords, pickup_coords, dropoff_coords]),
+        }, deadline)['route']
+        route_to_pickup, route_to_dropoff = route['legs']
         
         if not route_to_pickup or not route_to_dropoff:
             return Response(
@@ -62,80 +99,652 @@ def plan_trip(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Combine route data
-        total_distance = route_to_pickup['distance'] + route_to_dropoff['distance']
-        total_drive_time = route_to_pickup['duration'] + route_to_dropoff['duration']
+        response_data = complete_plan(trip, route, coords, route_service, output)
         
-        # Update trip with calculated values
-        trip.total_distance = total_distance
-        trip.estimated_drive_time = total_drive_time
-        trip.save()
-        
-        # Calculate HOS compliant schedule
-        route_data = {
-            'distance': total_distance,
-            'duration': total_drive_time,
-            'geometry': {
-                'to_pickup': route_to_pickup['geometry'],
-                'to_dropoff': route_to_dropoff['geometry']
-            }
-        }
+        return Response(response_data, status=status.HTTP_201_CREATED)
         
-        schedule = hos_service.calculate_trip_schedule(trip, route_data)
+    except DeadlineExceeded as e:
+        return Response(
+            {'error': f'Trip planning timed out: {str(e)}'}, 
+            status=status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    except Exception as e:
+        return Response(
+            {'error': f'Error planning trip: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['POST'])
+def plan_trip_batch(request):
+    """
+    Plan many trips in one request. Each distinct location is geocoded once and
+    each distinct lane routed once, HOS schedules run on the process pool, and
+    the planned trips are saved with bulk inserts. Every input gets either a
+    result or its errors.
+    """
+    serializer = BatchPlanSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    
+    started = time.monotonic()
+    deadline = Deadline(getattr(settings, 'PLAN_BATCH_DEADLINE_SECONDS', 120))
+    route_service = RouteService()
+    results = [None] * len(data['trips'])
+    
+    def fail(index, error):
+        results[index] = {'index': index, 'status': 'error', 'error': error}
+    
+    # Validate each trip on its own so one bad row does not fail the batch
+    trips = {}
+    for index, trip_data in enumerate(data['trips']):
+        trip_serializer = TripCreateSerializer(data=trip_data)
+        if trip_serializer.is_valid():
+            trips[index] = Trip(**trip_serializer.validated_data)
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': trip_serializer.errors}
+    
+    try:
+        # Geocode every distinct location once
+        locations = sorted({
+            location for trip in trips.values()
+            for location in (trip.current_location, trip.pickup_location, trip.dropoff_location)
+        })
+        geocoder = BatchGeocoder(route_service)
+        geocoded = {}
+        # Locations still unresolved at the deadline are left out and fail their trips below
+        for result in geocoder.geocode(locations, deadline):
+            coords = tuple(result['coordinates']) if result['coordinates'] else None
+            geocoded[result['location']] = (coords, result['degraded'])
         
-        # Create daily logs
-        create_daily_logs_from_schedule(trip, schedule)
+        # Group trips by lane so each distinct lane is routed once
+        lanes = {}
+        for index, trip in trips.items():
+            names = {'current': trip.current_location, 'pickup': trip.pickup_location, 'dropoff': trip.dropoff_location}
+            if any(name not in geocoded for name in names.values()):
+                fail(index, 'Trip planning timed out while geocoding')
+                continue
+            coords = {key: geocoded[name][0] for key, name in names.items()}
+            error_msg = geocode_failure_message(trip, coords)
+            if error_msg:
+                fail(index, error_msg)
+                continue
+            trip.set_coordinates(coords)
+            lanes.setdefault((coords['current'], coords['pickup'], coords['dropoff']), []).append(index)
         
-        # Prepare response
-        trip_serializer = TripDetailSerializer(trip)
+        routes = {}
+        calls = ((lane, lambda lane=lane: route_lane(route_service, lane)) for lane in lanes)
+        for lane, outcome in iter_completed(calls, getattr(settings, 'PLAN_WORKER_THREADS', 16), deadline=deadline):
+            routes[lane] = outcome
         
-        response_data = {
-            'trip': trip_serializer.data,
-            'route': {
-                'total_distance': total_distance,
-                'total_drive_time': total_drive_time,
-                'to_pickup': route_to_pickup,
-                'to_dropoff': route_to_dropoff,
-                'coordinates': {
-                    'current': current_coords,
-                    'pickup': pickup_coords,
-                    'dropoff': dropoff_coords
+        # Schedule every routed trip on the process pool, in chunks
+        hos_service = HOSComplianceService()
+        start_time = data.get('start_time') or datetime.now()
+        planned = []
+        for lane, indices in lanes.items():
+            route, error = routes.get(lane, (None, 'Trip planning timed out while routing'))
+            for index in indices:
+                if route is None:
+                    fail(index, error)
+                    continue
+                trip = trips[index]
+                trip.total_distance = route['distance']
+                trip.estimated_drive_time = route['duration']
+                route_data = {
+                    'distance': route['distance'],
+                    'duration': route['duration'],
+                    'legs': [{'distance': leg['distance'], 'duration': leg['duration']} for leg in route['legs']]
                 }
-            },
-            'schedule': schedule,
-            'hos_compliance': {
-                'violations': hos_service.validate_hos_compliance(schedule),
-                'is_compliant': len(hos_service.validate_hos_compliance(schedule)) == 0
+                degraded = (
+                    any(leg.get('degraded') for leg in route['legs'])
+                    or any(geocoded[name][1]
+                           for name in (trip.current_location, trip.pickup_location, trip.dropoff_location))
+                )
+                planned.append((index, trip, degraded, hos_service.schedule_request(trip, route_data, start_time)))
+        
+        chunk_size = max(1, getattr(settings, 'PLAN_BATCH_CHUNK_SIZE', 25))
+        chunks = [
+            [request for _, _, _, request in planned[i:i + chunk_size]]
+            for i in range(0, len(planned), chunk_size)
+        ]
+        outcomes = [outcome for chunk in map_in_processes(plan_many, chunks) for outcome in chunk]
+        
+        # A trip whose scheduling raised is reported on its own; the rest are saved
+        scheduled = []
+        for item, outcome in zip(planned, outcomes):
+            if outcome.error is None:
+                scheduled.append((item, outcome))
+                continue
+            logger.error(f"Batch scheduling failed for trip {item[0]}: {outcome.error}")
+            fail(item[0], f'Error planning trip: {outcome.error}')
+        
+        # Persist all planned trips and their logs with bulk inserts
+        with transaction.atomic():
+            Trip.objects.bulk_create([trip for (_, trip, _, _), _ in scheduled])
+            save_log_rows([row for (_, trip, _, _), outcome in scheduled for row in log_rows(trip, outcome.schedule)])
+        
+        for (index, trip, degraded, _), outcome in scheduled:
+            schedule = outcome.schedule
+            results[index] = {
+                'index': index,
+                'status': 'planned',
+                'trip': TripSerializer(trip).data,
+                'schedule': schedule.to_dict() if data['include_schedule'] else {
+                    'trip_summary': schedule.summary(),
+                    'warnings': schedule.warnings
+                },
+                'hos_compliance': {
+                    'violations': outcome.violations,
+                    'is_compliant': len(outcome.violations) == 0
+                },
+                'degraded': degraded
             }
-        }
         
-        return Response(response_data, status=status.HTTP_201_CREATED)
+        planned_count = sum(1 for result in results if result['status'] == 'planned')
+        return Response({
+            'results': results,
+            'summary': {
+                'total': len(results),
+                'planned': planned_count,
+                'failed': len(results) - planned_count,
+                'unique_locations': len(locations),
+                'unique_lanes': len(lanes),
+                'geocode_sources': dict(geocoder.sources),
+                'seconds': round(time.monotonic() - started, 3)
+            }
+        })
         
     except Exception as e:
-        # Clean up trip if there was an error
-        trip.delete()
+        logger.error(f"Batch planning failed: {str(e)}")
         return Response(
+            {'error': f'Error planning trips: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@csrf_exempt
+@require_POST
+async def plan_trip_async(request):
+    """
+    Async variant of plan_trip: geocoding and routing are awaited on the event
+    loop and only the ORM/serializer sections run in sync_to_async, so one
+    worker process can hold many plans waiting on OpenRouteService
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Request body must be JSON'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    serializer = TripCreateSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    output_serializer = RouteOutputSerializer(data=request.GET)
+    if not output_serializer.is_valid():
+        return JsonResponse(output_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    output = output_serializer.validated_data
+    
+    # Unsaved until the plan is persisted in one transaction (create_daily_logs_from_schedule)
+    trip = Trip(**serializer.validated_data)
+    
+    try:
+        route_service = AsyncRouteService()
+        
+        async with asyncio.timeout(getattr(settings, 'PLAN_DEADLINE_SECONDS', 30)):
+            # Geocode locations concurrently
+            current_coords, pickup_coords, dropoff_coords = await asyncio.gather(
+                route_service.ageocode_location(trip.current_location),
+                route_service.ageocode_location(trip.pickup_location),
+                route_service.ageocode_location(trip.dropoff_location),
+            )
+            coords = {'current': current_coords, 'pickup': pickup_coords, 'dropoff': dropoff_coords}
+            
+            error_msg = geocode_failure_message(trip, coords)
+            if error_msg:
+                return JsonResponse({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Calculate both legs with a single directions request
+            route = await route_service.acalculate_multi_leg_route([current_coords, pickup_coords, dropoff_coords])
+        
+        route_to_pickup, route_to_dropoff = route['legs']
+        if not route_to_pickup or not route_to_dropoff:
+            return JsonResponse(
+                {'error': 'Could not calculate route between the specified locations'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        response_data = await sync_to_async(complete_plan)(trip, route, coords, route_service, output)
+        
+        return JsonResponse(response_data, status=status.HTTP_201_CREATED, encoder=JSONEncoder)
+        
+    except TimeoutError:
+        return JsonResponse(
+            {'error': 'Trip planning timed out'}, 
+            status=status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    except Exception as e:
+        return JsonResponse(
             {'error': f'Error planning trip: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+def distance_matrix(request):
+    """
+    Straight-line distance matrix between N origins and M destinations,
+    optionally refining the k closest destinations per origin with road routing
+    """
+    serializer = DistanceMatrixSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    
+    route_service = RouteService()
+    deadline = Deadline(getattr(settings, 'PLAN_DEADLINE_SECONDS', 30))
+    
+    try:
+        # Geocode each distinct location string once
+        queries = {location for location in data['origins'] + data['destinations'] if isinstance(location, str)}
+        geocoded = run_concurrently(
+            {query: (lambda query=query: route_service.geocode_location(query)) for query in queries},
+            deadline
+        ) if queries else {}
+        origins = [geocoded[location] if isinstance(location, str) else location for location in data['origins']]
+        destinations = [geocoded[location] if isinstance(location, str) else location for location in data['destinations']]
+        
+        matrix = DISTANCE_METHODS[data['method']](origins, destinations)
+        
+        # Road-route the closest candidates per origin
+        refined = []
+        if data['refine_top_k']:
+            candidates = nearest_k(matrix, data['refine_top_k'])
+            pairs = [
+                (i, int(j)) for i, row in enumerate(candidates) for j in row
+                if not np.isnan(matrix[i, j])
+            ]
+            routes = run_concurrently({
+                f"{i}:{j}": (lambda i=i, j=j: route_service.calculate_route(origins[i], destinations[j]))
+                for i, j in pairs
+            }, deadline) if pairs else {}
+            for i, j in pairs:
+                route = routes[f"{i}:{j}"]
+                refined.append({
+                    'origin': i,
+                    'destination': j,
+                    'straight_line_distance': round(float(matrix[i, j]), 2),
+                    'distance': route['distance'] if route else None,
+                    'duration': route['duration'] if route else None,
+                })
+        
+        # JSON has no NaN: unresolved locations become nulls
+        distances = np.round(matrix, 2)
+        missing = np.isnan(distances)
+        if missing.any():
+            distances = distances.astype(object)
+            distances[missing] = None
+        
+        return Response({
+            'origins': [list(coords) if coords else None for coords in origins],
+            'destinations': [list(coords) if coords else None for coords in destinations],
+            'unresolved': {
+                'origins': [i for i, coords in enumerate(origins) if not coords],
+                'destinations': [j for j, coords in enumerate(destinations) if not coords],
+            },
+            'method': data['method'],
+            'units': 'miles',
+            'distances': distances.tolist(),
+            'refined': refined,
+            'degraded': route_service.degraded
+        })
+        
+    except DeadlineExceeded as e:
+        return Response(
+            {'error': f'Distance matrix timed out: {str(e)}'}, 
+            status=status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    except Exception as e:
+        logger.error(f"Distance matrix failed: {str(e)}")
+        return Response(
+            {'error': f'Error calculating distance matrix: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['POST'])
+def batch_geocode(request):
+    """
+    Geocode a batch of locations, streaming one NDJSON line per input as it
+    resolves and a final summary line
+    """
+    serializer = BatchGeocodeSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    locations = serializer.validated_data['locations']
+    
+    geocoder = BatchGeocoder()
+    
+    def stream():
+        try:
+            for result in geocoder.geocode(locations):
+                yield json.dumps(result) + '\n'
+        except Exception as e:
+            logger.error(f"Batch geocode failed: {str(e)}")
+            yield json.dumps({'error': f'Error geocoding batch: {str(e)}'}) + '\n'
+            return
+        yield json.dumps({
+            'summary': {
+                'total': len(locations),
+                'sources': dict(geocoder.sources),
+                'degraded': geocoder.route_service.degraded
+            }
+        }) + '\n'
+    
+    return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
 @api_view(['GET'])
 def get_trip(request, trip_id):
     """
-    Get trip details with route and schedule information
+    Get trip details with its daily logs; ?include=plan adds the stored route
+    and schedule (null for trips planned without one), read in the same query
+    as the trip
+    """
+    include_plan = 'plan' in request.query_params.get('include', '').split(',')
+    trips = Trip.objects.with_logs()
+    if include_plan:
+        output_serializer = RouteOutputSerializer(data=request.query_params)
+        if not output_serializer.is_valid():
+            return Response(output_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        trips = trips.select_related('plan')
+    trip = get_object_or_404(trips, id=trip_id)
+    data = TripDetailSerializer(trip).data
+    if include_plan:
+        plan = getattr(trip, 'plan', None)
+        data['plan'] = plan_body(plan, output_serializer.validated_data) if plan is not None else None
+    return Response(data)
+
+@api_view(['GET'])
+def get_trip_plan(request, trip_id):
+    """
+    Stored route, schedule and HOS compliance of a planned trip, without
+    re-planning: one primary-key read
+    """
+    output_serializer = RouteOutputSerializer(data=request.query_params)
+    if not output_serializer.is_valid():
+        return Response(output_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    plan = get_object_or_404(TripPlan, trip_id=trip_id)
+    return Response(plan_body(plan, output_serializer.validated_data))
+
+@api_view(['POST'])
+def sweep_trip_schedule(request, trip_id):
+    """
+    What-if schedules for a planned trip over many departure times and
+    cycle-hours values, returning the Pareto-best options
     """
     trip = get_object_or_404(Trip, id=trip_id)
-    serializer = TripDetailSerializer(trip)
-    return Response(serializer.data)
+    serializer = ScheduleSweepSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    
+    route_service = RouteService()
+    deadline = Deadline(getattr(settings, 'PLAN_DEADLINE_SECONDS', 30))
+    
+    try:
+        plan = TripPlan.objects.filter(trip=trip).only('route').first()
+        if plan is not None:
+            # The planned route is stored (see trip_plan): no geocoding or routing
+            stored = decode_document(plan.route)
+            legs = [stored['to_pickup'], stored['to_dropoff']]
+            route_data = {
+                'distance': stored['total_distance'],
+                'duration': stored['total_drive_time'],
+                'legs': [{'distance': leg['distance'], 'duration': leg['duration']} for leg in legs]
+            }
+            degraded = stored['degraded']
+        else:
+            # Stored coordinates skip geocoding; trips planned before they were stored are geocoded once
+            names = {'current': trip.current_location, 'pickup': trip.pickup_location, 'dropoff': trip.dropoff_location}
+            coords = {key: trip.coordinates(key) for key in names}
+            missing = {key: name for key, name in names.items() if coords[key] is None}
+            if missing:
+                coords.update(run_concurrently({
+                    key: lambda name=name: route_service.geocode_location(name) for key, name in missing.items()
+                }, deadline))
+            error_msg = geocode_failure_message(trip, coords)
+            if error_msg:
+                return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+            
+            route = run_concurrently({
+                'route': lambda: route_service.calculate_multi_leg_route([coords['current'], coords['pickup'], coords['dropoff']]),
+            }, deadline)['route']
+            route_data = {
+                'distance': route['distance'],
+                'duration': route['duration'],
+                'legs': [{'distance': leg['distance'], 'duration': leg['duration']} for leg in route['legs']]
+            }
+            degraded = route_service.degraded
+        
+        result = HOSComplianceService().sweep_departures(
+            trip,
+            route_data,
+            data['departures'],
+            data.get('cycle_hours') or [trip.current_cycle_used],
+            data['dock_hours'],
+            data['include_all']
+        )
+        result['degraded'] = degraded
+        return Response(result)
+        
+    except DeadlineExceeded as e:
+        return Response(
+            {'error': f'Schedule sweep timed out: {str(e)}'}, 
+            status=status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    except Exception as e:
+        logger.error(f"Schedule sweep failed for trip {trip_id}: {str(e)}")
+        return Response(
+            {'error': f'Error sweeping schedules: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['POST'])
+def update_trip_position(request, trip_id):
+    """
+    Re-plan the rest of a trip from a live driver position. The logged
+    schedule up to the update stands as driven; only the remaining legs are
+    routed (from stored coordinates) and simulated from the driver's clocks at
+    that point, and only the daily logs from the update's day on are rewritten.
+    The stored plan keeps its geometry for the part already driven.
+    """
+    trip = get_object_or_404(Trip, id=trip_id)
+    serializer = PositionUpdateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    updated_at = data.get('at') or timezone.now()
+    at = naive_local(updated_at).replace(second=0, microsecond=0)
+    
+    if trip.position_updated_at and updated_at < trip.position_updated_at:
+        return Response({'error': 'Position update is older than the last one'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    logs = list(trip.daily_logs.prefetch_related('log_entries'))
+    if not logs:
+        return Response({'error': 'Trip has no planned schedule to update'}, status=status.HTTP_400_BAD_REQUEST)
+    history_start = datetime.combine(logs[0].date, datetime.min.time())
+    history = timeline_from_logs([
+        {
+            'date': log.date,
+            'total_miles': log.total_miles,
+            'entries': [
+                {
+                    'duty_status': entry.duty_status,
+                    'start_time': entry.start_time,
+                    'end_time': entry.end_time,
+                    'location': entry.location,
+                    'remarks': entry.remarks
+                }
+                for entry in log.log_entries.all()
+            ]
+        }
+        for log in logs
+    ])
+    cut = int((at - history_start).total_seconds() // 60)
+    if cut <= 0:
+        return Response({'error': 'Position update is before the trip schedule starts'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Progress per the logged schedule: a stop is done once its entry has ended
+    def stop_done(remarks):
+        ends = [history.ends[i] for i in range(len(history)) if history.strings[history.remarks[i]] == remarks]
+        return bool(ends) and max(ends) <= cut
+    
+    if stop_done('Dropoff'):
+        return Response({'error': 'Trip has already been delivered'}, status=status.HTTP_400_BAD_REQUEST)
+    picked_up = data.get('picked_up', stop_done('Pickup'))
+    
+    route_service = RouteService()
+    deadline = Deadline(getattr(settings, 'PLAN_DEADLINE_SECONDS', 30))
+    
+    try:
+        # Stored coordinates skip geocoding; trips planned before they were stored are geocoded once
+        names = {'pickup': trip.pickup_location, 'dropoff': trip.dropoff_location}
+        coords = {key: trip.coordinates(key) for key in names}
+        missing = {key: name for key, name in names.items() if coords[key] is None}
+        location = data['location']
+        if isinstance(location, str):
+            missing['position'] = location
+        if missing:
+            coords.update(run_concurrently({
+                key: lambda name=name: route_service.geocode_location(name) for key, name in missing.items()
+            }, deadline))
+        if not isinstance(location, str):
+            coords['position'] = location
+        failed = [names.get(key, location) for key, value in coords.items() if not value]
+        if failed:
+            return Response(
+                {'error': f"Could not geocode: {', '.join(failed)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        waypoints = [coords['position']] + ([] if picked_up else [coords['pickup']]) + [coords['dropoff']]
+        route, error = run_concurrently({
+            'route': lambda: route_lane(route_service, waypoints),
+        }, deadline)['route']
+        if route is None:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        route_data = {
+            'distance': route['distance'],
+            'duration': route['duration'],
+            'legs': [{'distance': leg['distance'], 'duration': leg['duration']} for leg in route['legs']]
+        }
+        
+        hos_service = HOSComplianceService()
+        position = location if isinstance(location, str) else f"{location[0]:.4f}, {location[1]:.4f}"
+        replanned = hos_service.replan_from_position(trip, history, history_start, route_data, position, at, picked_up)
+        violations = hos_service.validate_hos_compliance(replanned.history, trip.current_cycle_used)
+        
+        # The stored geometry is kept for the part already driven (up to the point nearest
+        # the position); only the remaining legs come from the new route. Leg summaries
+        # in the stored route stay as planned
+        geometry = {}
+        plan = TripPlan.objects.filter(trip=trip).only('to_pickup_geometry', 'to_dropoff_geometry').first()
+        if plan is not None:
+            remaining = [leg['geometry']['coordinates'] for leg in route['legs']]
+            if picked_up:
+                driven = driven_part(decode_geometry(plan.to_dropoff_geometry), coords['position'])
+                geometry['to_dropoff_geometry'] = encode_geometry(driven + remaining[0])
+            else:
+                driven = driven_part(decode_geometry(plan.to_pickup_geometry), coords['position'])
+                geometry['to_pickup_geometry'] = encode_geometry(driven + remaining[0])
+                geometry['to_dropoff_geometry'] = encode_geometry(remaining[1])
+        
+        # Rewrite the logs from the update's day on; earlier days are unchanged
+        rows = [row for row in log_rows(trip, replanned.history) if row[0].date >= at.date()]
+        with transaction.atomic():
+            trip.daily_logs.filter(date__gte=at.date()).delete()
+            save_log_rows(rows)
+            trip.set_coordinates({'pickup': coords['pickup'], 'dropoff': coords['dropoff'], 'position': coords['position']})
+            trip.position_updated_at = updated_at
+            trip.total_distance = replanned.history.total_distance
+            trip.estimated_drive_time = replanned.history.total_drive_time
+            trip.save()
+            TripPlan.objects.filter(trip=trip).update(
+                schedule=encode_document(schedule_document(replanned.history, violations), JSONEncoder),
+                updated_at=timezone.now(),
+                **geometry
+            )
+        
+        clocks = replanned.clocks
+        return Response({
+            'trip': TripSerializer(trip).data,
+            'position': {
+                'location': position,
+                'coordinates': list(coords['position']),
+                'at': at,
+                'picked_up': picked_up
+            },
+            'clocks': {
+                'driving_hours': round(clocks.driving / 60, 2),
+                'window_hours': round(clocks.window / 60, 2) if clocks.window is not None else None,
+                'since_break_hours': round(clocks.since_break / 60, 2),
+                'cycle_used_hours': round(clocks.cycle_used / 60, 2)
+            },
+            'route': {
+                'remaining_distance': route['distance'],
+                'remaining_drive_time': route['duration'],
+                'degraded': route_service.degraded
+            },
+            'schedule': replanned.remaining.to_dict(),
+            'updated_logs': [daily_log.date for daily_log, _ in rows],
+            'hos_compliance': {
+                'violations': violations,
+                'is_compliant': len(violations) == 0
+            }
+        })
+        
+    except DeadlineExceeded as e:
+        return Response(
+            {'error': f'Position update timed out: {str(e)}'}, 
+            status=status.HTTP_504_GATEWAY_TIMEOUT
+        )
+    except Exception as e:
+        logger.error(f"Position update failed for trip {trip_id}: {str(e)}")
+        return Response(
+            {'error': f'Error updating trip position: {str(e)}'}, 
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
 
 @api_view(['GET'])
 def list_trips(request):
     """
-    List all trips
+    List trips, newest first, one page at a time
+    
+    Keyset pagination on (created_at, id): each page seeks past the previous
+    page's last trip through trip_created_id_idx, so a page costs the same
+    however deep it is. Rows are projected with values() rather than loaded
+    as models.
     """
-    trips = Trip.objects.all()
-    serializer = TripSerializer(trips, many=True)
-    return Response(serializer.data)
+    query_serializer = TripListQuerySerializer(data=request.query_params)
+    if not query_serializer.is_valid():
+        return Response(query_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    query = query_serializer.validated_data
+    
+    trips = Trip.objects.order_by('-created_at', '-id')
+    if 'created_after' in query:
+        trips = trips.filter(created_at__gte=query['created_after'])
+    if 'created_before' in query:
+        trips = trips.filter(created_at__lt=query['created_before'])
+    if 'location' in query:
+        location = query['location']
+        trips = trips.filter(
+            Q(current_location__icontains=location) | Q(pickup_location__icontains=location)
+            | Q(dropoff_location__icontains=location)
+        )
+    if 'cursor' in query:
+        created_at, trip_id = query['cursor']
+        trips = trips.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=trip_id))
+    
+    limit = query['limit']
+    rows = list(trips.values(*TRIP_LIST_FIELDS)[:limit + 1])  # one extra row tells whether there is a next page
+    next_cursor = encode_trip_cursor(rows[limit - 1]['created_at'], rows[limit - 1]['id']) if len(rows) > limit else None
+    return Response({'results': rows[:limit], 'next_cursor': next_cursor})
 
 @api_view(['GET'])
 def get_daily_log_pdf(request, trip_id, log_date):
@@ -163,30 +772,189 @@ def get_daily_log_pdf(request, trip_id, log_date):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-def create_daily_logs_from_schedule(trip, schedule):
+def geocode_failure_message(trip, coords):
+    """
+    Error message naming the trip locations that could not be geocoded, or None
     """
-    Create DailyLog and LogEntry instances from the calculated schedule
+    failed_locations = []
+    if not coords['current']:
+        failed_locations.append(f"current location '{trip.current_location}'")
+    if not coords['pickup']:
+        failed_locations.append(f"pickup location '{trip.pickup_location}'")
+    if not coords['dropoff']:
+        failed_locations.append(f"dropoff location '{trip.dropoff_location}'")
+    
+    if failed_locations:
+        return f"Could not geocode: {', '.join(failed_locations)}. Please use specific city and state format (e.g., 'Los Angeles, CA')"
+    return None
+
+def route_lane(route_service, waypoints):
     """
-    for i, daily_log_data in enumerate(schedule['daily_logs']):
-        # Create daily log
-        daily_log = DailyLog.objects.create(
+    (route, None) for a lane, or (None, error message) so one failed lane does
+    not fail a whole batch
+    """
+    try:
+        route = route_service.calculate_multi_leg_route(list(waypoints))
+    except Exception as e:
+        logger.error(f"Routing failed for lane {waypoints}: {str(e)}")
+        return None, f'Error calculating route: {str(e)}'
+    if not all(route['legs']):
+        return None, 'Could not calculate route between the specified locations'
+    return route, None
+
+def complete_plan(trip, route, coords, route_service, output):
+    """
+    Schedule and persist a routed trip and build the plan response body
+    (shared by the sync and async planning views)
+    """
+    hos_service = HOSComplianceService()
+    route_to_pickup, route_to_dropoff = route['legs']
+    current_coords, pickup_coords, dropoff_coords = coords['current'], coords['pickup'], coords['dropoff']
+    
+    # Combine route data
+    total_distance = route['distance']
+    total_drive_time = route['duration']
+    
+    # Update trip with calculated values
+    trip.total_distance = total_distance
+    trip.estimated_drive_time = total_drive_time
+    trip.set_coordinates(coords)
+    
+    # Calculate HOS compliant schedule
+    route_data = {
+        'distance': total_distance,
+        'duration': total_drive_time,
+        'geometry': {
+            'to_pickup': route_to_pickup['geometry'],
+            'to_dropoff': route_to_dropoff['geometry']
+        },
+        'legs': [
+            {'distance': route_to_pickup['distance'], 'duration': route_to_pickup['duration']},
+            {'distance': route_to_dropoff['distance'], 'duration': route_to_dropoff['duration']}
+        ]
+    }
+    
+    schedule = hos_service.calculate_trip_schedule(trip, route_data)
+    
+    violations = hos_service.validate_hos_compliance(schedule, trip.current_cycle_used)
+    
+    route_body = {
+        'total_distance': total_distance,
+        'total_drive_time': total_drive_time,
+        'to_pickup': compact_route(route_to_pickup, output['tolerance'], output['geometry_format'], output['instructions']),
+        'to_dropoff': compact_route(route_to_dropoff, output['tolerance'], output['geometry_format'], output['instructions']),
+        'coordinates': {
+            'current': current_coords,
+            'pickup': pickup_coords,
+            'dropoff': dropoff_coords
+        },
+        # True when OpenRouteService was unavailable and offline estimates were used
+        'degraded': route_service.degraded
+    }
+    schedule_body = schedule_document(schedule, violations)
+    plan = trip_plan(trip, route_to_pickup, route_to_dropoff, route_body, schedule_body)
+    
+    # Save the trip with its daily logs and plan, then load the logs back for the response in two queries
+    create_daily_logs_from_schedule(trip, schedule, plan)
+    prefetch_related_objects([trip], *log_prefetches())
+    
+    # Prepare response
+    trip_serializer = TripDetailSerializer(trip)
+    
+    response_data = {
+        'trip': trip_serializer.data,
+        'route': route_body,
+        **schedule_body
+    }
+    
+    return response_data
+
+def schedule_document(schedule, violations):
+    """The schedule and hos_compliance parts of a plan response"""
+    return {
+        'schedule': schedule.to_dict(),
+        'hos_compliance': {
+            'violations': violations,
+            'is_compliant': len(violations) == 0
+        }
+    }
+
+def trip_plan(trip, route_to_pickup, route_to_dropoff, route_body, schedule_body):
+    """
+    Unsaved TripPlan: full-resolution leg geometry as binary, the route
+    response part (legs without geometry) and the schedule parts as
+    compressed JSON
+    """
+    route = dict(route_body)
+    for key, leg in (('to_pickup', route_to_pickup), ('to_dropoff', route_to_dropoff)):
+        route[key] = {name: value for name, value in leg.items() if name != 'geometry'}
+    return TripPlan(
+        trip=trip,
+        to_pickup_geometry=encode_geometry(route_to_pickup['geometry']['coordinates']),
+        to_dropoff_geometry=encode_geometry(route_to_dropoff['geometry']['coordinates']),
+        route=encode_document(route, JSONEncoder),
+        schedule=encode_document(schedule_body, JSONEncoder)
+    )
+
+def plan_body(plan, output):
+    """
+    Decode a stored TripPlan into the route, schedule and hos_compliance parts
+    of the plan response, with geometry prepared per the RouteOutputSerializer
+    options
+    """
+    route = decode_document(plan.route)
+    for key, blob in (('to_pickup', plan.to_pickup_geometry), ('to_dropoff', plan.to_dropoff_geometry)):
+        leg = {**route[key], 'geometry': {'type': 'LineString', 'coordinates': decode_geometry(blob)}}
+        route[key] = compact_route(leg, output['tolerance'], output['geometry_format'], output['instructions'])
+    return {'route': route, **decode_document(plan.schedule), 'updated_at': plan.updated_at}
+
+def log_rows(trip, schedule):
+    """
+    Unsaved (DailyLog, [LogEntry]) rows for a DutySchedule, read straight from
+    its day arrays; each entry already points at its log
+    """
+    strings = schedule.timeline.strings
+    rows = []
+    for day in schedule.days():
+        daily_log = DailyLog(
             trip=trip,
-            date=daily_log_data['date'],
-            log_order=daily_log_data['day_number'],
-            total_miles=daily_log_data['totals'].get('total_miles', 0),
-            total_hours_off_duty=daily_log_data['totals']['off_duty'],
-            total_hours_sleeper_berth=daily_log_data['totals']['sleeper_berth'],
-            total_hours_driving=daily_log_data['totals']['driving'],
-            total_hours_on_duty_not_driving=daily_log_data['totals']['on_duty_not_driving'],
+            date=day.date,
+            log_order=day.number,
+            total_miles=round(day.miles, 1),
+            total_hours_off_duty=day.hours(OFF_DUTY_CODE),
+            total_hours_sleeper_berth=day.hours(SLEEPER_BERTH_CODE),
+            total_hours_driving=day.hours(DRIVING_CODE),
+            total_hours_on_duty_not_driving=day.hours(ON_DUTY_CODE),
         )
-        
-        # Create log entries
-        for entry_data in daily_log_data['entries']:
-            LogEntry.objects.create(
+        entries = []
+        for i in range(len(day)):
+            start_time, end_time = day.entry_times(i)
+            entries.append(LogEntry(
                 daily_log=daily_log,
-                duty_status=entry_data['duty_status'],
-                start_time=entry_data['start_time'],
-                end_time=entry_data['end_time'],
-                location=entry_data['location'],
-                remarks=entry_data['remarks']
-            )
+                duty_status=DUTY_STATUSES[day.statuses[i]],
+                start_time=start_time,
+                end_time=end_time,
+                location=strings[day.locations[i]],
+                remarks=strings[day.remarks[i]],
+                duration_hours=(day.ends[i] - day.starts[i]) / 60  # bulk_create skips LogEntry.save()
+            ))
+        rows.append((daily_log, entries))
+    return rows
+
+def save_log_rows(rows):
+    """Bulk insert log_rows output: one query for the logs, one for their entries"""
+    DailyLog.objects.bulk_create([daily_log for daily_log, _ in rows])
+    LogEntry.objects.bulk_create([entry for _, entries in rows for entry in entries])
+
+def create_daily_logs_from_schedule(trip, schedule, plan=None):
+    """
+    Save the trip (new or updated) and create its DailyLog and LogEntry rows
+    from the calculated schedule, and its TripPlan if given, all in one
+    transaction
+    """
+    rows = log_rows(trip, schedule)
+    with transaction.atomic():
+        trip.save()
+        save_log_rows(rows)
+        if plan is not None:
+            plan.save(force_insert=True)
@@ -98,6 +98,15 @@ if DATABASE_URL:
         }
 
 
+# Cache (local memory by default; set CACHE_BACKEND/CACHE_LOCATION for a shared backend)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'trucker-app'),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -186,6 +195,96 @@ CORS_ALLOW_METHODS = [
 # OpenRouteService API settings
 OPENROUTE_API_KEY = os.getenv('OPENROUTE_API_KEY', '')
 
+# Geocode cache (in-process LRU in front of the GeocodeCacheEntry table)
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '2048'))
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', str(30 * 24 * 3600)))  # seconds
+GEOCODE_NEGATIVE_CACHE_TTL = int(os.getenv('GEOCODE_NEGATIVE_CACHE_TTL', str(15 * 60)))  # seconds
+
+# Offline gazetteer used when OpenRouteService cannot geocode a location
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(BASE_DIR, 'trucker_app', 'data', 'us_places.tsv'))
+
+# Routing backend: 'openroute' (ORS with offline fallback) or 'road_graph' (offline only).
+# The bundled highway graph is also what the fallback router uses when ORS is unavailable.
+ROUTE_BACKEND = os.getenv('ROUTE_BACKEND', 'openroute')
+ROAD_GRAPH_PATH = os.getenv('ROAD_GRAPH_PATH', os.path.join(BASE_DIR, 'trucker_app', 'data', 'us_highways.tsv'))
+
+# Route cache (directions results keyed by waypoints snapped to a grid)
+ROUTE_CACHE_SIZE = int(os.getenv('ROUTE_CACHE_SIZE', '1024'))  # entries
+ROUTE_CACHE_TTL = int(os.getenv('ROUTE_CACHE_TTL', str(24 * 3600)))  # seconds
+ROUTE_CACHE_GRID_DEGREES = float(os.getenv('ROUTE_CACHE_GRID_DEGREES', '0.01'))  # ~0.7 mile cells
+
+# OpenRouteService upstream. ORS_TRANSPORT selects how calls are made:
+#   'live'   - call ORS_BASE_URL
+#   'record' - call ORS_BASE_URL and save every response under ORS_FIXTURES_DIR
+#   'replay' - serve saved responses with no network, injecting latency and faults below
+ORS_BASE_URL = os.getenv('ORS_BASE_URL', 'https://api.openrouteservice.org')
+ORS_TRANSPORT = os.getenv('ORS_TRANSPORT', 'live')
+ORS_FIXTURES_DIR = os.getenv('ORS_FIXTURES_DIR', os.path.join(BASE_DIR, 'trucker_app', 'data', 'ors_fixtures'))
+ORS_REPLAY_LATENCY_MS = float(os.getenv('ORS_REPLAY_LATENCY_MS', '0'))  # fixed latency per call
+ORS_REPLAY_LATENCY_TAIL_MS = float(os.getenv('ORS_REPLAY_LATENCY_TAIL_MS', '0'))  # mean of an exponential tail on top
+ORS_REPLAY_ERROR_RATE = float(os.getenv('ORS_REPLAY_ERROR_RATE', '0'))  # fraction of calls answered with 503
+ORS_REPLAY_THROTTLE_RATE = float(os.getenv('ORS_REPLAY_THROTTLE_RATE', '0'))  # fraction answered with 429
+ORS_REPLAY_RETRY_AFTER = int(os.getenv('ORS_REPLAY_RETRY_AFTER', '1'))  # whole seconds, sent with injected 429s
+ORS_REPLAY_SEED = int(os.getenv('ORS_REPLAY_SEED')) if os.getenv('ORS_REPLAY_SEED') else None
+
+# Shared OpenRouteService HTTP client (pooled keep-alive session with retry/backoff)
+ORS_HTTP_POOL_SIZE = int(os.getenv('ORS_HTTP_POOL_SIZE', '20'))
+ORS_ASYNC_POOL_SIZE = int(os.getenv('ORS_ASYNC_POOL_SIZE', '100'))  # connections for the async planner (/api/trips/plan/async/)
+ORS_CONNECT_TIMEOUT = float(os.getenv('ORS_CONNECT_TIMEOUT', '3.05'))  # seconds
+ORS_GEOCODE_READ_TIMEOUT = float(os.getenv('ORS_GEOCODE_READ_TIMEOUT', '10'))  # seconds
+ORS_DIRECTIONS_READ_TIMEOUT = float(os.getenv('ORS_DIRECTIONS_READ_TIMEOUT', '15'))  # seconds
+ORS_MAX_RETRIES = int(os.getenv('ORS_MAX_RETRIES', '2'))
+ORS_BACKOFF_FACTOR = float(os.getenv('ORS_BACKOFF_FACTOR', '0.5'))  # seconds, doubled per retry
+ORS_BACKOFF_MAX = float(os.getenv('ORS_BACKOFF_MAX', '10'))  # seconds, also caps Retry-After
+
+# Default web-map zoom used to simplify route geometry in responses (unset = full geometry).
+# Clients can pass ?zoom=, ?tolerance=, ?geometry_format=polyline and ?instructions=false per request.
+ROUTE_GEOMETRY_DEFAULT_ZOOM = float(os.getenv('ROUTE_GEOMETRY_DEFAULT_ZOOM')) if os.getenv('ROUTE_GEOMETRY_DEFAULT_ZOOM') else None
+
+# Circuit breaker around OpenRouteService. Breaker state lives in the Django cache,
+# so point CACHES at a shared backend (database, Redis, Memcached) to share it across workers.
+ORS_CIRCUIT_FAILURE_RATE = float(os.getenv('ORS_CIRCUIT_FAILURE_RATE', '0.5'))
+ORS_CIRCUIT_MIN_CALLS = int(os.getenv('ORS_CIRCUIT_MIN_CALLS', '5'))
+ORS_CIRCUIT_WINDOW = float(os.getenv('ORS_CIRCUIT_WINDOW', '60'))  # seconds
+ORS_CIRCUIT_RESET_TIMEOUT = float(os.getenv('ORS_CIRCUIT_RESET_TIMEOUT', '30'))  # seconds
+ORS_CIRCUIT_CACHE = os.getenv('ORS_CIRCUIT_CACHE', 'default')
+
+# Request coalescing: identical concurrent geocode/route lookups share one upstream call.
+# Set SINGLE_FLIGHT_CACHE to a cache alias shared by all workers to coalesce across processes too.
+SINGLE_FLIGHT_CACHE = os.getenv('SINGLE_FLIGHT_CACHE', '')  # '' = in-process only
+SINGLE_FLIGHT_LOCK_TIMEOUT = float(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', '30'))  # seconds
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.getenv('SINGLE_FLIGHT_POLL_INTERVAL', '0.05'))  # seconds
+
+# Batch geocoding (POST /api/geocode/batch/). Cache and exact gazetteer hits are answered
+# locally; misses go to OpenRouteService at most ORS_GEOCODE_RATE_LIMIT calls per second.
+ORS_GEOCODE_RATE_LIMIT = float(os.getenv('ORS_GEOCODE_RATE_LIMIT', '1.5'))  # calls/second; 0 disables
+ORS_GEOCODE_BURST = int(os.getenv('ORS_GEOCODE_BURST', '5'))
+BATCH_GEOCODE_CONCURRENCY = int(os.getenv('BATCH_GEOCODE_CONCURRENCY', '4'))  # in-flight upstream calls per batch
+BATCH_GEOCODE_MAX_LOCATIONS = int(os.getenv('BATCH_GEOCODE_MAX_LOCATIONS', '10000'))
+
+# Trip planning fan-out
+PLAN_WORKER_THREADS = int(os.getenv('PLAN_WORKER_THREADS', '16'))
+PLAN_DEADLINE_SECONDS = float(os.getenv('PLAN_DEADLINE_SECONDS', '30'))
+
+# Batch trip planning (POST /api/trips/plan/batch/). HOS scheduling runs in a pool of
+# PLAN_BATCH_PROCESSES worker processes (1 runs it in the request thread), in chunks of
+# PLAN_BATCH_CHUNK_SIZE trips per task.
+PLAN_BATCH_PROCESSES = int(os.getenv('PLAN_BATCH_PROCESSES', str(os.cpu_count() or 1)))
+PLAN_BATCH_CHUNK_SIZE = int(os.getenv('PLAN_BATCH_CHUNK_SIZE', '25'))
+PLAN_BATCH_MAX_TRIPS = int(os.getenv('PLAN_BATCH_MAX_TRIPS', '1000'))
+PLAN_BATCH_DEADLINE_SECONDS = float(os.getenv('PLAN_BATCH_DEADLINE_SECONDS', '120'))
+
+# Distance matrix limits (POST /api/trips/matrix/)
+MATRIX_MAX_CELLS = int(os.getenv('MATRIX_MAX_CELLS', '1000000'))  # origins x destinations
+MATRIX_MAX_REFINED_PAIRS = int(os.getenv('MATRIX_MAX_REFINED_PAIRS', '200'))  # road-routed pairs per call
+
+# Departure-time sweep (POST /api/trips/<id>/schedule/sweep/)
+SCHEDULE_SWEEP_MAX_CANDIDATES = int(os.getenv('SCHEDULE_SWEEP_MAX_CANDIDATES', '5000'))  # departures x cycle-hours values
+
+# Trip list (GET /api/trips/), keyset paginated
+TRIP_LIST_DEFAULT_LIMIT = int(os.getenv('TRIP_LIST_DEFAULT_LIMIT', '50'))
+TRIP_LIST_MAX_LIMIT = int(os.getenv('TRIP_LIST_MAX_LIMIT', '200'))
+
 # Logging configuration
 LOGGING = {
     'version': 1,